@@ -1,8 +1,7 @@
 """
 API endpoints pour la gestion centralisée des popups
 """
-from flask import Blueprint, jsonify, request
-from datetime import datetime
+from flask import Blueprint, Response, jsonify, request
 from services.popup_service import PopupService
 from services.event_bus import EventTypes
 
@@ -17,31 +16,64 @@ def create_popup_blueprint(popup_service: PopupService):
         try:
             data = request.json
             
-            # Valider les données
-            required_fields = ['text', 'screenshot_base64']
-            for field in required_fields:
-                if field not in data:
-                    return jsonify({'error': f'Missing field: {field}'}), 400
+            # Valider les données (la capture n'est nécessaire que si la RAM ne suffit pas)
+            if 'text' not in data:
+                return jsonify({'error': 'Missing field: text'}), 400
+            
+            # La RAM, confirmée par le texte, identifie déjà le popup: pas de capture ni d'OmniParser
+            classification = popup_service.ram_classifier.classify(data['text'], data.pop('message_ids', None))
+            if classification:
+                popup_id = popup_service.register_popup(data)
+                print(f"[POPUP] Popup {popup_id} identified from RAM as {classification['popup_type']}")
+                popup_service.apply_ram_classification(popup_id, classification)
+                popup_service.request_ai_decision(popup_id, _get_game_context())
+                return jsonify({
+                    'success': True,
+                    'popup_id': popup_id,
+                    'classified_from': 'ram',
+                    'message': 'Popup identified from RAM and being processed'
+                })
+            
+            screenshot_base64 = data.pop('screenshot_base64', None)
+            if not screenshot_base64:
+                # Classification incertaine: le monitor doit fournir une capture
+                return jsonify({
+                    'success': False,
+                    'needs_screenshot': True,
+                    'error': 'Missing field: screenshot_base64'
+                }), 400
+            
+            # Stocker la capture une seule fois, les popups ne gardent que sa clé
+            frame_key = popup_service.frame_store.put_base64(screenshot_base64)
+            
+            # Même capture d'un popup encore affiché: déjà en cours de traitement
+            showing_id = popup_service.find_showing_popup(frame_key)
+            if showing_id:
+                return jsonify({
+                    'success': True,
+                    'popup_id': showing_id,
+                    'duplicate': True,
+                    'message': 'Popup already being processed'
+                })
             
             # Enregistrer le popup
+            data['screenshot_key'] = frame_key
             popup_id = popup_service.register_popup(data)
             
             # Analyser immédiatement avec OmniParser
-            screenshot_base64 = data.get('screenshot_base64')
-            if screenshot_base64:
-                print(f"[POPUP] Analyzing popup {popup_id} with OmniParser...")
-                analysis_result = popup_service.analyze_popup(popup_id, screenshot_base64)
+            print(f"[POPUP] Analyzing popup {popup_id} with OmniParser...")
+            analysis_result = popup_service.analyze_popup(popup_id, frame_key)
+            
+            if analysis_result.get('success'):
+                print(f"[POPUP] Analysis complete. Found {len(analysis_result.get('options', []))} options")
                 
-                if analysis_result.get('success'):
-                    print(f"[POPUP] Analysis complete. Found {len(analysis_result.get('options', []))} options")
-                    
-                    # Récupérer le contexte du jeu
-                    game_context = _get_game_context()
-                    
-                    # Demander une décision à l'IA
-                    popup_service.request_ai_decision(popup_id, game_context)
-                else:
-                    print(f"[POPUP] Analysis failed: {analysis_result.get('error')}")
+                # Récupérer le contexte du jeu
+                game_context = _get_game_context()
+                
+                # Demander une décision à l'IA
+                popup_service.request_ai_decision(popup_id, game_context)
+            else:
+                print(f"[POPUP] Analysis failed: {analysis_result.get('error')}")
             
             return jsonify({
                 'success': True,
@@ -69,6 +101,24 @@ def create_popup_blueprint(popup_service: PopupService):
             'popups': popups
         })
     
+    @popup_api.route('/api/popups/ram', methods=['GET'])
+    def get_ram_messages():
+        """Messages de popup actuellement en RAM (IDs et textes) et joueur visé, lus par le monitor"""
+        classifier = popup_service.ram_classifier
+        return jsonify({
+            'messages': classifier.active_messages,
+            'player': classifier.popup_owner(_get_game_context())
+        })
+    
+    @popup_api.route('/api/frames/<frame_key>', methods=['GET'])
+    def get_frame(frame_key):
+        """Renvoie une capture stockée à partir de sa clé"""
+        frame = popup_service.frame_store.get(frame_key)
+        if frame is None:
+            return jsonify({'error': 'Frame not found'}), 404
+        mimetype = 'image/jpeg' if frame[:2] == b'\xff\xd8' else 'image/png'
+        return Response(frame, mimetype=mimetype)
+    
     @popup_api.route('/api/popups/<popup_id>/execute', methods=['POST'])
     def execute_decision(popup_id):
         """Exécute manuellement une décision"""
@@ -93,35 +143,10 @@ def create_popup_blueprint(popup_service: PopupService):
     @popup_api.route('/api/popups/stats', methods=['GET'])
     def get_popup_stats():
         """Récupère les statistiques des popups"""
-        popups = popup_service.get_active_popups()
-        
-        stats = {
-            'total_active': len(popups),
-            'by_status': {},
-            'by_type': {},
-            'average_response_time': 0
-        }
-        
-        # Calculer les stats
-        response_times = []
-        for popup in popups:
-            # Par statut
-            status = popup.get('status', 'unknown')
-            stats['by_status'][status] = stats['by_status'].get(status, 0) + 1
-            
-            # Par type
-            popup_type = _extract_popup_type(popup.get('text', ''))
-            stats['by_type'][popup_type] = stats['by_type'].get(popup_type, 0) + 1
-            
-            # Temps de réponse
-            if 'detected_at' in popup and 'executed_at' in popup:
-                detected = datetime.fromisoformat(popup['detected_at'])
-                executed = datetime.fromisoformat(popup['executed_at'])
-                response_time = (executed - detected).total_seconds()
-                response_times.append(response_time)
-        
-        if response_times:
-            stats['average_response_time'] = sum(response_times) / len(response_times)
+        stats = popup_service.get_stats()
+        stats['frames'] = popup_service.frame_store.get_stats()
+        stats['recognition_cache'] = popup_service.recognition_cache.get_stats()
+        stats['ram_classifier'] = popup_service.ram_classifier.get_stats()
         
         return jsonify(stats)
     
@@ -137,18 +162,4 @@ def create_popup_blueprint(popup_service: PopupService):
         except:
             return {}
     
-    def _extract_popup_type(text):
-        """Extrait le type de popup du texte"""
-        text_lower = text.lower()
-        if 'buy' in text_lower:
-            return 'buy'
-        elif 'roll' in text_lower:
-            return 'roll'
-        elif 'trade' in text_lower:
-            return 'trade'
-        elif 'auction' in text_lower:
-            return 'auction'
-        else:
-            return 'other'
-    
     return popup_api
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""
+API endpoints pour le traçage des étapes du pipeline popup → clic
+"""
+from flask import Blueprint, jsonify
+from services.tracing import Tracer
+
+def create_trace_blueprint(tracer: Tracer):
+    """Crée le blueprint pour les endpoints de traçage"""
+
+    trace_api = Blueprint('trace_api', __name__)
+
+    @trace_api.route('/api/traces/stats', methods=['GET'])
+    def get_trace_stats():
+        """Histogrammes de latence par étape et par modèle"""
+        return jsonify(tracer.get_stats())
+
+    @trace_api.route('/api/traces/<correlation_id>', methods=['GET'])
+    def get_trace(correlation_id):
+        """Spans d'un popup, dans l'ordre chronologique"""
+        spans = tracer.get_trace(correlation_id)
+        if not spans:
+            return jsonify({'error': 'Trace not found'}), 404
+        return jsonify({
+            'correlation_id': correlation_id,
+            'total_ms': max(s['offset_ms'] + s['duration_ms'] for s in spans),
+            'spans': spans
+        })
+
+    @trace_api.route('/api/traces/export', methods=['POST'])
+    def export_traces():
+        """Écrit les spans en mémoire dans un fichier Chrome trace (chrome://tracing, Perfetto)"""
+        try:
+            path = tracer.export_chrome_trace()
+            return jsonify({'success': True, 'path': path, 'spans': len(tracer.spans)})
+        except OSError as e:
+            return jsonify({'error': str(e)}), 500
+
+    return trace_api
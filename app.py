@@ -21,7 +21,9 @@ from services.popup_service import PopupService
 from services.ai_service import AIService
 from services.auto_start_manager import AutoStartManager
 from services.health_check_service import HealthCheckService
+from services.tracing import bind_flask, get_tracer
 from api.popup_endpoints import create_popup_blueprint
+from api.trace_endpoints import create_trace_blueprint
 
 app = Flask(__name__)
 
@@ -32,8 +34,12 @@ ai_service = AIService(event_bus)
 auto_start_manager = AutoStartManager(config, event_bus)
 health_check_service = HealthCheckService()
 
+# Identifiant de corrélation par requête (en-tête X-Correlation-ID), propagé aux événements
+bind_flask(app)
+
 # Enregistrer les blueprints
 app.register_blueprint(create_popup_blueprint(popup_service))
+app.register_blueprint(create_trace_blueprint(get_tracer("app")))
 
 # Variables globales pour le jeu
 game = None
@@ -121,6 +127,9 @@ def initialize_game():
         contexte = Contexte(game, events)
         print("📊 Contexte initialisé et prêt à enregistrer les événements")
         
+        # Classification des popups à partir des messages en RAM
+        popup_service.ram_classifier.attach(events)
+        
         # Démarrer les listeners pour capturer les événements
         events.start()
         
@@ -774,8 +783,12 @@ def get_monitor_status():
 def get_ai_service_status():
     """Renvoie le statut du service IA interne"""
     return jsonify({
-        'available': ai_service.available,
-        'model': 'gpt-4o-mini' if ai_service.available else None
+        'available': ai_service.available or ai_service.router is not None,
+        'model': ai_service.model if ai_service.available else None,
+        'router': ai_service.router.get_stats() if ai_service.router else None,
+        'decision_cache': ai_service.decision_cache.get_stats(),
+        'streaming': ai_service.get_streaming_stats(),
+        'scheduler': ai_service.scheduler.get_stats() if ai_service.scheduler else None
     })
 
 @app.route('/api/calibration/status')
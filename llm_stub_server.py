@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Serveur LLM local compatible OpenAI (chat completions) pour tester les services
+de décision sans l'API OpenAI: latence simulée, taux d'erreur, réponses types.
+
+Utilisation:
+    python llm_stub_server.py --port 9000 --latency lognormal --latency-ms 400
+    set OPENAI_BASE_URL=http://localhost:9000/v1
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+from flask import Flask, Response, jsonify, request
+
+app = Flask(__name__)
+
+config = {
+    "latency": "fixed",     # fixed, uniform, normal, lognormal, exponential
+    "latency_ms": 300.0,     # Délai avant la réponse (avant le premier token en streaming)
+    "jitter_ms": 100.0,
+    "token_ms": 30.0,       # Délai entre deux morceaux en streaming
+    "error_rate": 0.0,      # Part de réponses 500
+    "rate_limit_rate": 0.0, # Part de réponses 429
+    "strategy": "first",    # first, random: option choisie parmi celles du prompt
+    "canned": {}            # {"texte du prompt": "réponse brute"}
+}
+
+stats_lock = threading.Lock()
+stats = {"requests": 0, "errors": 0, "rate_limited": 0, "latency_ms_total": 0.0}
+
+
+def sample_latency() -> float:
+    """Latence simulée en secondes selon la distribution configurée"""
+    mean, jitter = config["latency_ms"], config["jitter_ms"]
+    kind = config["latency"]
+    if kind == "uniform":
+        value = random.uniform(max(0.0, mean - jitter), mean + jitter)
+    elif kind == "normal":
+        value = random.gauss(mean, jitter)
+    elif kind == "lognormal":
+        # Queue lourde typique des API LLM: médiane ~ mean, dispersion ~ jitter/mean
+        value = random.lognormvariate(0, max(jitter, 1.0) / max(mean, 1.0)) * mean
+    elif kind == "exponential":
+        value = random.expovariate(1.0 / max(mean, 1.0))
+    else:
+        value = mean
+    return max(0.0, value) / 1000.0
+
+
+def extract_options(prompt: str) -> list:
+    """Options proposées dans les prompts d'AIService et d'UnifiedDecisionServer"""
+    for pattern in (r"Options disponibles:\s*(.+)", r"Available buttons:\s*(.+?)\.?$"):
+        match = re.search(pattern, prompt, re.MULTILINE)
+        if match:
+            return [o.strip() for o in match.group(1).split(",") if o.strip()]
+
+    # Prompt générique: boutons détectés par OmniParser (format compact)
+    match = re.search(r"Buttons:\s*(\[.*?\])\s*$", prompt, re.MULTILINE)
+    if match:
+        try:
+            return [e["text"].lower() for e in json.loads(match.group(1)) if e.get("text")]
+        except (ValueError, KeyError, AttributeError, TypeError):
+            pass
+    return []
+
+
+def build_answer(system: str, prompt: str) -> str:
+    """Réponse au format attendu: `option|explication` (AIService) ou JSON (serveur unifié)"""
+    for needle, answer in config["canned"].items():
+        if needle in prompt:
+            return answer
+
+    options = extract_options(prompt)
+    if options:
+        choice = random.choice(options) if config["strategy"] == "random" else options[0]
+    else:
+        choice = "ok"
+
+    if "option|explication" in system or "option|explication" in prompt:
+        return f"{choice}|Réponse simulée par le serveur local"
+    return json.dumps({"action": choice, "confidence": 80, "reason": "Simulated answer"})
+
+
+@app.route('/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    data = request.json or {}
+    messages = data.get("messages", [])
+    system = "\n".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    prompt = "\n".join(m.get("content", "") for m in messages if m.get("role") != "system")
+
+    latency = sample_latency()
+    time.sleep(latency)
+
+    with stats_lock:
+        stats["requests"] += 1
+        stats["latency_ms_total"] += latency * 1000
+
+    roll = random.random()
+    if roll < config["rate_limit_rate"]:
+        with stats_lock:
+            stats["rate_limited"] += 1
+        response = jsonify({"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_error"}})
+        response.headers["Retry-After"] = "1"
+        return response, 429
+    if roll < config["rate_limit_rate"] + config["error_rate"]:
+        with stats_lock:
+            stats["errors"] += 1
+        return jsonify({"error": {"message": "Internal error (stub)", "type": "server_error"}}), 500
+
+    answer = build_answer(system, prompt)
+    if data.get("stream"):
+        return Response(stream_answer(answer, data.get("model", "stub")), mimetype="text/event-stream")
+    prompt_tokens = (len(system) + len(prompt)) // 4
+    completion_tokens = max(1, len(answer) // 4)
+    return jsonify({
+        "id": f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": data.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": answer},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    })
+
+
+def stream_answer(answer: str, model: str):
+    """Réponse en Server-Sent Events, par morceaux de ~4 caractères (un token)"""
+    completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+
+    def chunk(delta: dict, finish_reason=None) -> str:
+        return "data: " + json.dumps({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }) + "\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    for start in range(0, len(answer), 4):
+        if start:
+            time.sleep(config["token_ms"] / 1000.0)
+        yield chunk({"content": answer[start:start + 4]})
+    yield chunk({}, "stop")
+    yield "data: [DONE]\n\n"
+
+
+@app.route('/v1/models', methods=['GET'])
+def list_models():
+    return jsonify({"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model", "owned_by": "stub"}]})
+
+
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    with stats_lock:
+        count = stats["requests"]
+        return jsonify({
+            **stats,
+            "avg_latency_ms": stats["latency_ms_total"] / count if count else 0,
+            "config": {k: v for k, v in config.items() if k != "canned"}
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur LLM local compatible OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "normal", "lognormal", "exponential"],
+                        default=config["latency"])
+    parser.add_argument("--latency-ms", type=float, default=config["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=config["jitter_ms"])
+    parser.add_argument("--token-ms", type=float, default=config["token_ms"],
+                        help="Délai entre deux morceaux en streaming")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--strategy", choices=["first", "random"], default="first")
+    parser.add_argument("--canned", help="Fichier JSON {\"texte du prompt\": \"réponse\"}")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    config.update(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        token_ms=args.token_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        strategy=args.strategy
+    )
+    if args.canned:
+        with open(args.canned, 'r', encoding='utf-8') as f:
+            config["canned"] = json.load(f)
+
+    print(f"🤖 LLM stub sur http://{args.host}:{args.port}/v1 "
+          f"({args.latency} {args.latency_ms:.0f}ms, erreurs {args.error_rate:.0%}, 429 {args.rate_limit_rate:.0%})")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Générateur de charge pour les services de décision: rejoue des popups
+enregistrés et mesure latence (p50/p95/p99) et débit.
+
+Cibles:
+    ai       POST /api/decision/ai du serveur unifié
+    unified  POST /api/decision/unified du serveur unifié
+    bus      AI_DECISION_REQUESTED -> AI_DECISION_MADE via l'EventBus et AIService (en processus)
+
+Exemple (avec llm_stub_server.py et OPENAI_BASE_URL pointant dessus):
+    python load_generator.py --target all --requests 200 --concurrency 8
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import requests
+
+from services.monopoly_popups import MONOPOLY_POPUPS
+
+
+def default_popups() -> List[Dict]:
+    """Un popup par type connu, quand aucun enregistrement n'est fourni"""
+    context = {
+        "players": {
+            "player1": {"name": "GPT1", "money": 1500, "position": 12},
+            "player2": {"name": "GPT2", "money": 1320, "position": 5}
+        },
+        "global": {"current_turn": 7}
+    }
+    popups = []
+    for popup_type, info in MONOPOLY_POPUPS.items():
+        if not info["expected_buttons"]:
+            continue
+        popups.append({
+            "popup_type": popup_type,
+            "popup_text": info["name"],
+            "message_ids": info.get("ram_message_ids", []),
+            "options": [{"name": b} for b in info["expected_buttons"]],
+            "game_context": context
+        })
+    return popups
+
+
+def load_popups(path: str) -> List[Dict]:
+    """Popups enregistrés (JSONL): popup_text, options, game_context, [popup_type, message_ids, image]"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class HttpTarget:
+    """Envoie les popups à un endpoint du serveur unifié (une session keep-alive par thread)"""
+
+    def __init__(self, url: str, build_payload: Callable[[Dict], Dict], timeout: float = 60):
+        self.url = url
+        self.build_payload = build_payload
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __call__(self, popup: Dict) -> bool:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        response = session.post(self.url, json=self.build_payload(popup), timeout=self.timeout)
+        return response.ok and response.json().get("success", False)
+
+
+def ai_payload(popup: Dict) -> Dict:
+    return {
+        "context": popup.get("game_context", {}),
+        "parsed_elements": {"parsed_content_list": [
+            {"type": "text", "content": popup.get("popup_text", "")}
+        ] + [{"type": "text", "content": o["name"]} for o in popup.get("options", [])]},
+        "type": "popup"
+    }
+
+
+def unified_payload(popup: Dict) -> Dict:
+    payload = {
+        "context": popup.get("game_context", {}),
+        "type": "popup",
+        "popup_type": popup.get("popup_type"),
+        "message_ids": popup.get("message_ids", [])
+    }
+    if popup.get("image"):
+        payload["image"] = popup["image"]
+    return payload
+
+
+class EventBusTarget:
+    """Passe par l'EventBus comme l'application: publication de la demande, attente de la décision"""
+
+    def __init__(self, timeout: float = 60):
+        from flask import Flask
+        from services.event_bus import EventBus, EventTypes
+        from services.ai_service import AIService
+
+        self.timeout = timeout
+        self.event_types = EventTypes
+        self.event_bus = EventBus(Flask(__name__))
+        self.ai_service = AIService(self.event_bus)
+        self._waiting: Dict[str, threading.Event] = {}
+        self._counter = itertools.count()
+        self.event_bus.subscribe(EventTypes.AI_DECISION_MADE, self._on_decision_made)
+
+    def _on_decision_made(self, event: dict):
+        waiter = self._waiting.get(event['data'].get('popup_id'))
+        if waiter:
+            waiter.set()
+
+    def __call__(self, popup: Dict) -> bool:
+        popup_id = f"load-{next(self._counter)}"
+        waiter = self._waiting[popup_id] = threading.Event()
+        try:
+            self.event_bus.publish(
+                self.event_types.AI_DECISION_REQUESTED,
+                {
+                    'popup_id': popup_id,
+                    'popup_text': popup.get('popup_text', ''),
+                    'options': popup.get('options', []),
+                    'game_context': popup.get('game_context', {})
+                },
+                source='load_generator'
+            )
+            return waiter.wait(self.timeout)
+        finally:
+            del self._waiting[popup_id]
+
+
+def run_load(name: str, target: Callable[[Dict], bool], popups: List[Dict],
+             total: int, concurrency: int) -> Dict:
+    """Rejoue `total` popups avec `concurrency` requêtes simultanées"""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(popup: Dict):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            ok = target(popup)
+        except Exception:
+            ok = False
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, itertools.islice(itertools.cycle(popups), total)))
+    duration = time.perf_counter() - started
+
+    return {
+        "target": name,
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(total / duration, 2) if duration else 0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "mean": round(sum(latencies) / len(latencies), 1) if latencies else 0,
+            "max": round(max(latencies), 1) if latencies else 0
+        }
+    }
+
+
+def print_report(report: Dict):
+    lat = report["latency_ms"]
+    print(f"\n📊 {report['target']}: {report['requests']} requêtes, concurrence {report['concurrency']}")
+    print(f"   Débit: {report['throughput_rps']} req/s en {report['duration_s']}s, erreurs: {report['errors']}")
+    print(f"   Latence: p50 {lat['p50']}ms | p95 {lat['p95']}ms | p99 {lat['p99']}ms | max {lat['max']}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Générateur de charge des services de décision")
+    parser.add_argument("--target", choices=["ai", "unified", "bus", "all"], default="all")
+    parser.add_argument("--decision-url", default="http://localhost:7000")
+    parser.add_argument("--popups", help="Fichier JSONL de popups enregistrés")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--output", help="Écrit le rapport JSON dans ce fichier")
+    args = parser.parse_args()
+
+    popups = load_popups(args.popups) if args.popups else default_popups()
+    names = ["ai", "unified", "bus"] if args.target == "all" else [args.target]
+
+    reports = []
+    for name in names:
+        if name == "ai":
+            target = HttpTarget(f"{args.decision_url}/api/decision/ai", ai_payload)
+        elif name == "unified":
+            target = HttpTarget(f"{args.decision_url}/api/decision/unified", unified_payload)
+        else:
+            target = EventBusTarget()
+        report = run_load(name, target, popups, args.requests, args.concurrency)
+        print_report(report)
+        reports.append(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
+        print(f"\n💾 Rapport enregistré dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@ from typing import Dict, Optional, List, Tuple
 import threading
 import queue
 from pathlib import Path
+import numpy as np
 
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -22,11 +23,13 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from src.core.memory_reader import MemoryReader
 from src.game.monopoly import MonopolyGame
 from src.game.contexte import Contexte
+from src.utils.screen_capture import ScreenCapture, CapturedFrame
+from src.utils.ring_buffer import RingBuffer
+from services.prompt_compactor import PromptCompactor
+from services.decision_scheduler import DecisionJob, DecisionScheduler, player_slot
+from services.tracing import correlation, correlation_headers, get_tracer, span
 import dolphin_memory_engine as dme
 import pyautogui
-from mss import mss
-from PIL import Image
-import io
 
 class ContinuousGameMonitor:
     """Continuously monitors game state and handles popups with AI decisions"""
@@ -39,6 +42,13 @@ class ContinuousGameMonitor:
         self.last_popup_time = 0
         self.popup_cooldown = 2.0  # seconds between popup checks
         
+        # Popup decisions run on one worker per player, off the monitoring loop
+        self.scheduler = DecisionScheduler(max_workers=4)
+        self.popup_jobs: Dict[str, object] = {}  # correlation id -> future
+        
+        # Per-stage spans (detect, capture, encode, decision request, click), exported on stop
+        self.tracer = get_tracer("monitor")
+        
         # Idle detection
         self.last_state_change = time.time()
         self.idle_timeout = 120.0  # 2 minutes
@@ -53,14 +63,20 @@ class ContinuousGameMonitor:
             "last_update": None
         }
         self.player_contexts = {}
+        # Fixed-size money/position histories (changes only), downsampled for prompts
+        self.history_capacity = 512
+        self.trend_points = 8
+        # Histories stay local: prompts only get the fixed-schema state
+        self.compactor = PromptCompactor()
         
         # Service URLs
         self.flask_url = "http://localhost:5000"
         self.omniparser_url = "http://localhost:8000"
         self.unified_url = "http://localhost:7000"
         
-        # Screen capture
-        self.sct = mss()
+        # Screen capture (Dolphin client area, downscaled to the detector input size).
+        # Each decision keeps its own frame to map clicks back to the screen
+        self.screen_capture = ScreenCapture()
         
     def initialize(self) -> bool:
         """Initialize connection to Dolphin"""
@@ -150,7 +166,8 @@ class ContinuousGameMonitor:
         
         # Check if state has changed
         state_hash = self._calculate_state_hash(game_state)
-        if state_hash != self.last_game_state_hash:
+        changed = state_hash != self.last_game_state_hash
+        if changed:
             self.last_state_change = time.time()
             self.last_game_state_hash = state_hash
             self.idle_check_triggered = False  # Reset idle check
@@ -166,8 +183,8 @@ class ContinuousGameMonitor:
             if player_id not in self.player_contexts:
                 self.player_contexts[player_id] = {
                     "id": player_id,
-                    "money_history": [],
-                    "position_history": [],
+                    "money_history": RingBuffer(self.history_capacity),
+                    "position_history": RingBuffer(self.history_capacity, dtype=np.int16),
                     "properties": [],
                     "strategy": "balanced"
                 }
@@ -175,14 +192,33 @@ class ContinuousGameMonitor:
             context = self.player_contexts[player_id]
             context["current_money"] = player["money"]
             context["current_position"] = player["position"]
-            context["money_history"].append({
-                "time": game_state["timestamp"],
-                "amount": player["money"]
-            })
-            context["position_history"].append({
-                "time": game_state["timestamp"],
-                "position": player["position"]
-            })
+            if changed or not len(context["money_history"]):
+                now = time.time()
+                context["money_history"].append(now, player["money"])
+                context["position_history"].append(now, player["position"])
+    
+    def compact_state(self) -> Dict:
+        """Current money, positions and threats, with a short money trend instead of the histories"""
+        state = self.compactor.compact_state({
+            "global_state": self.global_context,
+            "player_contexts": self.player_contexts
+        })
+        trends = self.history_views(self.trend_points)
+        for player in state["players"]:
+            money = trends.get(player["name"], {}).get("money")
+            if money and len(money) > 1:
+                player["trend"] = [value for _, value in money]
+        return state
+    
+    def history_views(self, points: int = 20) -> Dict[str, Dict[str, list]]:
+        """Downsampled (time, value) histories per player"""
+        return {
+            str(player_id): {
+                "money": context["money_history"].downsample(points),
+                "position": context["position_history"].downsample(points)
+            }
+            for player_id, context in self.player_contexts.items()
+        }
     
     def _calculate_state_hash(self, game_state: Dict) -> str:
         """Calculate a hash of the game state to detect changes"""
@@ -213,28 +249,28 @@ class ContinuousGameMonitor:
         except:
             return False
     
-    def capture_screen(self) -> str:
-        """Capture current screen and return as base64"""
+    def capture_screen(self) -> Optional[CapturedFrame]:
+        """Capture the Dolphin client area, downscaled, in memory"""
         try:
-            # Capture primary monitor
-            monitor = self.sct.monitors[1]
-            screenshot = self.sct.grab(monitor)
-            
-            # Convert to PIL Image
-            img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
-            
-            # Convert to base64
-            buffered = io.BytesIO()
-            img.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode()
-            
-            return img_str
+            with span('capture'):
+                return self.screen_capture.capture()
         except Exception as e:
             print(f"[ERROR] Failed to capture screen: {e}")
             return None
     
-    def process_popup_with_ai(self, screenshot_base64: str) -> Dict:
-        """Process popup with AI to get decision"""
+    def fetch_ram_popup(self) -> Dict:
+        """Popup messages currently in RAM (ids and texts) and the player they address, from the app"""
+        try:
+            response = requests.get(f"{self.flask_url}/api/popups/ram", timeout=1)
+            if response.ok:
+                return response.json()
+        except requests.RequestException:
+            pass
+        return {"messages": [], "player": None}
+    
+    def process_popup_with_ai(self, job: Optional[DecisionJob], frame: CapturedFrame,
+                              ram_messages: List[Dict]) -> Dict:
+        """Process popup with AI to get decision (runs on the player's scheduler worker)"""
         print("\n" + "="*50)
         print("POPUP DETECTED - REQUESTING AI DECISION")
         print("="*50)
@@ -242,23 +278,30 @@ class ContinuousGameMonitor:
         try:
             # Build context for AI
             context = {
-                "global_state": self.global_context,
-                "player_contexts": self.player_contexts,
+                "state": self.compact_state(),
                 "timestamp": datetime.now().isoformat()
             }
+            with span('encode', bytes=len(frame.data)):
+                screenshot_base64 = frame.base64()
             
             # Use unified decision server if available
             if self.check_service_available(self.unified_url):
                 print("\n[AI] Using Unified Decision Server...")
-                response = requests.post(
-                    f"{self.unified_url}/api/decision/unified",
-                    json={
-                        "image": screenshot_base64,
-                        "context": context,
-                        "type": "popup"
-                    },
-                    timeout=30
-                )
+                # RAM messages (confirmed by their text) let the server decide speculatively
+                with span('decision_request', server='unified'):
+                    response = requests.post(
+                        f"{self.unified_url}/api/decision/unified",
+                        json={
+                            "image": screenshot_base64,
+                            "context": context,
+                            "type": "popup",
+                            "player": job.player if job else None,
+                            "message_ids": [m["id"] for m in ram_messages],
+                            "popup_text": "\n".join(m["text"] for m in ram_messages)
+                        },
+                        headers=correlation_headers(),
+                        timeout=30
+                    )
                 
                 if response.ok:
                     result = response.json()
@@ -270,9 +313,14 @@ class ContinuousGameMonitor:
                     print(f"  Confidence: {decision.get('confidence', 0)}%")
                     print(f"  Reason: {decision.get('reason', 'No reason provided')}")
                     
-                    # Find the button to click based on decision
-                    if parsed_elements:
-                        self.execute_ai_decision(decision, parsed_elements)
+                    # Find the button to click based on decision (unless the popup closed meanwhile)
+                    if job and job.cancelled:
+                        print("[CANCELLED] Popup closed, decision not executed")
+                    elif result.get("coordinates"):
+                        # Speculative path: button located by the server (calibration or parse)
+                        self.click_at(frame, result["coordinates"], decision.get("action", ""))
+                    elif parsed_elements:
+                        self.execute_ai_decision(decision, parsed_elements, frame)
                     
                     return decision
             else:
@@ -284,7 +332,15 @@ class ContinuousGameMonitor:
             print(f"[ERROR] AI decision failed: {e}")
             return {"action": "no", "reason": "Error occurred"}
     
-    def execute_ai_decision(self, decision: Dict, parsed_elements: Dict):
+    def click_at(self, frame: CapturedFrame, coordinates: List[float], label: str):
+        """Click a point given in pixels of `frame`"""
+        x, y = frame.to_screen(*coordinates)
+        print(f"  [CLICK] '{label}' at ({x}, {y})")
+        with span('click', button=label):
+            pyautogui.click(x, y)
+        time.sleep(0.5)
+    
+    def execute_ai_decision(self, decision: Dict, parsed_elements: Dict, frame: CapturedFrame):
         """Execute the AI's decision by clicking the appropriate button"""
         action = decision.get("action", "").lower()
         parsed_content = parsed_elements.get("parsed_content_list", [])
@@ -310,13 +366,8 @@ class ContinuousGameMonitor:
                     if target in element_text:
                         bbox = element.get("bbox", [])
                         if len(bbox) >= 4:
-                            # Calculate click position (center of bbox)
-                            x = (bbox[0] + bbox[2]) // 2
-                            y = (bbox[1] + bbox[3]) // 2
-                            
-                            print(f"  [CLICK] Found '{element_text}' at ({x}, {y})")
-                            pyautogui.click(x, y)
-                            time.sleep(0.5)
+                            # Click the center of the bbox
+                            self.click_at(frame, [(bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2], element_text)
                             return
         
         print("  [WARNING] No matching button found for action")
@@ -358,8 +409,7 @@ class ContinuousGameMonitor:
         try:
             # Build enhanced context for idle situation
             context = {
-                "global_state": self.global_context,
-                "player_contexts": self.player_contexts,
+                "state": self.compact_state(),
                 "timestamp": datetime.now().isoformat(),
                 "idle_trigger": True,
                 "idle_duration": time.time() - self.last_state_change,
@@ -373,7 +423,7 @@ class ContinuousGameMonitor:
                 response = requests.post(
                     f"{self.unified_url}/api/decision/unified",
                     json={
-                        "image": screenshot,
+                        "image": screenshot.base64(),
                         "context": context,
                         "type": "idle_action"
                     },
@@ -391,7 +441,7 @@ class ContinuousGameMonitor:
                     print(f"  Reason: {decision.get('reason', 'No reason provided')}")
                     
                     # Execute the idle action
-                    self.execute_idle_action(decision, parsed_elements)
+                    self.execute_idle_action(decision, parsed_elements, screenshot)
                 else:
                     print(f"[ERROR] AI service returned error: {response.status_code}")
             else:
@@ -402,7 +452,7 @@ class ContinuousGameMonitor:
         except Exception as e:
             print(f"[ERROR] Failed to handle idle state: {e}")
     
-    def execute_idle_action(self, decision: Dict, parsed_elements: Dict):
+    def execute_idle_action(self, decision: Dict, parsed_elements: Dict, frame: CapturedFrame):
         """Execute action for idle state"""
         action = decision.get("action", "").lower()
         parsed_content = parsed_elements.get("parsed_content_list", [])
@@ -427,10 +477,10 @@ class ContinuousGameMonitor:
                     if action == action_type or any(kw in element_text for kw in keywords):
                         bbox = element.get("bbox", [])
                         if len(bbox) >= 4:
-                            x = (bbox[0] + bbox[2]) // 2
-                            y = (bbox[1] + bbox[3]) // 2
+                            x, y = frame.to_screen((bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2)
                             print(f"  [CLICK] Found '{element_text}' at ({x}, {y})")
-                            pyautogui.click(x, y)
+                            with span('click', button=element_text):
+                                pyautogui.click(x, y)
                             time.sleep(1)
                             self.idle_check_triggered = True
                             return
@@ -477,14 +527,32 @@ class ContinuousGameMonitor:
                               f"Time: {datetime.now().strftime('%H:%M:%S')}", end="")
                     last_state_read = current_time
                 
+                # Drop a pending decision as soon as its popup leaves RAM
+                self.popup_jobs = {job_id: f for job_id, f in self.popup_jobs.items() if not f.done()}
+                if self.popup_jobs and not self.detect_popup():
+                    self.cancel_popup_jobs()
+                
                 # Check for popups
                 if current_time - self.last_popup_time >= self.popup_cooldown:
+                    detect_started = time.perf_counter_ns()
                     if self.detect_popup():
-                        print("\n\n[ALERT] POPUP DETECTED!")
-                        screenshot = self.capture_screen()
-                        if screenshot:
-                            self.process_popup_with_ai(screenshot)
-                        self.last_popup_time = current_time
+                        # The popup's owner (named in its RAM text, else the app's current player)
+                        ram_popup = self.fetch_ram_popup()
+                        player = ram_popup.get("player") or player_slot(self.global_context['current_turn'])
+                        if not self.scheduler.pending(player):
+                            print("\n\n[ALERT] POPUP DETECTED!")
+                            # One correlation id per popup, carried to the servers in X-Correlation-ID
+                            with correlation() as correlation_id:
+                                self.tracer.record('detect', detect_started, time.perf_counter_ns(),
+                                                   source='memory_flags')
+                                frame = self.capture_screen()
+                                if frame:
+                                    # The job owns its frame: parallel workers never share one
+                                    self.popup_jobs[correlation_id] = self.scheduler.submit(
+                                        player, correlation_id, self.process_popup_with_ai,
+                                        frame, ram_popup.get("messages", [])
+                                    )
+                    self.last_popup_time = current_time
                 
                 # Check for idle state (2 minutes with no changes)
                 if not self.idle_check_triggered and (current_time - self.last_state_change) >= self.idle_timeout:
@@ -513,9 +581,21 @@ class ContinuousGameMonitor:
         finally:
             self.stop()
     
+    def cancel_popup_jobs(self):
+        """Cancel decisions whose popup is no longer displayed"""
+        for job_id in list(self.popup_jobs):
+            if self.scheduler.cancel(job_id):
+                print(f"\n[CANCELLED] Popup closed before decision {job_id}")
+        self.popup_jobs.clear()
+    
     def stop(self):
         """Stop the monitoring system"""
         self.running = False
+        self.scheduler.close()
+        try:
+            print(f"\n[TRACE] Spans exported to {self.tracer.export_chrome_trace()}")
+        except OSError as e:
+            print(f"\n[TRACE] Failed to export spans: {e}")
         if dme.is_hooked():
             dme.un_hook()
         print("\n[MONITOR] Stopped")
@@ -538,6 +618,8 @@ class ContinuousGameMonitor:
             print(f"    Money: ${context.get('current_money', 0)}")
             print(f"    Position: {context.get('current_position', 0)}")
             print(f"    Properties: {len(context.get('properties', []))}")
+            print(f"    History: {context['money_history'].total} changes "
+                  f"({context['money_history'].nbytes() + context['position_history'].nbytes()} bytes)")
             print(f"    Strategy: {context.get('strategy', 'unknown')}")
 
 
@@ -8,11 +8,19 @@ import torch
 import base64
 import json
 import io
+import time
+import shutil
+import threading
+import asyncio
+import difflib
+import hashlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from PIL import Image
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import uvicorn
 import numpy as np
 
@@ -30,51 +38,258 @@ app = FastAPI(title="OmniParser Lite API", version="1.0.0")
 DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'
 print(f"\n✅ Utilisation du {DEVICE.upper()}")
 
-# Import des modèles
-try:
-    from ultralytics import YOLO
-    from transformers import AutoProcessor, AutoModelForCausalLM
+# Les bibliothèques lourdes (ultralytics, easyocr, transformers) et les modèles
+# sont chargés paresseusement par le ModelRegistry, pour que l'API réponde tout de suite
+MODEL_CACHE_DIR = Path(os.getenv("OMNIPARSER_MODEL_DIR", "weights"))
+YOLO_WEIGHTS = MODEL_CACHE_DIR / "yolov8s.pt"
+FLORENCE_WEIGHTS = MODEL_CACHE_DIR / "icon_caption_florence"
+
+class ModelRegistry:
+    """Charge les modèles à la demande (ou en tâche de fond) et suit leur état"""
+    
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._status = {}
+        self._locks = {}
+        self._inference_locks = {}
+    
+    def register(self, name: str, loader, warmup: bool = True):
+        self._loaders[name] = (loader, warmup)
+        self._status[name] = {"state": "pending"}
+        self._locks[name] = threading.Lock()
+        self._inference_locks[name] = threading.Lock()
+    
+    def inference_lock(self, name: str) -> threading.Lock:
+        """Verrou à tenir pendant l'inférence sur un modèle qui n'est pas thread-safe"""
+        return self._inference_locks[name]
+    
+    def get(self, name: str):
+        """Retourne le modèle, en le chargeant si nécessaire (None si indisponible)"""
+        if name in self._models:
+            return self._models[name]
+        with self._locks[name]:
+            if name in self._models:
+                return self._models[name]
+            
+            loader, _ = self._loaders[name]
+            status = self._status[name]
+            status["state"] = "loading"
+            started = time.perf_counter()
+            try:
+                model = loader()
+                status["state"] = "ready" if model is not None else "unavailable"
+                print(f"✅ {name} {'chargé' if model is not None else 'non disponible'}")
+            except Exception as e:
+                model = None
+                status["state"] = "failed"
+                status["error"] = str(e)
+                print(f"⚠️ {name} non chargé: {e}")
+            status["load_seconds"] = round(time.perf_counter() - started, 2)
+            self._models[name] = model
+            return model
+    
+    def state(self, name: str) -> str:
+        return self._status[name]["state"]
+    
+    def is_ready(self, names) -> bool:
+        """Chargement terminé pour tous ces modèles (réussi, absent ou en échec)"""
+        return all(self.state(name) in ("ready", "unavailable", "failed") for name in names)
+    
+    def errors(self, names) -> Dict[str, str]:
+        """Erreur de chargement des modèles en échec"""
+        return {name: self._status[name].get("error", "") for name in names if self.state(name) == "failed"}
+    
+    def warmup_in_background(self):
+        """Charge les modèles marqués `warmup` dans un thread séparé"""
+        names = [name for name, (_, warmup) in self._loaders.items() if warmup]
+        threading.Thread(target=lambda: [self.get(name) for name in names], daemon=True).start()
+    
+    def get_status(self) -> Dict[str, Any]:
+        return {name: dict(status) for name, status in self._status.items()}
+
+def ensure_yolo_weights() -> str:
+    """Télécharge yolov8s.pt une seule fois dans le cache de modèles"""
+    if not YOLO_WEIGHTS.exists():
+        from ultralytics import YOLO
+        
+        print("📥 Téléchargement de yolov8s.pt...")
+        MODEL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        YOLO(YOLO_WEIGHTS.name)  # Téléchargé dans le dossier courant
+        if Path(YOLO_WEIGHTS.name).exists():
+            shutil.move(YOLO_WEIGHTS.name, YOLO_WEIGHTS)
+    return str(YOLO_WEIGHTS) if YOLO_WEIGHTS.exists() else YOLO_WEIGHTS.name
+
+# Backend d'inférence: "torch", "onnx" (CPU, ONNX Runtime int8) ou "auto"
+BACKEND = os.getenv("OMNIPARSER_BACKEND", "auto").lower()
+CPU_THREADS = int(os.getenv("OMNIPARSER_THREADS", str(os.cpu_count() or 4)))
+ONNX_WEIGHTS = os.getenv("OMNIPARSER_ONNX_WEIGHTS", str(MODEL_CACHE_DIR / "yolov8s.int8.onnx"))
+YOLO_INPUT_SIZE = 640
+
+if BACKEND == "auto":
+    BACKEND = "torch" if torch.cuda.is_available() else "onnx"
+if DEVICE == 'cpu':
+    torch.set_num_threads(CPU_THREADS)
+
+class OnnxYoloDetector:
+    """Détecteur YOLOv8 exporté en ONNX, quantifié int8, exécuté sur ONNX Runtime (CPU)"""
+    
+    def __init__(self, quantized_path: str = ONNX_WEIGHTS, source_weights: str = None,
+                 threads: int = CPU_THREADS, imgsz: int = YOLO_INPUT_SIZE, conf_threshold: float = 0.5):
+        import onnxruntime as ort
+        
+        self.imgsz = imgsz
+        self.conf_threshold = conf_threshold
+        if not os.path.exists(quantized_path):
+            self._export_quantized(source_weights or ensure_yolo_weights(), quantized_path)
+        
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(quantized_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+    
+    def _export_quantized(self, source_weights: str, quantized_path: str):
+        """Exporte le modèle PyTorch en ONNX puis le quantifie en int8 (une seule fois)"""
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        from ultralytics import YOLO
+        
+        print(f"📦 Export ONNX de {source_weights}...")
+        onnx_path = YOLO(source_weights).export(format="onnx", imgsz=self.imgsz, dynamic=True, simplify=True)
+        os.makedirs(os.path.dirname(quantized_path) or ".", exist_ok=True)
+        quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QUInt8)
+        print(f"✅ Modèle quantifié int8 → {quantized_path}")
+    
+    def _letterbox(self, image_np: np.ndarray):
+        """Redimensionne en conservant le ratio et complète jusqu'à imgsz x imgsz"""
+        h, w = image_np.shape[:2]
+        ratio = min(self.imgsz / h, self.imgsz / w)
+        new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+        resized = np.array(Image.fromarray(image_np).resize((new_w, new_h), Image.BILINEAR))
+        pad_x, pad_y = (self.imgsz - new_w) // 2, (self.imgsz - new_h) // 2
+        canvas = np.full((self.imgsz, self.imgsz, 3), 114, dtype=np.uint8)
+        canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = resized
+        return canvas, ratio, pad_x, pad_y
+    
+    def detect(self, images: List[np.ndarray]) -> List[List["ParsedElement"]]:
+        letterboxed = [self._letterbox(image_np) for image_np in images]
+        batch = np.stack([canvas for canvas, _, _, _ in letterboxed]).astype(np.float32) / 255.0
+        outputs = self.session.run(None, {self.input_name: batch.transpose(0, 3, 1, 2)})[0]
+        
+        return [
+            self._postprocess(output, ratio, pad_x, pad_y)
+            for output, (_, ratio, pad_x, pad_y) in zip(outputs, letterboxed)
+        ]
+    
+    def _postprocess(self, output: np.ndarray, ratio: float, pad_x: int, pad_y: int) -> List["ParsedElement"]:
+        """Décode la sortie YOLOv8 (4 + classes, N ancres) avec NMS"""
+        import cv2
+        
+        predictions = output.T
+        scores = predictions[:, 4:]
+        classes = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(classes)), classes]
+        keep = confidences > self.conf_threshold
+        if not keep.any():
+            return []
+        
+        cx, cy, w, h = predictions[keep, :4].T
+        classes, confidences = classes[keep], confidences[keep]
+        x1 = (cx - w / 2 - pad_x) / ratio
+        y1 = (cy - h / 2 - pad_y) / ratio
+        boxes = np.stack([x1, y1, w / ratio, h / ratio], axis=1)
+        
+        indices = cv2.dnn.NMSBoxesBatched(boxes.tolist(), confidences.tolist(), classes.tolist(), self.conf_threshold, 0.45)
+        elements = []
+        for i in np.array(indices).flatten():
+            bx, by, bw, bh = boxes[i]
+            elements.append(ParsedElement(
+                type="icon",
+                content=f"object_{int(classes[i])}",
+                bbox=[float(bx), float(by), float(bx + bw), float(by + bh)],
+                confidence=float(confidences[i])
+            ))
+        return elements
+
+class FastOcr:
+    """OCR rapide pour CPU: RapidOCR (ONNX Runtime) si installé, sinon EasyOCR avec un canvas réduit"""
+    
+    def __init__(self, easyocr_reader, canvas_size: int = 1280):
+        self.easyocr_reader = easyocr_reader
+        self.canvas_size = canvas_size
+        try:
+            from rapidocr_onnxruntime import RapidOCR
+            self.engine = RapidOCR(intra_op_num_threads=CPU_THREADS)
+            self.name = "rapidocr"
+        except ImportError:
+            self.engine = None
+            self.name = "easyocr-fast"
+    
+    def readtext(self, image_np: np.ndarray):
+        """Même format de sortie que easyocr: [(bbox, texte, confiance)]"""
+        if self.engine is None:
+            return self.easyocr_reader.readtext(image_np, canvas_size=self.canvas_size, mag_ratio=1.0)
+        result, _ = self.engine(image_np[:, :, ::-1])  # RapidOCR attend du BGR
+        return [(box, text, float(score)) for box, text, score in (result or [])]
+
+def load_ocr():
     import easyocr
-    print("✅ Modules importés avec succès")
-except ImportError as e:
-    print(f"❌ Erreur d'import: {e}")
-    print("Installez les dépendances: pip install ultralytics transformers==4.49.0 easyocr")
-    sys.exit(1)
-
-# Initialisation des modèles
-print("\n📥 Chargement des modèles...")
-
-# OCR
-reader = easyocr.Reader(['en'], gpu=torch.cuda.is_available())
-print("✅ EasyOCR initialisé")
-
-# YOLO pour la détection d'icônes
-try:
-    # Télécharger YOLO si nécessaire
-    yolo_model = YOLO('yolov8s.pt')
+    reader = easyocr.Reader(['en'], gpu=torch.cuda.is_available())
+    return FastOcr(reader) if BACKEND == "onnx" else reader
+
+def load_detector():
+    """YOLO sur ONNX Runtime int8 (backend onnx) ou sur PyTorch.
+    
+    BACKEND n'est pas modifié en cas de repli: l'OCR a déjà été choisi d'après
+    lui. Le backend effectif du détecteur est donné par `detector_backend()`.
+    """
+    if BACKEND == "onnx":
+        try:
+            detector = OnnxYoloDetector()
+            print(f"✅ Backend CPU ONNX Runtime int8 ({CPU_THREADS} threads)")
+            return detector
+        except Exception as e:
+            print(f"⚠️ Backend ONNX indisponible ({e}), détecteur sur PyTorch")
+    
+    from ultralytics import YOLO
+    yolo_model = YOLO(ensure_yolo_weights())
     yolo_model.to(DEVICE)
-    print("✅ YOLO chargé")
-except:
-    print("⚠️ YOLO non disponible, détection simplifiée")
-    yolo_model = None
-
-# Florence-2 pour les captions (optionnel)
-try:
-    if os.path.exists("weights/icon_caption_florence"):
-        processor = AutoProcessor.from_pretrained("weights/icon_caption_florence", trust_remote_code=True)
-        caption_model = AutoModelForCausalLM.from_pretrained("weights/icon_caption_florence", trust_remote_code=True).to(DEVICE)
-        print("✅ Florence-2 chargé")
-    else:
-        processor = None
-        caption_model = None
-        print("⚠️ Florence-2 non disponible")
-except:
-    processor = None
-    caption_model = None
-    print("⚠️ Florence-2 non chargé")
+    return yolo_model
+
+def detector_backend() -> Optional[str]:
+    """Backend effectivement utilisé par le détecteur (None tant qu'il n'est pas chargé)"""
+    if models.state("detector") != "ready":
+        return None
+    return "onnx" if isinstance(models.get("detector"), OnnxYoloDetector) else "torch"
+
+def load_florence():
+    """Florence-2 pour les captions (optionnel, chargé seulement si une requête le demande)"""
+    if not FLORENCE_WEIGHTS.exists():
+        return None
+    from transformers import AutoProcessor, AutoModelForCausalLM
+    processor = AutoProcessor.from_pretrained(str(FLORENCE_WEIGHTS), trust_remote_code=True)
+    caption_model = AutoModelForCausalLM.from_pretrained(str(FLORENCE_WEIGHTS), trust_remote_code=True).to(DEVICE)
+    return processor, caption_model
+
+# Sur CPU l'OCR est limité par le GIL: un pool de processus (un lecteur par processus)
+# parallélise réellement les popups. Sur GPU un pool de threads suffit.
+OCR_WORKERS = int(os.getenv("OMNIPARSER_OCR_WORKERS", "2"))
+OCR_PROCESSES = os.getenv("OMNIPARSER_OCR_PROCESSES", "auto").lower()
+OCR_IN_PROCESSES = DEVICE == "cpu" if OCR_PROCESSES == "auto" else OCR_PROCESSES in ("1", "true", "yes")
+
+models = ModelRegistry()
+models.register("ocr", load_ocr, warmup=not OCR_IN_PROCESSES)  # Chargé par chaque processus OCR sinon
+models.register("detector", load_detector)
+models.register("florence", load_florence, warmup=False)
 
 class ImageRequest(BaseModel):
     base64_image: str
+    captions: bool = False
+    # Mode texte ciblé: OCR uniquement sur ces zones [x1, y1, x2, y2] (pixels), sans détection
+    regions: Optional[List[List[float]]] = None
+    keywords: Optional[List[str]] = None
 
 class ParsedElement(BaseModel):
     type: str
@@ -87,18 +302,28 @@ class ParseResponse(BaseModel):
     success: bool = True
     message: str = "OK"
 
-def parse_image_lite(base64_img: str) -> List[ParsedElement]:
-    """Parse une image avec détection simplifiée"""
-    # Décoder l'image
+class BatchImageRequest(BaseModel):
+    images: List[str]
+
+class BatchParseResponse(BaseModel):
+    results: List[ParseResponse]
+    batch_size: int
+    latency_ms: float
+
+def decode_image(base64_img: str) -> np.ndarray:
+    """Décode une image base64 en tableau RGB"""
     image_data = base64.b64decode(base64_img)
     image = Image.open(io.BytesIO(image_data)).convert('RGB')
-    image_np = np.array(image)
-    
+    return np.array(image)
+
+def ocr_elements(image_np: np.ndarray) -> List[ParsedElement]:
+    """OCR pour le texte d'une image"""
     elements = []
-    
-    # 1. OCR pour le texte
     try:
-        ocr_results = reader.readtext(image_np)
+        ocr = models.get("ocr")
+        # Le lecteur EasyOCR est partagé par les threads du pool (un par processus sinon)
+        with models.inference_lock("ocr"):
+            ocr_results = ocr.readtext(image_np)
         for (bbox, text, conf) in ocr_results:
             if conf > 0.5:  # Seuil de confiance
                 x1, y1 = bbox[0]
@@ -111,34 +336,400 @@ def parse_image_lite(base64_img: str) -> List[ParsedElement]:
                 ))
     except Exception as e:
         print(f"Erreur OCR: {e}")
+    return elements
+
+def recognize_regions(image_np: np.ndarray, regions: List[List[float]],
+                      keywords: Optional[List[str]] = None) -> List[ParsedElement]:
+    """OCR de reconnaissance seule sur des zones connues (boutons calibrés), sans détection de texte.
     
-    # 2. Détection d'objets avec YOLO (si disponible)
-    if yolo_model:
-        try:
-            results = yolo_model(image_np)
-            for r in results:
-                boxes = r.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        x1, y1, x2, y2 = box.xyxy[0].tolist()
-                        conf = box.conf[0].item()
-                        cls = int(box.cls[0].item())
-                        
-                        # Filtrer certains types d'objets comme boutons
-                        if conf > 0.5:
-                            elements.append(ParsedElement(
-                                type="icon",
-                                content=f"object_{cls}",
-                                bbox=[float(x1), float(y1), float(x2), float(y2)],
-                                confidence=float(conf)
-                            ))
-        except Exception as e:
-            print(f"Erreur YOLO: {e}")
+    Le texte reconnu est rapproché du mot-clé attendu le plus proche; si des
+    mots-clés sont fournis, les zones sans correspondance sont ignorées.
+    """
+    ocr = models.get("ocr")
+    reader = getattr(ocr, "easyocr_reader", ocr)
+    height, width = image_np.shape[:2]
+    
+    boxes = []
+    for x1, y1, x2, y2 in regions:
+        x1, x2 = max(0, int(x1)), min(width, int(x2))
+        y1, y2 = max(0, int(y1)), min(height, int(y2))
+        if x2 > x1 and y2 > y1:
+            boxes.append([x1, x2, y1, y2])  # Format horizontal_list d'EasyOCR
+    if not boxes:
+        return []
+    
+    gray = np.array(Image.fromarray(image_np).convert('L'))
+    lowered = [k.lower() for k in keywords] if keywords else []
+    elements = []
+    with models.inference_lock("ocr"):
+        recognized = reader.recognize(gray, horizontal_list=boxes, free_list=[])
+    for box, text, conf in recognized:
+        (x1, y1), (x2, y2) = box[0], box[2]
+        content = text.strip()
+        if lowered:
+            match = difflib.get_close_matches(content.lower(), lowered, n=1, cutoff=0.6)
+            if not match:
+                continue
+            content = keywords[lowered.index(match[0])]
+        elif conf <= 0.3:
+            continue
+        elements.append(ParsedElement(
+            type="text",
+            content=content,
+            bbox=[float(x1), float(y1), float(x2), float(y2)],
+            confidence=float(conf)
+        ))
+    return elements
+
+def yolo_elements(result) -> List[ParsedElement]:
+    """Convertit un résultat YOLO en éléments de type icône"""
+    elements = []
+    boxes = result.boxes
+    if boxes is not None:
+        for box in boxes:
+            x1, y1, x2, y2 = box.xyxy[0].tolist()
+            conf = box.conf[0].item()
+            cls = int(box.cls[0].item())
+            
+            # Filtrer certains types d'objets comme boutons
+            if conf > 0.5:
+                elements.append(ParsedElement(
+                    type="icon",
+                    content=f"object_{cls}",
+                    bbox=[float(x1), float(y1), float(x2), float(y2)],
+                    confidence=float(conf)
+                ))
+    return elements
+
+def detect_icons(images: List[np.ndarray]) -> List[List[ParsedElement]]:
+    """Détection d'icônes sur le backend actif (ONNX Runtime ou PyTorch)"""
+    detector = models.get("detector")
+    if isinstance(detector, OnnxYoloDetector):
+        return detector.detect(images)  # InferenceSession.run est thread-safe
+    if detector:
+        # Le predictor ultralytics garde un état par appel: un seul batch à la fois
+        with models.inference_lock("detector"):
+            results = detector(images, verbose=False)
+        return [yolo_elements(r) for r in results]
+    return [[] for _ in images]
+
+def caption_icons(image_np: np.ndarray, elements: List[ParsedElement]) -> List[ParsedElement]:
+    """Remplace le nom générique des icônes par une légende Florence-2"""
+    florence = models.get("florence")
+    icons = [elem for elem in elements if elem.type == "icon"]
+    if florence is None or not icons:
+        return elements
+    
+    processor, caption_model = florence
+    image = Image.fromarray(image_np)
+    crops = [image.crop(tuple(int(v) for v in elem.bbox)).resize((64, 64)) for elem in icons]
+    inputs = processor(images=crops, text=["<CAPTION>"] * len(crops), return_tensors="pt").to(DEVICE)
+    with models.inference_lock("florence"), torch.no_grad():
+        generated = caption_model.generate(
+            input_ids=inputs["input_ids"],
+            pixel_values=inputs["pixel_values"],
+            max_new_tokens=20,
+            num_beams=1,
+            do_sample=False
+        )
+    for elem, caption in zip(icons, processor.batch_decode(generated, skip_special_tokens=True)):
+        elem.content = caption.strip()
+    return elements
+
+def parse_images_batch(images: List[np.ndarray]) -> List[List[ParsedElement]]:
+    """Parse plusieurs images: OCR en parallèle sur le pool, YOLO en un seul appel batché"""
+    # 1. OCR pour le texte (une image par worker)
+    ocr_futures = [ocr_pool.submit(ocr_elements, image_np) for image_np in images]
+    
+    # 2. Détection d'objets avec YOLO (si disponible), toutes les images en un appel
+    icons = [[] for _ in images]
+    try:
+        icons = detect_icons(images)
+    except Exception as e:
+        print(f"Erreur YOLO: {e}")
     
     # 3. Détection simple de boutons par couleur/forme
     # (Ajouter ici une logique de détection basique si nécessaire)
     
-    return elements
+    return [future.result() + icon_elements for future, icon_elements in zip(ocr_futures, icons)]
+
+def parse_image_lite(base64_img: str) -> List[ParsedElement]:
+    """Parse une image avec détection simplifiée"""
+    return parse_images_batch([decode_image(base64_img)])[0]
+
+def _init_ocr_worker():
+    """Initialise un processus OCR: un thread torch et un lecteur chargé une fois pour toutes"""
+    torch.set_num_threads(1)
+    models.get("ocr")
+
+def _ocr_worker_state() -> str:
+    """État du lecteur OCR dans le processus du pool qui exécute l'appel"""
+    return models.state("ocr")
+
+class QueueFullError(Exception):
+    """Levée quand la file d'attente d'inférence est pleine"""
+    pass
+
+class MicroBatcher:
+    """Regroupe les requêtes concurrentes reçues dans une courte fenêtre en un seul batch.
+    
+    `concurrency` batches peuvent être traités en parallèle; au-delà de
+    `max_queue` images en attente, les nouvelles requêtes sont refusées.
+    Les modèles non thread-safe (YOLO PyTorch, lecteur OCR partagé) restent
+    protégés par leur verrou d'inférence: seules les autres étapes se
+    chevauchent.
+    """
+    
+    def __init__(self, window_ms: float = 10.0, max_batch: int = 8, concurrency: int = 1, max_queue: int = 32):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue: asyncio.Queue = None
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+        self.pending = 0  # Images en attente ou en cours de traitement
+        self.stats = {"batches": 0, "images": 0, "busy_seconds": 0.0, "rejected": 0}
+        self.recent = deque(maxlen=100)  # (taille, latence en ms) des derniers batches
+    
+    def start(self):
+        self.queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        for _ in range(self.concurrency):
+            loop.create_task(self._run())
+    
+    async def submit(self, image_np: np.ndarray) -> List[ParsedElement]:
+        if self.pending >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise QueueFullError(f"{self.pending} images en attente")
+        
+        self.pending += 1
+        try:
+            future = asyncio.get_running_loop().create_future()
+            await self.queue.put((image_np, future))
+            return await future
+        finally:
+            self.pending -= 1
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            images = [image_np for image_np, _ in batch]
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.executor, parse_images_batch, images)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                elapsed = time.perf_counter() - started
+                self.stats["batches"] += 1
+                self.stats["images"] += len(batch)
+                self.stats["busy_seconds"] += elapsed
+                self.recent.append((len(batch), elapsed * 1000))
+            
+            for (_, future), elements in zip(batch, results):
+                if not future.done():
+                    future.set_result(elements)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        recent_latencies = sorted(latency for _, latency in self.recent)
+        busy = self.stats["busy_seconds"]
+        return {
+            "batches": self.stats["batches"],
+            "images": self.stats["images"],
+            "avg_batch_size": self.stats["images"] / self.stats["batches"] if self.stats["batches"] else 0,
+            "throughput_images_per_s": self.stats["images"] / busy if busy else 0,
+            "batch_latency_ms": {
+                "avg": sum(recent_latencies) / len(recent_latencies) if recent_latencies else 0,
+                "p50": recent_latencies[len(recent_latencies) // 2] if recent_latencies else 0,
+                "max": recent_latencies[-1] if recent_latencies else 0
+            },
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "concurrency": self.concurrency,
+            "pending": self.pending,
+            "max_queue": self.max_queue,
+            "rejected": self.stats["rejected"]
+        }
+
+if OCR_IN_PROCESSES:
+    ocr_pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, initializer=_init_ocr_worker)
+else:
+    ocr_pool = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+ocr_pool_probes = []  # Une sonde par processus OCR, soumise au démarrage
+
+def ocr_pool_status() -> Dict[str, Any]:
+    """Préparation du pool OCR: lecteur partagé (threads) ou lecteurs chargés par les processus"""
+    if not OCR_IN_PROCESSES:
+        return {"type": "threads", "workers": OCR_WORKERS, "ready": models.is_ready(["ocr"]),
+                "errors": list(models.errors(["ocr"]).values())}
+    
+    states, errors = [], []
+    for probe in ocr_pool_probes:
+        if not probe.done():
+            states.append("loading")
+        elif probe.exception() is not None:
+            states.append("failed")
+            errors.append(str(probe.exception()))
+        else:
+            states.append(probe.result())
+            if probe.result() == "failed":
+                errors.append("Lecteur OCR non chargé dans un processus du pool")
+    broken = getattr(ocr_pool, "_broken", False)  # Un processus est mort: le pool refuse tout
+    return {
+        "type": "processes",
+        "workers": OCR_WORKERS,
+        "ready": bool(states) and not broken and all(
+            state in ("ready", "unavailable", "failed") for state in states),
+        "broken": bool(broken),
+        "states": states,
+        "errors": errors
+    }
+
+batcher = MicroBatcher(
+    window_ms=float(os.getenv("OMNIPARSER_BATCH_WINDOW_MS", "10")),
+    max_batch=int(os.getenv("OMNIPARSER_MAX_BATCH", "8")),
+    # Avec PyTorch les batches s'attendraient sur le verrou du détecteur: un seul à la fois par défaut
+    concurrency=int(os.getenv("OMNIPARSER_MAX_CONCURRENCY", "1" if BACKEND == "torch" else "2")),
+    max_queue=int(os.getenv("OMNIPARSER_MAX_QUEUE", "32"))
+)
+
+class ResultCache:
+    """Cache LRU des réponses de /parse/, borné en octets.
+    
+    Clé: hash SHA-256 du contenu de l'image + paramètres du parsing. Une clé
+    d'idempotence fournie par le client pointe vers la même entrée, et les
+    requêtes identiques simultanées partagent un seul calcul.
+    """
+    
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_idempotency_keys: int = 4096):
+        self.max_bytes = max_bytes
+        self.max_idempotency_keys = max_idempotency_keys
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # clé -> (réponse, taille)
+        self._idempotency: "OrderedDict[str, str]" = OrderedDict()  # clé client -> clé de cache
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "idempotent_hits": 0, "coalesced": 0, "evictions": 0}
+    
+    @staticmethod
+    def make_key(image_b64: str, **params) -> str:
+        digest = hashlib.sha256(base64.b64decode(image_b64)).hexdigest()
+        if any(params.values()):
+            digest += ":" + hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+        return digest
+    
+    def lookup_idempotent(self, idempotency_key: Optional[str]) -> Optional[dict]:
+        cache_key = self._idempotency.get(idempotency_key) if idempotency_key else None
+        entry = self._entries.get(cache_key) if cache_key else None
+        if entry is None:
+            return None
+        self._entries.move_to_end(cache_key)
+        self.stats["hits"] += 1
+        self.stats["idempotent_hits"] += 1
+        return entry[0]
+    
+    async def get_or_compute(self, cache_key: str, compute, idempotency_key: Optional[str] = None):
+        """Retourne (réponse, hit) en ne calculant qu'une fois par contenu"""
+        if idempotency_key:
+            self._idempotency[idempotency_key] = cache_key
+            self._idempotency.move_to_end(idempotency_key)
+            while len(self._idempotency) > self.max_idempotency_keys:
+                self._idempotency.popitem(last=False)
+        
+        entry = self._entries.get(cache_key)
+        if entry is not None:
+            self._entries.move_to_end(cache_key)
+            self.stats["hits"] += 1
+            return entry[0], True
+        
+        if cache_key in self._inflight:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(self._inflight[cache_key]), True
+        
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        try:
+            result = await compute()
+            future.set_result(result)
+            self._store(cache_key, result)
+            return result, False
+        except BaseException as e:
+            # Requête annulée (client déconnecté) ou en erreur: libérer les requêtes en attente
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # Évite l'avertissement si personne n'attendait
+            raise
+        finally:
+            del self._inflight[cache_key]
+    
+    def _store(self, cache_key: str, result: dict):
+        size = len(json.dumps(result))
+        if size > self.max_bytes:
+            return
+        self._entries[cache_key] = (result, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.stats["evictions"] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "idempotency_keys": len(self._idempotency)
+        }
+
+result_cache = ResultCache(max_bytes=int(os.getenv("OMNIPARSER_CACHE_MB", "64")) * 1024 * 1024)
+
+def queue_full_response(e: QueueFullError) -> HTTPException:
+    """503 avec Retry-After: le client peut réessayer plutôt que d'attendre indéfiniment"""
+    return HTTPException(status_code=503, detail=f"Server busy: {e}", headers={"Retry-After": "1"})
+
+def to_parse_response(parsed_elements: List[ParsedElement]) -> ParseResponse:
+    """Convertit les éléments détectés au format attendu par les clients"""
+    parsed_content_list = []
+    for elem in parsed_elements:
+        parsed_content_list.append({
+            "type": elem.type,
+            "content": elem.content,
+            "bbox": elem.bbox,
+            "confidence": elem.confidence
+        })
+    
+    return ParseResponse(
+        parsed_content_list=parsed_content_list,
+        success=True,
+        message=f"Found {len(parsed_elements)} elements"
+    )
+
+@app.on_event("startup")
+async def start_batcher():
+    batcher.start()
+    models.warmup_in_background()
+    if OCR_IN_PROCESSES:
+        # Démarre les processus OCR (et leur lecteur) sans attendre une requête; /health suit les sondes
+        ocr_pool_probes.extend(ocr_pool.submit(_ocr_worker_state) for _ in range(OCR_WORKERS))
 
 @app.get("/")
 async def root():
@@ -146,12 +737,10 @@ async def root():
         "message": "OmniParser Lite Server", 
         "status": "running",
         "device": DEVICE,
+        "backend": BACKEND,
+        "detector_backend": detector_backend(),
         "gpu_available": torch.cuda.is_available(),
-        "models": {
-            "ocr": True,
-            "yolo": yolo_model is not None,
-            "florence": caption_model is not None
-        }
+        "models": {name: status["state"] == "ready" for name, status in models.get_status().items()}
     }
 
 @app.get("/probe/")
@@ -160,42 +749,165 @@ async def probe():
 
 @app.get("/health")
 async def health():
-    """Health check endpoint"""
+    """Health check endpoint, avec l'état de préparation de chaque modèle"""
+    ocr_pool_state = ocr_pool_status()
+    ready = models.is_ready(["detector"]) and ocr_pool_state["ready"]
+    # Un chargement en échec est définitif: le signaler plutôt que rester en "starting"
+    errors = models.errors(["detector"])
+    if ocr_pool_state["errors"]:
+        errors["ocr"] = "; ".join(ocr_pool_state["errors"])
+    if ocr_pool_state.get("broken") or set(errors) == {"detector", "ocr"}:
+        status = "unhealthy"
+    elif errors:
+        status = "degraded"
+    else:
+        status = "healthy" if ready else "starting"
     return {
-        "status": "healthy",
+        "status": status,
+        "ready": ready,
+        "errors": errors,
         "service": "omniparser-lite",
         "device": DEVICE,
-        "cuda_available": torch.cuda.is_available()
+        "backend": BACKEND,
+        "detector_backend": detector_backend(),
+        "cuda_available": torch.cuda.is_available(),
+        "models": models.get_status(),
+        "ocr_pool": ocr_pool_state,
+        "queue": {"pending": batcher.pending, "max_queue": batcher.max_queue}
     }
 
+async def run_parse(request: ImageRequest) -> dict:
+    """Parse une image (sans cache) et retourne la réponse sérialisable"""
+    # Décodage hors de la boucle d'événements, puis parsing regroupé avec les requêtes concurrentes
+    loop = asyncio.get_running_loop()
+    image_np = await loop.run_in_executor(None, decode_image, request.base64_image)
+    if request.regions:
+        # Mode texte ciblé: reconnaissance sur les zones des boutons attendus uniquement
+        parsed_elements = await loop.run_in_executor(
+            ocr_pool, recognize_regions, image_np, request.regions, request.keywords
+        )
+        return to_parse_response(parsed_elements).dict()
+    
+    parsed_elements = await batcher.submit(image_np)
+    if request.captions:
+        parsed_elements = await loop.run_in_executor(None, caption_icons, image_np, parsed_elements)
+    return to_parse_response(parsed_elements).dict()
+
 @app.post("/parse/", response_model=ParseResponse)
-async def parse_image(request: ImageRequest):
-    """Parse une image et retourne les éléments UI"""
+async def parse_image(request: ImageRequest, response: Response,
+                      idempotency_key: Optional[str] = Header(None)):
+    """Parse une image et retourne les éléments UI (résultat mis en cache par contenu d'image)"""
     try:
-        # Parser l'image
-        parsed_elements = parse_image_lite(request.base64_image)
-        
-        # Convertir en format attendu
-        parsed_content_list = []
-        for elem in parsed_elements:
-            parsed_content_list.append({
-                "type": elem.type,
-                "content": elem.content,
-                "bbox": elem.bbox,
-                "confidence": elem.confidence
-            })
-        
-        return ParseResponse(
-            parsed_content_list=parsed_content_list,
-            success=True,
-            message=f"Found {len(parsed_elements)} elements"
+        cached = result_cache.lookup_idempotent(idempotency_key)
+        if cached is not None:
+            response.headers["X-Cache"] = "HIT"
+            return cached
+        
+        cache_key = result_cache.make_key(
+            request.base64_image, captions=request.captions,
+            regions=request.regions, keywords=request.keywords
         )
+        result, hit = await result_cache.get_or_compute(cache_key, lambda: run_parse(request), idempotency_key)
+        response.headers["X-Cache"] = "HIT" if hit else "MISS"
+        return result
         
+    except QueueFullError as e:
+        raise queue_full_response(e)
     except Exception as e:
         print(f"Erreur lors du parsing: {e}")
         raise HTTPException(status_code=500, detail=f"Error parsing image: {str(e)}")
 
+@app.post("/parse/batch", response_model=BatchParseResponse)
+async def parse_batch(request: BatchImageRequest):
+    """Parse plusieurs images en une requête"""
+    started = time.perf_counter()
+    try:
+        if batcher.pending + len(request.images) > batcher.max_queue:
+            batcher.stats["rejected"] += 1
+            raise QueueFullError(f"{batcher.pending} images en attente, {len(request.images)} demandées")
+        
+        results = await asyncio.gather(*(
+            result_cache.get_or_compute(
+                result_cache.make_key(b64),
+                lambda b64=b64: run_parse(ImageRequest(base64_image=b64))
+            )
+            for b64 in request.images
+        ))
+        return BatchParseResponse(
+            results=[result for result, _ in results],
+            batch_size=len(request.images),
+            latency_ms=(time.perf_counter() - started) * 1000
+        )
+        
+    except QueueFullError as e:
+        raise queue_full_response(e)
+    except Exception as e:
+        print(f"Erreur lors du parsing batch: {e}")
+        raise HTTPException(status_code=500, detail=f"Error parsing images: {str(e)}")
+
+@app.get("/stats/batching")
+async def batching_stats():
+    """Statistiques de latence et de débit des batches"""
+    return batcher.get_stats()
+
+@app.get("/stats/cache")
+async def cache_stats():
+    """Taux de hit et mémoire utilisée par le cache de résultats"""
+    return result_cache.get_stats()
+
+def run_benchmark(image_dir: str, runs: int = 5):
+    """Compare la latence des backends PyTorch et ONNX Runtime sur des captures de popups"""
+    paths = sorted(p for p in Path(image_dir).iterdir() if p.suffix.lower() in (".png", ".jpg", ".jpeg"))
+    if not paths:
+        print(f"❌ Aucune image dans {image_dir}")
+        return
+    images = [np.array(Image.open(p).convert('RGB')) for p in paths]
+    
+    ocr = models.get("ocr")
+    reader = getattr(ocr, "easyocr_reader", ocr)
+    backends = {}
+    try:
+        from ultralytics import YOLO
+        yolo_model = YOLO(ensure_yolo_weights())
+        yolo_model.to(DEVICE)
+        backends["torch"] = (lambda imgs: [yolo_elements(r) for r in yolo_model(imgs, verbose=False)], reader)
+    except Exception as e:
+        print(f"⚠️ Backend PyTorch non testé: {e}")
+    try:
+        backends["onnx"] = OnnxYoloDetector().detect, FastOcr(reader)
+    except Exception as e:
+        print(f"⚠️ Backend ONNX non testé: {e}")
+    
+    print(f"\n⏱️  Benchmark sur {len(images)} image(s), {runs} passage(s)")
+    for name, (detect, ocr) in backends.items():
+        detect(images[:1])  # Échauffement
+        detect_ms, ocr_ms = [], []
+        for _ in range(runs):
+            for image_np in images:
+                t0 = time.perf_counter()
+                detect([image_np])
+                t1 = time.perf_counter()
+                ocr.readtext(image_np)
+                t2 = time.perf_counter()
+                detect_ms.append((t1 - t0) * 1000)
+                ocr_ms.append((t2 - t1) * 1000)
+        
+        total = sorted(d + o for d, o in zip(detect_ms, ocr_ms))
+        print(f"  {name:6s} détection {np.mean(detect_ms):8.1f} ms | OCR {np.mean(ocr_ms):8.1f} ms | "
+              f"total p50 {total[len(total) // 2]:8.1f} ms, p95 {total[int(len(total) * 0.95) - 1]:8.1f} ms")
+
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="OmniParser Lite")
+    parser.add_argument("--benchmark", metavar="DIR", help="Compare les backends sur les images du dossier")
+    parser.add_argument("--runs", type=int, default=5, help="Nombre de passages du benchmark")
+    args = parser.parse_args()
+    
+    if args.benchmark:
+        run_benchmark(args.benchmark, args.runs)
+        sys.exit(0)
+    
     print("\n🚀 Démarrage du serveur OmniParser Lite sur http://localhost:8000")
     print("   Appuyez sur Ctrl+C pour arrêter\n")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+"""
+Lance un tournoi entre modèles sur le moteur Monopoly headless
+
+Exemple:
+    python run_tournament.py models.json --format swiss --rounds 7 --processes 8
+"""
+from src.sim.tournament import main
+
+if __name__ == "__main__":
+    main()
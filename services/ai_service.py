@@ -6,69 +6,218 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import json
-from typing import Dict, List, Optional
+import time
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
 from openai import OpenAI
 from services.event_bus import EventBus, EventTypes
+from services.decision_cache import DEFAULT_DISABLED_TYPES, DecisionCache
+from services.decision_scheduler import DecisionJob, DecisionScheduler, current_player_slot
+from services.tracing import correlation_headers, span
+
+try:
+    from services.model_router import ModelRouter
+except ImportError:  # aiohttp absent: client OpenAI uniquement
+    ModelRouter = None
+
+def provider_name(base_url: Optional[str]) -> str:
+    """Nom court du fournisseur d'après l'URL de l'API (openai par défaut)"""
+    if not base_url:
+        return "openai"
+    host = urlparse(base_url).hostname or base_url
+    return "openai" if host.endswith("openai.com") else host
+
+
+def match_option(text: str, option_names: List[str]) -> Optional[str]:
+    """Option reconnue dans le début d'une réponse `option|explication` encore incomplète.
+    
+    L'option est retenue dès que le séparateur est reçu, ou avant s'il n'existe
+    aucune autre option plus longue commençant par le même texte.
+    """
+    head, separator, _ = text.partition('|')
+    candidate = head.strip().strip('"\'').lower()
+    if separator or '\n' in head:
+        return candidate if candidate in option_names else None
+    if candidate in option_names and not any(
+            other != candidate and other.startswith(candidate) for other in option_names):
+        return candidate
+    return None
+
 
 class AIService:
     """Service IA pour prendre des décisions dans Monopoly"""
     
-    def __init__(self, event_bus: EventBus):
+    def __init__(self, event_bus: Optional[EventBus] = None, model: Optional[str] = None,
+                 api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 streaming: Optional[bool] = None, router=None):
         self.event_bus = event_bus
         self.client = None
         self.available = False
+        self.model = model or "gpt-4o-mini"
+        explicit_model = model is not None or base_url is not None
+        base_url = base_url or os.getenv('OPENAI_BASE_URL')
+        self.provider = provider_name(base_url)
+        
+        # Streaming: l'option est publiée dès ses premiers tokens, l'explication suit.
+        # AI_STREAMING liste les fournisseurs concernés ("openai,localhost") ou "all"
+        if streaming is None:
+            enabled = [p.strip() for p in os.getenv('AI_STREAMING', '').split(',') if p.strip()]
+            streaming = 'all' in enabled or self.provider in enabled
+        self.streaming = streaming
+        self.stream_stats = {
+            'streamed': 0,
+            'early_commits': 0,
+            'time_to_choice_ms': 0.0,
+            'completion_ms': 0.0
+        }
+        
+        # Décisions déjà prises pour un même popup et un état de jeu proche
+        disabled = os.getenv('AI_DECISION_CACHE_DISABLED')
+        self.decision_cache = DecisionCache(
+            ttl=float(os.getenv('AI_DECISION_CACHE_TTL', '600')),
+            disabled_types=disabled.split(',') if disabled is not None else DEFAULT_DISABLED_TYPES
+        )
+        
+        # Routeur multi-fournisseurs (MODEL_ROUTER_CONFIG): un modèle par joueur, requêtes couvertes.
+        # Un modèle ou une URL explicites (ex. agents de tournoi) l'emportent sur la configuration
+        self.router = router
+        if (self.router is None and not explicit_model
+                and ModelRouter is not None and ModelRouter.is_configured()):
+            try:
+                self.router = ModelRouter.from_env()
+                print(f"✅ Routeur de modèles: {', '.join(self.router.endpoints)}")
+            except Exception as e:
+                print(f"⚠️  Erreur configuration du routeur: {e}")
+        
+        # Simulation Monte Carlo des options (achat, prison) ajoutée au prompt
+        self.rollout = None
+        if os.getenv('AI_ROLLOUT_HINTS', '0') == '1':
+            try:
+                from src.sim.rollout import RolloutEvaluator
+                self.rollout = RolloutEvaluator(time_budget_ms=float(os.getenv('AI_ROLLOUT_BUDGET_MS', '150')))
+                print("✅ Indices de simulation activés")
+            except ImportError as e:
+                print(f"⚠️  Simulation indisponible: {e}")
         
         # Initialiser OpenAI si la clé est disponible
-        api_key = os.getenv('OPENAI_API_KEY')
+        api_key = api_key or os.getenv('OPENAI_API_KEY')
         if api_key:
             try:
-                self.client = OpenAI(api_key=api_key)
+                self.client = OpenAI(api_key=api_key, base_url=base_url)
                 self.available = True
-                print("✅ Service IA activé")
+                print(f"✅ Service IA activé ({self.provider}{', streaming' if self.streaming else ''})")
             except Exception as e:
                 print(f"⚠️  Erreur initialisation IA: {e}")
         else:
             print("⚠️  Service IA désactivé (pas de clé API)")
         
-        # S'abonner aux demandes de décision
-        self.event_bus.subscribe(EventTypes.AI_DECISION_REQUESTED, self._on_decision_requested)
+        # S'abonner aux demandes de décision (sans bus: utilisé directement, ex. tournois headless)
+        self.scheduler = None
+        if self.event_bus:
+            # Un worker par joueur: les décisions de deux joueurs IA ne s'attendent pas
+            self.scheduler = DecisionScheduler(max_workers=int(os.getenv('AI_DECISION_WORKERS', '16')))
+            self.event_bus.subscribe(EventTypes.AI_DECISION_REQUESTED, self._on_decision_requested)
+            self.event_bus.subscribe(EventTypes.POPUP_CLOSED, self._on_popup_closed)
     
     def _on_decision_requested(self, event: dict):
-        """Callback quand une décision est demandée"""
+        """Callback quand une décision est demandée: mise en file pour le joueur concerné"""
         data = event['data']
+        player = data.get('player') or self._player_slot(data.get('game_context', {})) or 'default'
+        self.scheduler.submit(player, data.get('popup_id'), self._decide_for_popup, data)
+    
+    def _on_popup_closed(self, event: dict):
+        """Le popup a disparu de la RAM: sa décision n'a plus d'objet"""
+        popup_id = event['data'].get('popup_id')
+        if self.scheduler.cancel(popup_id):
+            print(f"🚫 Décision annulée pour {popup_id} (popup fermé)")
+    
+    def _decide_for_popup(self, job: DecisionJob, data: Dict):
+        """Décision d'un popup (thread du scheduler); rien n'est publié si le popup a disparu"""
         popup_id = data.get('popup_id')
         popup_text = data.get('popup_text')
         options = data.get('options', [])
         game_context = data.get('game_context', {})
         
-        # Prendre la décision
-        decision = self.make_decision(popup_text, options, game_context)
-        
-        # Publier le résultat
-        self.event_bus.publish(
-            EventTypes.AI_DECISION_MADE,
-            {
-                'popup_id': popup_id,
-                'decision': decision['choice'],
-                'reason': decision['reason'],
-                'confidence': decision['confidence']
-            },
-            source='ai_service'
-        )
+        published = []
+        
+        def publish_choice(decision: Dict):
+            if job.cancelled:
+                return
+            published.append(decision['choice'])
+            self.event_bus.publish(
+                EventTypes.AI_DECISION_MADE,
+                {
+                    'popup_id': popup_id,
+                    'decision': decision['choice'],
+                    'reason': decision['reason'],
+                    'confidence': decision['confidence'],
+                    'streaming': decision.get('streaming', False)
+                },
+                source='ai_service'
+            )
+        
+        # Prendre la décision (en streaming, l'option est publiée avant la fin de la réponse)
+        decision = self.make_decision(popup_text, options, game_context, data.get('popup_type'),
+                                      on_choice=publish_choice, player=data.get('player'))
+        
+        if job.cancelled:
+            return None
+        if not published:
+            publish_choice(decision)
+        else:
+            # Explication complète, arrivée après la publication de l'option
+            self.event_bus.publish(
+                EventTypes.AI_DECISION_EXPLAINED,
+                {
+                    'popup_id': popup_id,
+                    'decision': published[0],
+                    'reason': decision['reason'],
+                    'time_to_choice_ms': decision.get('time_to_choice_ms')
+                },
+                source='ai_service'
+            )
+        return decision
     
-    def make_decision(self, popup_text: str, options: List[Dict], game_context: Dict) -> Dict:
-        """Prend une décision basée sur le contexte"""
+    def make_decision(self, popup_text: str, options: List[Dict], game_context: Dict,
+                      popup_type: Optional[str] = None,
+                      on_choice: Optional[Callable[[Dict], None]] = None,
+                      player: Optional[str] = None) -> Dict:
+        """Prend une décision basée sur le contexte.
+        
+        En streaming, `on_choice` reçoit la décision (sans explication) dès que
+        l'option est reconnue; la décision complète est ensuite retournée.
+        `player` ("player1"...) est le joueur visé par le popup, le joueur
+        courant s'il n'est pas précisé.
+        """
         
         # Si l'IA n'est pas disponible, utiliser la logique par défaut
-        if not self.available or not self.client:
+        if not self.router and (not self.available or not self.client):
             return self._default_decision(options)
         
+        # Extraire les noms des options
+        option_names = [opt.get('name', '') for opt in options]
+        
+        # Avec le routeur, le modèle dépend du joueur visé (une enchère peut viser un autre joueur)
+        player = player or self._player_slot(game_context)
+        model = self.router.route(player)[0].name if self.router else self.model
+        
+        # Même popup, mêmes options, état de jeu proche: réutiliser la décision
+        cache_key = None
+        if self.decision_cache.is_enabled(popup_type):
+            cache_key = self.decision_cache.make_key(model, popup_type or popup_text or '', option_names, game_context)
+            cached = self.decision_cache.get(cache_key)
+            if cached:
+                return cached
+        else:
+            self.decision_cache.record_bypass()
+        
         try:
-            # Extraire les noms des options
-            option_names = [opt.get('name', '') for opt in options]
-            
+
             # Préparer le contexte
             context_str = self._format_game_context(game_context)
+            hint = self._rollout_hint(game_context, popup_type, option_names)
+            if hint:
+                context_str += f"\n{hint}"
             
             # Créer le prompt
             prompt = f"""Tu es un expert du Monopoly. Contexte actuel:
@@ -83,39 +232,177 @@ Quelle est la MEILLEURE option stratégique? Réponds avec:
 
 Format: option|explication"""
 
+            messages = [
+                {"role": "system", "content": "Expert Monopoly. Réponses concises au format: option|explication"},
+                {"role": "user", "content": prompt}
+            ]
+            
             # Appeler l'API
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "Expert Monopoly. Réponses concises au format: option|explication"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=50
-            )
+            started = time.perf_counter()
+            if self.router:
+                return self._routed_decision(player, messages, options, option_names, cache_key, started)
+            if self.streaming:
+                with span('llm', model=self.model, provider=self.provider, streaming=True):
+                    return self._stream_decision(messages, options, option_names, on_choice, cache_key, started)
             
-            # Parser la réponse
-            result = response.choices[0].message.content.strip()
-            parts = result.split('|')
+            with span('llm', model=self.model, provider=self.provider):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.1,
+                    max_tokens=50,
+                    extra_headers=correlation_headers()
+                )
             
-            choice = parts[0].strip().lower()
-            reason = parts[1].strip() if len(parts) > 1 else "Décision stratégique"
+            # Parser la réponse
+            choice, reason = self._parse_answer(response.choices[0].message.content)
             
             # Vérifier que le choix est valide
             if choice not in option_names:
                 print(f"⚠️  IA a choisi '{choice}' qui n'est pas dans les options")
                 return self._default_decision(options)
             
-            return {
+            decision = {
                 'choice': choice,
                 'reason': reason,
                 'confidence': 0.9
             }
+            if cache_key:
+                self.decision_cache.put(cache_key, decision, (time.perf_counter() - started) * 1000)
+            return decision
             
         except Exception as e:
             print(f"⚠️  Erreur IA: {e}")
             return self._default_decision(options)
     
+    def _stream_decision(self, messages: List[Dict], options: List[Dict], option_names: List[str],
+                         on_choice: Optional[Callable[[Dict], None]], cache_key: Optional[str],
+                         started: float) -> Dict:
+        """Lit la réponse token par token et publie l'option dès qu'elle est reconnue"""
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=0.1,
+            max_tokens=50,
+            stream=True,
+            extra_headers=correlation_headers()
+        )
+        
+        text = ''
+        committed = None
+        time_to_choice = None
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text += chunk.choices[0].delta.content or ''
+            if committed is None:
+                committed = match_option(text, option_names)
+                if committed:
+                    time_to_choice = (time.perf_counter() - started) * 1000
+                    if on_choice:
+                        on_choice({'choice': committed, 'reason': '', 'confidence': 0.9, 'streaming': True})
+        
+        elapsed = (time.perf_counter() - started) * 1000
+        choice, reason = self._parse_answer(text)
+        self.stream_stats['streamed'] += 1
+        self.stream_stats['completion_ms'] += elapsed
+        if committed:
+            self.stream_stats['early_commits'] += 1
+            self.stream_stats['time_to_choice_ms'] += time_to_choice
+            choice = committed
+        elif choice not in option_names:
+            print(f"⚠️  IA a choisi '{choice}' qui n'est pas dans les options")
+            return self._default_decision(options)
+        
+        decision = {
+            'choice': choice,
+            'reason': reason,
+            'confidence': 0.9,
+            'time_to_choice_ms': time_to_choice if committed else elapsed
+        }
+        if cache_key:
+            self.decision_cache.put(cache_key, decision, elapsed)
+        return decision
+    
+    def _routed_decision(self, player: Optional[str], messages: List[Dict], options: List[Dict],
+                         option_names: List[str], cache_key: Optional[str], started: float) -> Dict:
+        """Décision via le routeur: modèle du joueur, couvert par un second endpoint si trop lent"""
+        with span('llm') as trace:
+            response, routing = self.router.complete(
+                player, messages,
+                validate=lambda content: self._parse_answer(content)[0] in option_names,
+                temperature=0.1,
+                max_tokens=50
+            )
+            trace.update(model=routing['model'], endpoint=routing['endpoint'], hedged=routing['hedged'])
+        content = ModelRouter.content_of(response) if response.ok else None
+        if not content:
+            print(f"⚠️  Erreur IA ({routing['endpoint']}): {response.status_code}")
+            return self._default_decision(options)
+        
+        choice, reason = self._parse_answer(content)
+        if choice not in option_names:
+            print(f"⚠️  IA a choisi '{choice}' qui n'est pas dans les options")
+            return self._default_decision(options)
+        
+        decision = {
+            'choice': choice,
+            'reason': reason,
+            'confidence': 0.9,
+            'model': routing['model'],
+            'hedged': routing['hedged']
+        }
+        if cache_key:
+            self.decision_cache.put(cache_key, decision, (time.perf_counter() - started) * 1000)
+        return decision
+    
+    @classmethod
+    def _player_slot(cls, game_context: Dict) -> Optional[str]:
+        """Clé du joueur qui doit décider ("player1"...), selon sa place dans le contexte"""
+        return current_player_slot(list(game_context.get('players', {})), cls._current_player(game_context))
+    
+    @staticmethod
+    def _current_player(game_context: Dict) -> Optional[str]:
+        """Nom du joueur qui doit décider"""
+        current = game_context.get('global', {}).get('current_player')
+        if current:
+            return current
+        for name, player in game_context.get('players', {}).items():
+            if player.get('current_player'):
+                return name
+        return None
+    
+    @staticmethod
+    def _parse_answer(text: str):
+        """(option, explication) d'une réponse `option|explication`"""
+        parts = (text or '').strip().split('|')
+        choice = parts[0].strip().strip('"\'').lower()
+        reason = parts[1].strip() if len(parts) > 1 else "Décision stratégique"
+        return choice, reason
+    
+    def get_streaming_stats(self) -> Dict:
+        commits = self.stream_stats['early_commits']
+        streamed = self.stream_stats['streamed']
+        return {
+            'enabled': self.streaming,
+            'provider': self.provider,
+            **self.stream_stats,
+            'avg_time_to_choice_ms': self.stream_stats['time_to_choice_ms'] / commits if commits else 0,
+            'avg_completion_ms': self.stream_stats['completion_ms'] / streamed if streamed else 0
+        }
+    
+    def _rollout_hint(self, game_context: Dict, popup_type: Optional[str], option_names: List[str]) -> Optional[str]:
+        """Valeur simulée de chaque option, si le type de popup s'y prête"""
+        if not self.rollout:
+            return None
+        try:
+            from src.sim.rollout import format_hint
+            evaluation = self.rollout.evaluate(game_context, popup_type, option_names)
+            return format_hint(evaluation) if evaluation else None
+        except Exception as e:
+            print(f"⚠️  Erreur simulation: {e}")
+            return None
+    
     def _default_decision(self, options: List[Dict]) -> Dict:
         """Logique de décision par défaut"""
         priority_order = ["buy", "next turn", "roll again", "auction", "trade", "back", "accounts"]
@@ -156,6 +443,19 @@ Format: option|explication"""
                 position = player.get('position', 0)
                 lines.append(f"- {name}: {money}€, case {position}")
         
+        # Dynamique du plateau pour la case du joueur courant (tables Markov de Contexte)
+        current = next((p for p in context.get("players", {}).values() if p.get("current_player")), None)
+        if current and "global" in context:
+            for prop in context["global"].get("properties", []):
+                if prop.get("id") == current.get("position") and "landing_probability" in prop:
+                    payback = prop.get("payback_turns")
+                    lines.append(
+                        f"{prop.get('name')}: arrêt {prop['landing_probability'] * 100:.1f}% par tour adverse, "
+                        f"loyer espéré {prop.get('expected_rent_per_turn', 0)}€/tour"
+                        + (f", rentabilisée en {payback:.0f} tours" if payback else "")
+                    )
+                    break
+        
         # Tour actuel
         if "global" in context:
             turn = context["global"].get("current_turn", 0)
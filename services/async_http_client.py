@@ -0,0 +1,181 @@
+"""
+Client HTTP asynchrone partagé (aiohttp) avec pools keep-alive par service amont
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import random
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from services.tracing import correlation, correlation_headers, get_correlation_id
+
+# Statuts pour lesquels une nouvelle tentative a un sens
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+# Échéance (temps de la boucle) fixée par l'appelant de `run()`, partagée par toutes ses requêtes
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("http_deadline", default=None)
+
+
+class HttpResponse:
+    """Réponse déjà lue, utilisable hors de la boucle d'événements"""
+
+    def __init__(self, status: int, data: Any, headers: Dict[str, str], elapsed: float):
+        self.status_code = status
+        self.data = data
+        self.headers = headers
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status_code < 300
+
+    def json(self) -> Any:
+        return self.data
+
+
+class AsyncHttpClient:
+    """Une boucle asyncio dans un thread dédié et une session aiohttp par service amont.
+
+    Les connexions (TCP et TLS) sont réutilisées d'une requête à l'autre. Les
+    erreurs réseau, timeouts et statuts 429/5xx sont retentés avec un backoff
+    exponentiel à jitter complet. `timeout` est le budget total d'une requête,
+    tentatives et attentes comprises; `run(coro, timeout)` borne en plus toutes
+    les requêtes de la coroutine par l'échéance de l'appelant. Les appelants
+    synchrones (routes Flask) passent par `run()`; le code asynchrone appelle
+    directement `request()`.
+    """
+
+    def __init__(self, timeout: float = 30.0, retries: int = 2, backoff_base: float = 0.25,
+                 backoff_max: float = 4.0, limit_per_host: int = 16):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limit_per_host = limit_per_host
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0}
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="async-http", daemon=True)
+        self._thread.start()
+
+    def _session_for(self, url: str) -> aiohttp.ClientSession:
+        """Session (et pool de connexions) propre à chaque service amont"""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        session = self._sessions.get(origin)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=60,
+                ttl_dns_cache=300
+            )
+            session = aiohttp.ClientSession(connector=connector)
+            self._sessions[origin] = session
+        return session
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def request(self, method: str, url: str, json: Any = None,
+                      headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None,
+                      retries: Optional[int] = None) -> HttpResponse:
+        """Envoie une requête et lit la réponse (JSON si possible), avec retries dans le budget `timeout`"""
+        retries = self.retries if retries is None else retries
+        headers = correlation_headers(headers)
+        session = self._session_for(url)
+        deadline = self.loop.time() + (timeout or self.timeout)
+        caller_deadline = _deadline.get()
+        if caller_deadline is not None:
+            deadline = min(deadline, caller_deadline)
+
+        for attempt in range(retries + 1):
+            remaining = deadline - self.loop.time()
+            if remaining <= 0:
+                self.stats['failures'] += 1
+                raise asyncio.TimeoutError(f"{method} {url}: échéance dépassée")
+            self.stats['requests'] += 1
+            started = self.loop.time()
+            try:
+                async with session.request(method, url, json=json, headers=headers,
+                                           timeout=aiohttp.ClientTimeout(total=remaining)) as response:
+                    try:
+                        data = await response.json(content_type=None)
+                    except ValueError:
+                        data = await response.text()
+                    result = HttpResponse(response.status, data, dict(response.headers),
+                                          self.loop.time() - started)
+
+                delay = self._backoff(attempt, result.headers.get('Retry-After'))
+                if (result.status_code not in RETRYABLE_STATUSES or attempt == retries
+                        or self.loop.time() + delay >= deadline):
+                    return result
+
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                delay = self._backoff(attempt)
+                if attempt == retries or self.loop.time() + delay >= deadline:
+                    self.stats['failures'] += 1
+                    raise
+
+            self.stats['retries'] += 1
+            await asyncio.sleep(delay)
+
+    async def post_json(self, url: str, payload: Any, **kwargs) -> HttpResponse:
+        return await self.request('POST', url, json=payload, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> HttpResponse:
+        return await self.request('GET', url, **kwargs)
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Exécute une coroutine sur la boucle du client depuis du code synchrone.
+
+        Avec `timeout`, les requêtes de la coroutine (retries compris) ne
+        dépassent pas cette échéance, et la coroutine est annulée au-delà.
+        """
+        future = asyncio.run_coroutine_threadsafe(self._scoped(get_correlation_id(), timeout, coro), self.loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    async def _scoped(self, correlation_id: Optional[str], timeout: Optional[float], coro):
+        # La tâche créée sur la boucle ne voit pas le contexte de l'appelant
+        if timeout is not None:
+            _deadline.set(self.loop.time() + timeout)
+        if not correlation_id:
+            return await coro
+        with correlation(correlation_id):
+            return await coro
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'upstreams': list(self._sessions)}
+
+    def close(self):
+        async def _close_all():
+            for session in self._sessions.values():
+                await session.close()
+        self.run(_close_all(), timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_shared_client: Optional[AsyncHttpClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_http_client() -> AsyncHttpClient:
+    """Client partagé par tout le processus"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = AsyncHttpClient()
+        return _shared_client
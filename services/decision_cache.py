@@ -0,0 +1,119 @@
+"""
+Cache des décisions IA indexé sur un état de jeu normalisé
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+# Décisions dépendant trop finement de l'état pour être réutilisées
+DEFAULT_DISABLED_TYPES = ("trading_select_player", "trading_select_properties",
+                          "trading_negotiate", "trading_confirm")
+
+
+class DecisionCache:
+    """Mémorise les décisions IA pour un même popup, les mêmes options et un état proche.
+
+    La clé est un hash canonique du type de popup, de l'ensemble des options et
+    d'un résumé par paliers du contexte (argent arrondi, positions, tour par
+    tranches). Les entrées expirent après `ttl` secondes et les moins récentes
+    sont évincées au-delà de `max_entries`. Chaque modèle a son propre espace
+    de clés, et certains types de décision peuvent être exclus.
+    """
+
+    def __init__(self, ttl: float = 600, max_entries: int = 512, money_bucket: int = 250,
+                 turn_bucket: int = 10, disabled_types: Iterable[str] = DEFAULT_DISABLED_TYPES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.money_bucket = money_bucket
+        self.turn_bucket = turn_bucket
+        self.disabled_types = set(disabled_types)
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+            'bypassed': 0,
+            'latency_saved_ms': 0.0
+        }
+
+    def bucket_context(self, context: Dict) -> Dict:
+        """Résumé grossier du contexte, sur les mêmes champs que ceux envoyés à l'IA"""
+        players = {}
+        for player_id, player in sorted(context.get('players', {}).items()):
+            players[player_id] = [
+                int(player.get('money', 0)) // self.money_bucket,
+                player.get('position', 0)
+            ]
+        turn = context.get('global', {}).get('current_turn', 0) or 0
+        return {'players': players, 'turn': int(turn) // self.turn_bucket}
+
+    def make_key(self, model: str, popup_type: str, option_names: List[str], context: Dict) -> str:
+        canonical = json.dumps({
+            'type': popup_type.strip().lower(),
+            'options': sorted(set(name.strip().lower() for name in option_names)),
+            'context': self.bucket_context(context)
+        }, sort_keys=True, separators=(',', ':'))
+        return f"{model}:{hashlib.sha256(canonical.encode()).hexdigest()}"
+
+    def is_enabled(self, popup_type: Optional[str]) -> bool:
+        return popup_type not in self.disabled_types
+
+    def get(self, key: str) -> Optional[dict]:
+        """Décision mise en cache (copie), en comptant la latence d'appel évitée"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if time.monotonic() - entry['stored_at'] > self.ttl:
+                del self._entries[key]
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            self.stats['latency_saved_ms'] += entry['latency_ms']
+            return dict(entry['decision'])
+
+    def put(self, key: str, decision: dict, latency_ms: float):
+        with self._lock:
+            self._entries[key] = {
+                'decision': dict(decision),
+                'latency_ms': latency_ms,
+                'stored_at': time.monotonic()
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def record_bypass(self):
+        with self._lock:
+            self.stats['bypassed'] += 1
+
+    def clear(self, model: Optional[str] = None):
+        """Vide le cache, ou seulement l'espace d'un modèle"""
+        with self._lock:
+            if model is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k.startswith(f"{model}:")]:
+                    del self._entries[key]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'calls_avoided': self.stats['hits'],
+                'hit_rate': self.stats['hits'] / lookups if lookups else 0,
+                'entries': len(self._entries),
+                'ttl': self.ttl,
+                'disabled_types': sorted(self.disabled_types)
+            }
@@ -0,0 +1,191 @@
+"""
+Ordonnanceur de décisions: un worker par joueur, exécution en parallèle entre joueurs
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+def player_slot(index: int) -> str:
+    """Clé d'un joueur pour l'ordonnanceur et le routeur: "player1", "player2"... (index à partir de 0)"""
+    return f"player{int(index) + 1}"
+
+
+def current_player_slot(player_names: List[str], current: Optional[str]) -> Optional[str]:
+    """Clé du joueur `current` d'après sa place dans l'ordre de jeu (`player_names`)"""
+    if current in player_names:
+        return player_slot(player_names.index(current))
+    return None
+
+
+class DecisionJob:
+    """Une décision en attente ou en cours pour un joueur"""
+
+    def __init__(self, job_id: str, player: str, fn: Callable, args: tuple):
+        self.id = job_id
+        self.player = player
+        self.fn = fn
+        self.args = args
+        self.context = contextvars.copy_context()  # Corrélation de l'appelant, reprise dans le worker
+        self.future: Future = Future()
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self.future.cancel()
+
+
+class DecisionScheduler:
+    """Une file et un worker asyncio par joueur, sur une boucle dédiée.
+
+    Les décisions d'un même joueur sont traitées dans l'ordre d'arrivée, celles
+    de joueurs différents en parallèle (les appels bloquants tournent dans un
+    pool de threads). Une décision annulée (popup disparu) est retirée de la
+    file; si elle est déjà en cours, son résultat est ignoré et le worker passe
+    immédiatement à la suivante. La fonction reçoit le job en premier argument
+    pour vérifier `job.cancelled` avant d'agir.
+    """
+
+    def __init__(self, max_workers: int = 16, max_queue_per_player: int = 8):
+        self.max_queue_per_player = max_queue_per_player
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="decision")
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: List[asyncio.Task] = []
+        self._jobs: Dict[str, DecisionJob] = {}
+        self._lock = threading.Lock()
+        self.stats = {'submitted': 0, 'completed': 0, 'cancelled': 0, 'failed': 0, 'rejected': 0,
+                      'abandoned_running': 0, 'wait_ms': 0.0, 'run_ms': 0.0}
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="decision-scheduler", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------ #
+    # API synchrone
+    # ------------------------------------------------------------------ #
+    def submit(self, player: Any, job_id: str, fn: Callable, *args) -> Future:
+        """Ajoute une décision à la file du joueur; retourne un Future du résultat"""
+        player = str(player)
+        job = DecisionJob(job_id, player, fn, args)
+        with self._lock:
+            previous = self._jobs.get(job_id)
+            if previous and not previous.future.done():
+                return previous.future  # Même popup déjà demandé
+            self._jobs[job_id] = job
+            self.stats['submitted'] += 1
+        asyncio.run_coroutine_threadsafe(self._enqueue(job), self.loop)
+        return job.future
+
+    def cancel(self, job_id: str) -> bool:
+        """Annule une décision (en file ou en cours); False si inconnue ou déjà terminée"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.future.done() or job.cancelled:
+                return False
+            job.cancel()
+            self.stats['cancelled'] += 1
+            return True
+
+    def cancel_player(self, player: Any) -> int:
+        with self._lock:
+            job_ids = [job.id for job in self._jobs.values() if job.player == str(player)]
+        return sum(self.cancel(job_id) for job_id in job_ids)
+
+    def pending(self, player: Any) -> int:
+        """Décisions du joueur en file ou en cours"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values()
+                       if job.player == str(player) and not job.future.done())
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            completed = self.stats['completed'] or 1
+            return {
+                **self.stats,
+                'avg_wait_ms': self.stats['wait_ms'] / completed,
+                'avg_run_ms': self.stats['run_ms'] / completed,
+                'players': {player: queue.qsize() for player, queue in self._queues.items()},
+                'in_progress': sum(1 for job in self._jobs.values() if not job.future.done())
+            }
+
+    def close(self):
+        with self._lock:
+            for job in self._jobs.values():
+                if not job.future.done():
+                    job.cancel()
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+        self.executor.shutdown(wait=False)
+
+    # ------------------------------------------------------------------ #
+    # Boucle
+    # ------------------------------------------------------------------ #
+    async def _enqueue(self, job: DecisionJob):
+        queue = self._queues.get(job.player)
+        if queue is None:
+            queue = self._queues[job.player] = asyncio.Queue()
+            self._workers.append(self.loop.create_task(self._worker(job.player, queue)))
+        if queue.qsize() >= self.max_queue_per_player:
+            with self._lock:
+                self.stats['rejected'] += 1
+                self._jobs.pop(job.id, None)
+            job.future.set_exception(RuntimeError(f"File de décisions pleine pour {job.player}"))
+            return
+        queue.put_nowait(job)
+
+    async def _shutdown(self):
+        """Arrête les workers avant la boucle, pour ne pas laisser de tâches en attente"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self.loop.stop()
+
+    async def _worker(self, player: str, queue: asyncio.Queue):
+        while True:
+            job: DecisionJob = await queue.get()
+            try:
+                if not job.cancelled:
+                    await self._run(job)
+            finally:
+                with self._lock:
+                    if self._jobs.get(job.id) is job:
+                        del self._jobs[job.id]
+                queue.task_done()
+
+    async def _run(self, job: DecisionJob):
+        job.started_at = time.monotonic()
+        call = asyncio.wrap_future(self.executor.submit(job.context.run, job.fn, job, *job.args))
+
+        # Attendre le résultat ou l'annulation, sans bloquer le joueur sur un appel abandonné
+        while not call.done():
+            done, _ = await asyncio.wait({call}, timeout=0.05)
+            if not done and job.cancelled:
+                with self._lock:
+                    self.stats['abandoned_running'] += 1
+                call.add_done_callback(lambda f: f.exception())  # Résultat ignoré
+                return
+
+        with self._lock:
+            self.stats['wait_ms'] += (job.started_at - job.submitted_at) * 1000
+            self.stats['run_ms'] += (time.monotonic() - job.started_at) * 1000
+            if job.cancelled:
+                return
+            if call.exception() is not None:
+                self.stats['failed'] += 1
+            else:
+                self.stats['completed'] += 1
+        try:
+            if call.exception() is not None:
+                job.future.set_exception(call.exception())
+            else:
+                job.future.set_result(call.result())
+        except InvalidStateError:
+            pass  # Annulée entre-temps
@@ -7,6 +7,7 @@ from datetime import datetime
 from typing import Dict, List, Callable, Any
 import redis
 from flask_socketio import SocketIO
+from .tracing import correlation, get_correlation_id
 
 class EventBus:
     """Système de messaging centralisé avec Redis et WebSocket"""
@@ -52,7 +53,8 @@ class EventBus:
             'data': data,
             'source': source,
             'timestamp': datetime.utcnow().isoformat(),
-            'id': self._generate_event_id()
+            'id': self._generate_event_id(),
+            'correlation_id': get_correlation_id()
         }
         
         # Publier sur Redis si disponible
@@ -83,7 +85,11 @@ class EventBus:
             self.subscribers[event_type].remove(callback)
     
     def _call_local_subscribers(self, event_type: str, event: dict):
-        """Appelle les callbacks locaux"""
+        """Appelle les callbacks locaux, dans le contexte de corrélation de l'événement"""
+        if event.get('correlation_id') and event['correlation_id'] != get_correlation_id():
+            with correlation(event['correlation_id']):
+                return self._call_local_subscribers(event_type, event)
+        
         # Callbacks pour ce type spécifique
         if event_type in self.subscribers:
             for callback in self.subscribers[event_type]:
@@ -146,6 +152,7 @@ class EventTypes:
     POPUP_ANALYZED = 'popup.analyzed'
     POPUP_DECISION = 'popup.decision'
     POPUP_EXECUTED = 'popup.executed'
+    POPUP_CLOSED = 'popup.closed'  # Popup disparu (RAM) avant l'exécution d'une décision
     
     # Game events
     GAME_STARTED = 'game.started'
@@ -160,4 +167,5 @@ class EventTypes:
     # AI events
     AI_DECISION_REQUESTED = 'ai.decision_requested'
     AI_DECISION_MADE = 'ai.decision_made'
+    AI_DECISION_EXPLAINED = 'ai.decision_explained'  # Explication complète après une décision en streaming
     AI_ERROR = 'ai.error'
\ No newline at end of file
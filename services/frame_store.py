@@ -0,0 +1,171 @@
+"""
+Stockage des captures d'écran adressé par contenu (LRU mémoire + débordement disque)
+"""
+import base64
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+WORKSPACE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SPILL_DIR = os.path.join(WORKSPACE_DIR, "captures", "frames")
+
+
+class FrameStore:
+    """Conserve chaque frame une seule fois, référencée par le SHA-256 de son contenu.
+
+    Les frames récentes restent en mémoire (LRU borné en octets). Les frames
+    évincées sont écrites sur disque et rechargées à la demande.
+    """
+
+    def __init__(self, max_memory_bytes: int = 64 * 1024 * 1024,
+                 spill_dir: str = DEFAULT_SPILL_DIR,
+                 max_disk_bytes: int = 512 * 1024 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.spill_dir = spill_dir
+        self._frames: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None  # Calculé paresseusement au premier débordement
+        self._lock = threading.Lock()
+        self.stats = {
+            'puts': 0,
+            'dedup_hits': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'spilled': 0
+        }
+
+    @staticmethod
+    def frame_key(data: bytes) -> str:
+        """Calcule la clé d'une frame à partir de son contenu"""
+        return hashlib.sha256(data).hexdigest()
+
+    def put(self, data: bytes) -> str:
+        """Stocke une frame et retourne sa clé (sans copie si déjà connue)"""
+        key = self.frame_key(data)
+        with self._lock:
+            self.stats['puts'] += 1
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                self.stats['dedup_hits'] += 1
+                return key
+            if os.path.exists(self._disk_path(key)):
+                self.stats['dedup_hits'] += 1
+                return key
+
+            self._frames[key] = data
+            self._memory_bytes += len(data)
+            self._evict()
+        return key
+
+    def put_base64(self, data_base64: str) -> str:
+        """Stocke une frame encodée en base64"""
+        return self.put(base64.b64decode(data_base64))
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Récupère une frame depuis la mémoire ou le disque"""
+        with self._lock:
+            data = self._frames.get(key)
+            if data is not None:
+                self._frames.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return data
+
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+
+        with self._lock:
+            self.stats['disk_hits'] += 1
+        return data
+
+    def get_base64(self, key: str) -> Optional[str]:
+        """Récupère une frame encodée en base64 (pour les appels HTTP)"""
+        data = self.get(key)
+        if data is None:
+            return None
+        return base64.b64encode(data).decode()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key in self._frames:
+                return True
+        return os.path.exists(self._disk_path(key))
+
+    def get_stats(self) -> Dict:
+        """Statistiques d'utilisation du stockage"""
+        with self._lock:
+            return {
+                **self.stats,
+                'memory_frames': len(self._frames),
+                'memory_bytes': self._memory_bytes,
+                'max_memory_bytes': self.max_memory_bytes,
+                'disk_bytes': self._disk_bytes or 0
+            }
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, key[:2], f"{key}.bin")
+
+    def _evict(self):
+        """Évince les frames les plus anciennes vers le disque (verrou tenu)"""
+        while self._memory_bytes > self.max_memory_bytes and len(self._frames) > 1:
+            key, data = self._frames.popitem(last=False)
+            self._memory_bytes -= len(data)
+            self._spill(key, data)
+
+    def _spill(self, key: str, data: bytes):
+        """Écrit une frame évincée sur disque"""
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+            self.stats['spilled'] += 1
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_usage()
+            else:
+                self._disk_bytes += len(data)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._trim_disk()
+        except OSError as e:
+            print(f"⚠️  Impossible d'écrire la frame {key[:12]} sur disque: {e}")
+
+    def _scan_disk_usage(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.spill_dir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def _trim_disk(self):
+        """Supprime les frames les plus anciennes du disque jusqu'à repasser sous la limite"""
+        files = []
+        for root, _, names in os.walk(self.spill_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, stat.st_size, path))
+                except OSError:
+                    pass
+
+        files.sort()
+        for _, size, path in files:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                self._disk_bytes -= size
+            except OSError:
+                pass
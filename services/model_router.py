@@ -0,0 +1,244 @@
+"""
+Routeur de modèles: un modèle (fournisseur, endpoint) par joueur, requêtes couvertes (hedging)
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.async_http_client import AsyncHttpClient, HttpResponse, get_http_client
+from services.tracing import LatencyHistogram
+
+WORKSPACE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CONFIG_FILE = os.path.join(WORKSPACE_DIR, "game_files", "model_router.json")
+
+
+class ModelEndpoint:
+    """Un modèle derrière une API chat completions compatible OpenAI, avec son pool de concurrence"""
+
+    def __init__(self, name: str, model: str, base_url: str, api_key: Optional[str] = None,
+                 max_concurrency: int = 4, timeout: float = 60.0, retries: int = 1):
+        self.name = name
+        self.model = model
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.latency = LatencyHistogram()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.stats = {'requests': 0, 'errors': 0, 'invalid': 0, 'in_flight': 0, 'queued': 0}
+
+    @classmethod
+    def from_config(cls, name: str, config: Dict) -> "ModelEndpoint":
+        api_key = os.getenv(config["api_key_env"]) if config.get("api_key_env") else config.get("api_key")
+        return cls(
+            name=name,
+            model=config.get("model", name),
+            base_url=config.get("base_url", "https://api.openai.com/v1"),
+            api_key=api_key,
+            max_concurrency=config.get("max_concurrency", 4),
+            timeout=config.get("timeout", 60.0),
+            retries=config.get("retries", 1)
+        )
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Créé dans la boucle du client HTTP, au premier appel
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def get_stats(self) -> Dict:
+        return {
+            'model': self.model,
+            'base_url': self.base_url,
+            'max_concurrency': self.max_concurrency,
+            **self.stats,
+            'latency': self.latency.get_stats()
+        }
+
+
+class ModelRouter:
+    """Associe chaque joueur à un modèle et couvre les requêtes lentes.
+
+    La configuration (JSON) décrit les endpoints et, par joueur (clé
+    `player_slot`: "player1" pour le premier joueur dans l'ordre de jeu), un
+    endpoint principal et un endpoint de couverture:
+
+        {"endpoints": {"mini": {"model": "gpt-4o-mini", "api_key_env": "OPENAI_API_KEY"},
+                       "local": {"model": "llama3", "base_url": "http://localhost:11434/v1"}},
+         "players": {"player1": {"primary": "mini", "hedge": "local"}},
+         "default": {"primary": "mini"},
+         "hedge": {"quantile": 0.95, "min_samples": 20, "default_after_ms": 2500}}
+
+    Si la réponse principale n'est pas arrivée après le p95 de latence de son
+    endpoint, la même requête part vers l'endpoint de couverture et la
+    première réponse valide l'emporte; l'autre est annulée. Chaque endpoint a
+    son propre pool de concurrence et son histogramme de latence.
+    """
+
+    def __init__(self, config: Dict, http: Optional[AsyncHttpClient] = None):
+        self.http = http or get_http_client()
+        self.endpoints = {name: ModelEndpoint.from_config(name, cfg)
+                          for name, cfg in config.get("endpoints", {}).items()}
+        if not self.endpoints:
+            raise ValueError("Aucun endpoint de modèle configuré")
+        self.players = config.get("players", {})
+        self.default = config.get("default") or {"primary": next(iter(self.endpoints))}
+        hedge = config.get("hedge", {})
+        self.hedge_quantile = hedge.get("quantile", 0.95)
+        self.hedge_min_samples = hedge.get("min_samples", 20)
+        self.hedge_default_ms = hedge.get("default_after_ms", 2500)
+        self.stats = {'routed': 0, 'hedged': 0, 'hedge_wins': 0, 'failures': 0}
+
+    @classmethod
+    def from_env(cls, http: Optional[AsyncHttpClient] = None) -> "ModelRouter":
+        """Configuration de MODEL_ROUTER_CONFIG (ou game_files/model_router.json), sinon un seul endpoint OpenAI"""
+        path = os.getenv("MODEL_ROUTER_CONFIG", DEFAULT_CONFIG_FILE)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(json.load(f), http)
+        return cls({"endpoints": {"default": {
+            "model": os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+            "base_url": os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+            "api_key_env": "OPENAI_API_KEY"
+        }}}, http)
+
+    @staticmethod
+    def is_configured() -> bool:
+        return os.path.exists(os.getenv("MODEL_ROUTER_CONFIG", DEFAULT_CONFIG_FILE))
+
+    def route(self, player: Optional[str]) -> Tuple[ModelEndpoint, Optional[ModelEndpoint]]:
+        """(endpoint principal, endpoint de couverture) du joueur"""
+        slot = self.players.get(player, self.default) if player is not None else self.default
+        primary = self.endpoints[slot["primary"]]
+        hedge = self.endpoints.get(slot.get("hedge")) if slot.get("hedge") else None
+        return primary, hedge if hedge is not primary else None
+
+    def hedge_after(self, endpoint: ModelEndpoint) -> float:
+        """Délai (s) avant l'envoi de la requête de couverture"""
+        if endpoint.latency.total < self.hedge_min_samples:
+            return self.hedge_default_ms / 1000
+        return endpoint.latency.quantile(self.hedge_quantile) / 1000
+
+    async def _send(self, endpoint: ModelEndpoint, messages: List[Dict], params: Dict) -> HttpResponse:
+        headers = {"Content-Type": "application/json"}
+        if endpoint.api_key:
+            headers["Authorization"] = f"Bearer {endpoint.api_key}"
+        payload = {"model": endpoint.model, "messages": messages, **params}
+
+        endpoint.stats['queued'] += 1
+        try:
+            await endpoint.semaphore.acquire()
+        finally:
+            endpoint.stats['queued'] -= 1
+
+        loop = asyncio.get_running_loop()
+        endpoint.stats['in_flight'] += 1
+        endpoint.stats['requests'] += 1
+        started = loop.time()
+        try:
+            response = await self.http.post_json(
+                f"{endpoint.base_url}/chat/completions", payload, headers=headers,
+                timeout=endpoint.timeout, retries=endpoint.retries
+            )
+        except asyncio.CancelledError:
+            # Requête battue par la couverture: sa latence est au moins le temps écoulé
+            endpoint.latency.observe((loop.time() - started) * 1000)
+            raise
+        except Exception:
+            endpoint.stats['errors'] += 1
+            raise
+        finally:
+            endpoint.stats['in_flight'] -= 1
+            endpoint.semaphore.release()
+
+        if response.ok:
+            endpoint.latency.observe((loop.time() - started) * 1000)
+        else:
+            endpoint.stats['errors'] += 1
+        return response
+
+    @staticmethod
+    def content_of(response: HttpResponse) -> Optional[str]:
+        try:
+            return response.json()["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            return None
+
+    def _is_valid(self, endpoint: ModelEndpoint, task: "asyncio.Task",
+                  validate: Optional[Callable[[str], bool]]) -> bool:
+        if task.cancelled() or task.exception() is not None:
+            return False
+        response = task.result()
+        content = self.content_of(response) if response.ok else None
+        valid = bool(content) and (validate is None or validate(content))
+        if response.ok and not valid:
+            endpoint.stats['invalid'] += 1
+        return valid
+
+    async def complete_async(self, player: Optional[str], messages: List[Dict],
+                             validate: Optional[Callable[[str], bool]] = None,
+                             **params) -> Tuple[HttpResponse, Dict]:
+        """Envoie la requête du joueur, couverte après le p95; retourne (réponse, routage)"""
+        primary, hedge = self.route(player)
+        self.stats['routed'] += 1
+        tasks = {asyncio.ensure_future(self._send(primary, messages, params)): primary}
+        routing = {'player': player, 'endpoint': primary.name, 'model': primary.model, 'hedged': False}
+
+        try:
+            pending = set(tasks)
+            if hedge:
+                done, pending = await asyncio.wait(pending, timeout=self.hedge_after(primary))
+                task = next(iter(done), None)
+                if task is None or not self._is_valid(primary, task, validate):
+                    self.stats['hedged'] += 1
+                    routing['hedged'] = True
+                    hedge_task = asyncio.ensure_future(self._send(hedge, messages, params))
+                    tasks[hedge_task] = hedge
+                    pending = {hedge_task} | {t for t in tasks if not t.done()}
+                    if task is not None:
+                        pending.discard(task)
+                else:
+                    return task.result(), routing
+
+            # Première réponse valide parmi les requêtes en cours
+            last = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    endpoint = tasks[task]
+                    if self._is_valid(endpoint, task, validate):
+                        if endpoint is not primary:
+                            self.stats['hedge_wins'] += 1
+                        routing.update(endpoint=endpoint.name, model=endpoint.model)
+                        return task.result(), routing
+                    last = task
+            self.stats['failures'] += 1
+            last = last or next(iter(tasks))
+            routing.update(endpoint=tasks[last].name, model=tasks[last].model)
+            if last.exception() is not None:
+                raise last.exception()
+            return last.result(), routing
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def complete(self, player: Optional[str], messages: List[Dict],
+                 validate: Optional[Callable[[str], bool]] = None, **params) -> Tuple[HttpResponse, Dict]:
+        """Version synchrone (appelants hors de la boucle du client HTTP)"""
+        return self.http.run(self.complete_async(player, messages, validate, **params))
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'players': self.players,
+            'default': self.default,
+            'hedge_quantile': self.hedge_quantile,
+            'endpoints': {name: endpoint.get_stats() for name, endpoint in self.endpoints.items()}
+        }
@@ -7,6 +7,7 @@ MONOPOLY_POPUPS = {
         "name": "would you like to",
         "text_patterns": ["would you like to"],
         "expected_buttons": ["accounts", "next turn", "roll again"],
+        "ram_message_ids": ["what_would_you_like_to_do"],
         "action": "Choose turn action"
     },
     
@@ -14,6 +15,7 @@ MONOPOLY_POPUPS = {
         "name": "you want to buy",
         "text_patterns": ["you want to buy", "do you want to buy"],
         "expected_buttons": ["auction", "buy"],
+        "ram_message_ids": ["want_to_buy_square"],
         "action": "Buy or auction property"
     },
     
@@ -21,6 +23,7 @@ MONOPOLY_POPUPS = {
         "name": "a Property you own",
         "text_patterns": ["a property you own"],
         "expected_buttons": ["back", "trade"],
+        "ram_message_ids": ["property_management"],
         "action": "Manage owned properties"
     },
     
@@ -33,8 +36,9 @@ MONOPOLY_POPUPS = {
     
     "jail_decision": {
         "name": "In Jail",
-        "text_patterns": ["in jail"],
+        "text_patterns": ["in jail", "pay the bail"],
         "expected_buttons": ["pay bail", "roll dice", "use card"],
+        "ram_message_ids": ["pay_the_bail"],
         "action": "Choose jail action"
     },
     
@@ -49,6 +53,7 @@ MONOPOLY_POPUPS = {
         "name": "Auction",
         "text_patterns": ["bid"],
         "expected_buttons": ["yes", "no"],
+        "ram_message_ids": ["bid_amount", "bid_for_property"],
         "action": "Decide to bid in auction"
     },
     
@@ -96,8 +101,9 @@ MONOPOLY_POPUPS = {
     
     "pay_rent": {
         "name": "Pay Rent",
-        "text_patterns": ["pay rent"],
+        "text_patterns": ["pay rent", "in rent"],
         "expected_buttons": ["ok"],
+        "ram_message_ids": ["pay_rent"],
         "action": "Pay rent to property owner"
     },
     
@@ -105,6 +111,7 @@ MONOPOLY_POPUPS = {
         "name": "Go to Jail",
         "text_patterns": ["go to jail"],
         "expected_buttons": ["ok"],
+        "ram_message_ids": ["go_to_jail", "off_to_jail", "three_doubles_jail", "identity_fraud_jail", "international_fraud_jail"],
         "action": "Go directly to jail"
     },
     
@@ -125,6 +132,19 @@ def get_popup_info(popup_type: str) -> dict:
         "action": "Unknown action"
     })
 
+def get_popup_types_for_messages(message_ids) -> list:
+    """Types de popup correspondant aux IDs de messages détectés en RAM"""
+    message_ids = set(message_ids)
+    return [
+        popup_type for popup_type, info in MONOPOLY_POPUPS.items()
+        if message_ids.intersection(info.get("ram_message_ids", []))
+    ]
+
+def popup_text_matches(popup_type: str, text: str) -> bool:
+    """Le texte (écran ou message RAM) correspond-il à ce type de popup ?"""
+    text = (text or "").lower()
+    return any(pattern in text for pattern in MONOPOLY_POPUPS.get(popup_type, {}).get("text_patterns", []))
+
 def get_expected_action(popup_type: str) -> str:
     """Récupère l'action attendue pour un type de popup"""
     popup_info = get_popup_info(popup_type)
@@ -0,0 +1,154 @@
+"""
+Cache de reconnaissance des popups par hash perceptuel
+"""
+import hashlib
+import io
+import random
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageChops, ImageStat
+
+
+class PopupRecognitionCache:
+    """Associe le hash perceptuel d'un popup au résultat OmniParser déjà obtenu.
+
+    Les popups d'une partie se répètent (tour, achat, prison, cartes...). Un
+    dHash 64 bits de la capture trouve les candidats malgré de légères
+    variations d'affichage. À cette résolution, deux popups de même gabarit
+    sur le même plateau ont le même hash: un candidat n'est retenu que si les
+    zones de texte qu'OmniParser y avait lues ont le même contenu dans la
+    nouvelle capture (écart moyen en niveaux de gris sous `text_tolerance`). Le
+    résultat mis en cache (éléments et bbox) est alors réutilisé sans repasser
+    par OmniParser. Une fraction des hits est tout de même re-parsée pour
+    vérifier que l'entrée est toujours juste.
+    """
+
+    HASH_SIZE = 8
+    PATCH_SIZE = (48, 12)  # Vignette d'une zone de texte, suffisante pour distinguer deux libellés
+
+    def __init__(self, max_entries: int = 64, threshold: int = 6, verify_rate: float = 0.05,
+                 text_tolerance: float = 12.0):
+        self.max_entries = max_entries
+        self.threshold = threshold  # Distance de Hamming maximale (sur 64 bits)
+        self.verify_rate = verify_rate
+        self.text_tolerance = text_tolerance  # Écart moyen maximal (0-255) sur les zones de texte
+        # Clé (hash perceptuel, empreinte des zones de texte): deux popups de même hash coexistent
+        self._entries: "OrderedDict[Tuple[int, str], dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'verifications': 0,
+            'verification_failures': 0,
+            'text_mismatches': 0
+        }
+
+    @classmethod
+    def perceptual_hash(cls, image_bytes: bytes) -> int:
+        """Calcule le dHash de l'image"""
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            small = img.convert('L').resize((cls.HASH_SIZE + 1, cls.HASH_SIZE), Image.BILINEAR)
+            pixels = list(small.getdata())
+
+        value = 0
+        width = cls.HASH_SIZE + 1
+        for row in range(cls.HASH_SIZE):
+            for col in range(cls.HASH_SIZE):
+                left = pixels[row * width + col]
+                right = pixels[row * width + col + 1]
+                value = (value << 1) | (1 if left > right else 0)
+        return value
+
+    @staticmethod
+    def distance(hash_a: int, hash_b: int) -> int:
+        return bin(hash_a ^ hash_b).count('1')
+
+    @classmethod
+    def text_patches(cls, image_bytes: bytes, parsed_content: List[dict]) -> List[Tuple[tuple, bytes]]:
+        """Vignettes en niveaux de gris des zones de texte détectées, avec leur bbox"""
+        boxes = [tuple(int(v) for v in item['bbox']) for item in parsed_content
+                 if item.get('type') == 'text' and len(item.get('bbox', [])) == 4]
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            gray = img.convert('L')
+            return [(box, gray.crop(box).resize(cls.PATCH_SIZE, Image.BILINEAR).tobytes())
+                    for box in boxes if box[2] > box[0] and box[3] > box[1]]
+
+    def _same_text(self, entry: dict, image_bytes: bytes) -> bool:
+        """Les zones de texte de l'entrée ont-elles le même contenu dans cette capture ?"""
+        patches = entry['patches']
+        if not patches:
+            return False  # Rien pour distinguer deux popups de même gabarit
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            gray = img.convert('L')
+            for box, reference in patches:
+                current = gray.crop(box).resize(self.PATCH_SIZE, Image.BILINEAR)
+                expected = Image.frombytes('L', self.PATCH_SIZE, reference)
+                if ImageStat.Stat(ImageChops.difference(current, expected)).mean[0] > self.text_tolerance:
+                    return False
+        return True
+
+    def lookup(self, phash: int, image_bytes: bytes) -> Optional[List[dict]]:
+        """Retourne le contenu parsé du popup le plus proche sous le seuil dont le texte correspond"""
+        with self._lock:
+            candidates = sorted(
+                (d, key) for key in self._entries
+                if (d := self.distance(phash, key[0])) <= self.threshold
+            )
+            entries = [(key, self._entries[key]) for _, key in candidates]
+
+        # Comparaison des zones de texte hors du verrou (décodage de l'image)
+        for key, entry in entries:
+            if self._same_text(entry, image_bytes):
+                with self._lock:
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                return entry['content']
+
+        with self._lock:
+            self.stats['misses'] += 1
+            if entries:
+                self.stats['text_mismatches'] += 1
+        return None
+
+    def store(self, phash: int, parsed_content: List[dict], image_bytes: bytes):
+        patches = self.text_patches(image_bytes, parsed_content)
+        key = (phash, hashlib.blake2b(b''.join(patch for _, patch in patches), digest_size=8).hexdigest())
+        with self._lock:
+            self._entries[key] = {'content': parsed_content, 'patches': patches}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, phash: int, image_bytes: bytes):
+        """Supprime les entrées que cette capture retrouverait (hash proche et même texte)"""
+        with self._lock:
+            near = [(k, e) for k, e in self._entries.items() if self.distance(phash, k[0]) <= self.threshold]
+        stale = [k for k, entry in near if self._same_text(entry, image_bytes)]
+        with self._lock:
+            for key in stale:
+                self._entries.pop(key, None)
+
+    def should_verify(self) -> bool:
+        """Tire au sort si un hit doit être re-vérifié par OmniParser"""
+        return random.random() < self.verify_rate
+
+    def record_verification(self, success: bool):
+        with self._lock:
+            self.stats['verifications'] += 1
+            if not success:
+                self.stats['verification_failures'] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'hit_rate': self.stats['hits'] / lookups if lookups else 0,
+                'threshold': self.threshold,
+                'text_tolerance': self.text_tolerance,
+                'verify_rate': self.verify_rate
+            }
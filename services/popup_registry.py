@@ -0,0 +1,196 @@
+"""
+Registre borné des popups actifs avec expiration sur une roue temporelle unique
+"""
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+
+class PopupRegistry:
+    """Stocke les popups actifs avec une taille maximale et un TTL.
+
+    Toutes les expirations passent par une seule roue temporelle (un seul
+    thread) au lieu d'un thread par popup. Les compteurs par statut et par type
+    sont tenus à jour à chaque modification pour que les statistiques soient en O(1).
+    Les champs d'un popup doivent être modifiés via `update()` pour garder les
+    compteurs cohérents.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 300.0, tick: float = 0.5,
+                 wheel_size: int = 512, type_of: Optional[Callable[[dict], str]] = None,
+                 on_remove: Optional[Callable[[str, dict], None]] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.tick = tick
+        self.type_of = type_of or (lambda popup: popup.get('popup_type', 'unknown'))
+        self.on_remove = on_remove
+
+        self._popups: "OrderedDict[str, dict]" = OrderedDict()
+        self._deadlines: Dict[str, float] = {}
+        self._wheel: List[Set[Tuple[str, float]]] = [set() for _ in range(wheel_size)]
+        self._last_tick = int(time.monotonic() / tick)
+        self._lock = threading.RLock()
+        self._thread = None
+
+        self._by_status: Counter = Counter()
+        self._by_type: Counter = Counter()
+        self._evicted = 0
+        self._expired = 0
+        self._response_time_total = 0.0
+        self._response_count = 0
+
+    # --- Accès façon dict ---
+
+    def __contains__(self, popup_id) -> bool:
+        with self._lock:
+            return popup_id in self._popups
+
+    def __getitem__(self, popup_id: str) -> dict:
+        with self._lock:
+            return self._popups[popup_id]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._popups)
+
+    def get(self, popup_id: str, default=None) -> Optional[dict]:
+        with self._lock:
+            return self._popups.get(popup_id, default)
+
+    def values(self) -> List[dict]:
+        with self._lock:
+            return list(self._popups.values())
+
+    def copy(self) -> Dict[str, dict]:
+        with self._lock:
+            return dict(self._popups)
+
+    # --- Modifications ---
+
+    def add(self, popup_id: str, popup: dict, ttl: Optional[float] = None):
+        """Ajoute un popup, en évinçant le plus ancien si le registre est plein"""
+        with self._lock:
+            if popup_id in self._popups:
+                self._uncount(self._popups[popup_id])
+            self._popups[popup_id] = popup
+            self._popups.move_to_end(popup_id)
+            self._count(popup)
+
+            while len(self._popups) > self.max_size:
+                oldest_id = next(iter(self._popups))
+                self._remove(oldest_id)
+                self._evicted += 1
+
+            self._schedule(popup_id, self.ttl if ttl is None else ttl)
+        self._ensure_timer()
+
+    def update(self, popup_id: str, **fields) -> bool:
+        """Met à jour les champs d'un popup en maintenant les compteurs"""
+        with self._lock:
+            popup = self._popups.get(popup_id)
+            if popup is None:
+                return False
+
+            self._uncount(popup)
+            previous_status = popup.get('status')
+            popup.update(fields)
+            self._count(popup)
+
+            if popup.get('status') == 'executed' and previous_status != 'executed':
+                self._record_response_time(popup)
+            return True
+
+    def expire(self, popup_id: str, delay: float):
+        """Reprogramme la suppression d'un popup dans `delay` secondes"""
+        with self._lock:
+            if popup_id in self._popups:
+                self._schedule(popup_id, delay)
+        self._ensure_timer()
+
+    def remove(self, popup_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._remove(popup_id)
+
+    def get_stats(self) -> Dict:
+        """Statistiques en O(1) à partir des compteurs courants"""
+        with self._lock:
+            average = self._response_time_total / self._response_count if self._response_count else 0
+            return {
+                'total_active': len(self._popups),
+                'by_status': {k: v for k, v in self._by_status.items() if v > 0},
+                'by_type': {k: v for k, v in self._by_type.items() if v > 0},
+                'average_response_time': average,
+                'evicted': self._evicted,
+                'expired': self._expired,
+                'max_size': self.max_size,
+                'ttl': self.ttl
+            }
+
+    # --- Interne ---
+
+    def _count(self, popup: dict):
+        self._by_status[popup.get('status', 'unknown')] += 1
+        self._by_type[self.type_of(popup)] += 1
+
+    def _uncount(self, popup: dict):
+        self._by_status[popup.get('status', 'unknown')] -= 1
+        self._by_type[self.type_of(popup)] -= 1
+
+    def _record_response_time(self, popup: dict):
+        try:
+            detected = datetime.fromisoformat(popup['detected_at'])
+            executed = datetime.fromisoformat(popup['executed_at'])
+        except (KeyError, TypeError, ValueError):
+            return
+        self._response_time_total += (executed - detected).total_seconds()
+        self._response_count += 1
+
+    def _remove(self, popup_id: str) -> Optional[dict]:
+        popup = self._popups.pop(popup_id, None)
+        self._deadlines.pop(popup_id, None)
+        if popup is not None:
+            self._uncount(popup)
+            if self.on_remove:
+                try:
+                    self.on_remove(popup_id, popup)
+                except Exception as e:
+                    print(f"⚠️  Erreur dans on_remove pour {popup_id}: {e}")
+        return popup
+
+    def _schedule(self, popup_id: str, delay: float):
+        """Place l'échéance dans la case de la roue correspondante (verrou tenu)"""
+        deadline = time.monotonic() + delay
+        self._deadlines[popup_id] = deadline
+        # Case du premier tick après l'échéance: quand elle est traitée, toutes ses échéances sont passées
+        tick = max(math.ceil(deadline / self.tick), self._last_tick + 1)
+        self._wheel[tick % len(self._wheel)].add((popup_id, deadline))
+
+    def _ensure_timer(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """Fait tourner la roue et supprime les popups arrivés à échéance"""
+        while True:
+            time.sleep(self.tick)
+            now = time.monotonic()
+            current_tick = int(now / self.tick)
+            with self._lock:
+                # Ne jamais parcourir plus d'un tour complet
+                first_tick = max(self._last_tick + 1, current_tick - len(self._wheel) + 1)
+                for t in range(first_tick, current_tick + 1):
+                    slot = self._wheel[t % len(self._wheel)]
+                    for entry in list(slot):
+                        popup_id, deadline = entry
+                        if self._deadlines.get(popup_id) != deadline:
+                            # Échéance remplacée ou popup déjà supprimé
+                            slot.discard(entry)
+                        elif deadline <= now:
+                            slot.discard(entry)
+                            self._remove(popup_id)
+                            self._expired += 1
+                self._last_tick = current_tick
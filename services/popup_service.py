@@ -1,25 +1,46 @@
 """
 Service centralisé pour la gestion des popups
 """
+import base64
+import io
 import json
 import time
 from datetime import datetime
 from typing import Dict, Optional
 import requests
+from PIL import Image
 from .event_bus import EventBus, EventTypes
+from .frame_store import FrameStore
+from .monopoly_popups import MONOPOLY_POPUPS
+from .popup_registry import PopupRegistry
+from .popup_recognition_cache import PopupRecognitionCache
+from .ram_popup_classifier import RamPopupClassifier
+from .tracing import correlation_headers, get_correlation_id, span
 
 class PopupService:
     """Gère la détection, l'analyse et les décisions des popups"""
     
-    def __init__(self, event_bus: EventBus, omniparser_url="http://localhost:8000", unified_server_url="http://localhost:7000"):
+    def __init__(self, event_bus: EventBus, omniparser_url="http://localhost:8000", unified_server_url="http://localhost:7000", frame_store: Optional[FrameStore] = None):
         self.event_bus = event_bus
         self.omniparser_url = omniparser_url
         self.unified_server_url = unified_server_url
-        self.active_popups: Dict[str, dict] = {}
+        self.active_popups = PopupRegistry(type_of=self._popup_type_key, on_remove=self._on_popup_removed)
+        
+        # Captures référencées par clé plutôt que copiées dans chaque popup/événement
+        self.frame_store = frame_store or FrameStore()
+        self._popups_by_frame: Dict[str, str] = {}
+        
+        # Popups déjà vus reconnus par hash perceptuel, sans repasser par OmniParser
+        self.recognition_cache = PopupRecognitionCache()
+        
+        # Popups identifiés directement par les messages en RAM (boutons calibrés)
+        self.ram_classifier = RamPopupClassifier()
+        self.ram_classifier.on_message_gone(self._on_ram_message_gone)
         
         # S'abonner aux événements
         self.event_bus.subscribe(EventTypes.POPUP_DETECTED, self._on_popup_detected)
         self.event_bus.subscribe(EventTypes.AI_DECISION_MADE, self._on_decision_made)
+        self.event_bus.subscribe(EventTypes.AI_DECISION_EXPLAINED, self._on_decision_explained)
     
     def register_popup(self, popup_data: dict) -> str:
         """Enregistre un nouveau popup détecté"""
@@ -29,9 +50,16 @@ class PopupService:
         popup_data['id'] = popup_id
         popup_data['detected_at'] = datetime.utcnow().isoformat()
         popup_data['status'] = 'detected'
+        popup_data['correlation_id'] = get_correlation_id()
+        
+        # Ne garder qu'une référence vers la capture
+        if 'screenshot_base64' in popup_data:
+            popup_data['screenshot_key'] = self.frame_store.put_base64(popup_data.pop('screenshot_base64'))
         
         # Stocker
-        self.active_popups[popup_id] = popup_data
+        self.active_popups.add(popup_id, popup_data)
+        if popup_data.get('screenshot_key'):
+            self._popups_by_frame[popup_data['screenshot_key']] = popup_id
         
         # Publier l'événement
         self.event_bus.publish(
@@ -42,86 +70,117 @@ class PopupService:
         
         return popup_id
     
-    def analyze_popup(self, popup_id: str, screenshot_base64: str) -> dict:
+    def find_showing_popup(self, frame_key: str) -> Optional[str]:
+        """Retourne l'ID du popup encore affiché avec exactement cette capture"""
+        popup_id = self._popups_by_frame.get(frame_key)
+        popup = self.active_popups.get(popup_id) if popup_id else None
+        if popup and popup.get('status') not in ('executed', 'closed'):
+            return popup_id
+        return None
+    
+    def analyze_popup(self, popup_id: str, frame_key: str) -> dict:
         """Analyse un popup avec OmniParser"""
         if popup_id not in self.active_popups:
             raise ValueError(f"Popup {popup_id} not found")
         
         try:
-            # Appeler OmniParser
-            response = requests.post(
-                f"{self.omniparser_url}/parse/",
-                json={"base64_image": screenshot_base64},
-                timeout=30
-            )
+            frame = self.frame_store.get(frame_key)
+            if frame is None:
+                raise Exception(f"Frame {frame_key[:12]} not found")
             
-            if response.ok:
-                result = response.json()
-                parsed_content = result.get('parsed_content_list', [])
-                
-                # Extraire toutes les informations (texte + icônes)
-                options = []
-                text_content = []
-                
-                for item in parsed_content:
-                    if item.get('type') == 'text':
-                        text = item.get('content', '').lower()
-                        text_content.append(item.get('content', ''))
-                        
-                        # Détecter tous les boutons et options Monopoly
-                        button_keywords = [
-                            'ok', 'cancel', 'yes', 'no', 'confirm', 'accept', 'decline', 'pay',
-                            'accounts', 'next turn', 'roll again', 'auction', 'buy', 'back', 
-                            'trade', 'pay bail', 'roll dice', 'use card', 'bid', 'deal', 
-                            'no deal', 'propose', 'request cash', 'add cash', 'mortage',
-                            'buy 1', 'buy set', 'sell 1', 'sell set', 'done'
-                        ]
-                        
-                        if any(keyword in text for keyword in button_keywords):
-                            options.append({
-                                'name': text,
-                                'original_text': item.get('content', ''),
-                                'bbox': item.get('bbox', []),
-                                'confidence': item.get('confidence', 1.0),
-                                'type': 'button'
-                            })
+            # Popup déjà reconnu: réutiliser le résultat OmniParser précédent
+            phash = self.recognition_cache.perceptual_hash(frame)
+            parsed_content = self.recognition_cache.lookup(phash, frame)
+            from_cache = parsed_content is not None
+            
+            # Sinon, OCR ciblé sur les boutons calibrés des popups possibles d'après la RAM
+            targeted_type = None
+            if not from_cache:
+                parsed_content, targeted_type = self._parse_known_buttons(frame)
+            
+            if not targeted_type and (not from_cache or self.recognition_cache.should_verify()):
+                fresh_content = self._parse_with_omniparser(base64.b64encode(frame).decode(), idempotency_key=frame_key)
+                if from_cache:
+                    # Échantillon de vérification: l'entrée décrit-elle toujours ce popup ?
+                    verified = self._text_signature(fresh_content) == self._text_signature(parsed_content)
+                    self.recognition_cache.record_verification(verified)
+                    if not verified:
+                        self.recognition_cache.invalidate(phash, frame)
+                parsed_content = fresh_content
+                from_cache = False
+                self.recognition_cache.store(phash, parsed_content, frame)
+            
+            # Extraire toutes les informations (texte + icônes)
+            options = []
+            text_content = []
+            
+            for item in parsed_content:
+                if item.get('type') == 'text':
+                    text = item.get('content', '').lower()
+                    text_content.append(item.get('content', ''))
                     
-                    elif item.get('type') == 'icon':
-                        # Les icônes peuvent aussi être des boutons
+                    # Détecter tous les boutons et options Monopoly
+                    button_keywords = [
+                        'ok', 'cancel', 'yes', 'no', 'confirm', 'accept', 'decline', 'pay',
+                        'accounts', 'next turn', 'roll again', 'auction', 'buy', 'back', 
+                        'trade', 'pay bail', 'roll dice', 'use card', 'bid', 'deal', 
+                        'no deal', 'propose', 'request cash', 'add cash', 'mortage',
+                        'buy 1', 'buy set', 'sell 1', 'sell set', 'done'
+                    ]
+                    
+                    if any(keyword in text for keyword in button_keywords):
                         options.append({
-                            'name': item['content'].lower(),
+                            'name': text,
+                            'original_text': item.get('content', ''),
                             'bbox': item.get('bbox', []),
                             'confidence': item.get('confidence', 1.0),
-                            'type': 'icon'
+                            'type': 'button'
                         })
                 
-                # Mettre à jour le popup avec toutes les infos
-                self.active_popups[popup_id]['options'] = options
-                self.active_popups[popup_id]['text_content'] = text_content
-                self.active_popups[popup_id]['raw_parsed_content'] = parsed_content
-                self.active_popups[popup_id]['status'] = 'analyzed'
-                self.active_popups[popup_id]['analyzed_at'] = datetime.utcnow().isoformat()
-                
-                # Déterminer le type de popup
-                popup_type = self._determine_popup_type(text_content, options)
-                self.active_popups[popup_id]['popup_type'] = popup_type
-                
-                # Publier l'événement
-                self.event_bus.publish(
-                    EventTypes.POPUP_ANALYZED,
-                    {
-                        'popup_id': popup_id,
-                        'options': options,
-                        'text_content': text_content,
-                        'popup_type': popup_type
-                    },
-                    source='popup_service'
-                )
-                
-                return {'success': True, 'options': options, 'text_content': text_content}
-            else:
-                raise Exception(f"OmniParser error: {response.status_code}")
-                
+                elif item.get('type') == 'icon':
+                    # Les icônes peuvent aussi être des boutons
+                    options.append({
+                        'name': item['content'].lower(),
+                        'bbox': item.get('bbox', []),
+                        'confidence': item.get('confidence', 1.0),
+                        'type': 'icon'
+                    })
+            
+            # Déterminer le type de popup
+            popup_type = targeted_type or self._determine_popup_type(text_content, options)
+            
+            # Calibrer les positions de boutons pour la classification RAM
+            if not from_cache and not targeted_type:
+                with Image.open(io.BytesIO(frame)) as img:
+                    self.ram_classifier.learn(popup_type, options, img.size)
+            
+            # Mettre à jour le popup avec toutes les infos
+            self.active_popups.update(
+                popup_id,
+                options=options,
+                text_content=text_content,
+                raw_parsed_content=parsed_content,
+                status='analyzed',
+                analyzed_at=datetime.utcnow().isoformat(),
+                popup_type=popup_type,
+                recognized_from_cache=from_cache,
+                targeted_ocr=bool(targeted_type)
+            )
+            
+            # Publier l'événement
+            self.event_bus.publish(
+                EventTypes.POPUP_ANALYZED,
+                {
+                    'popup_id': popup_id,
+                    'options': options,
+                    'text_content': text_content,
+                    'popup_type': popup_type
+                },
+                source='popup_service'
+            )
+            
+            return {'success': True, 'options': options, 'text_content': text_content}
+            
         except Exception as e:
             # Publier l'erreur
             self.event_bus.publish(
@@ -135,6 +194,93 @@ class PopupService:
             )
             return {'success': False, 'error': str(e)}
     
+    def apply_ram_classification(self, popup_id: str, classification: dict) -> dict:
+        """Renseigne un popup identifié par la RAM, sans capture ni OmniParser"""
+        if popup_id not in self.active_popups:
+            raise ValueError(f"Popup {popup_id} not found")
+        
+        options = classification['options']
+        text_content = classification['text_content']
+        popup_type = classification['popup_type']
+        
+        self.active_popups.update(
+            popup_id,
+            options=options,
+            text_content=text_content,
+            status='analyzed',
+            analyzed_at=datetime.utcnow().isoformat(),
+            popup_type=popup_type,
+            classified_from='ram'
+        )
+        
+        self.event_bus.publish(
+            EventTypes.POPUP_ANALYZED,
+            {
+                'popup_id': popup_id,
+                'options': options,
+                'text_content': text_content,
+                'popup_type': popup_type
+            },
+            source='popup_service'
+        )
+        
+        return {'success': True, 'options': options, 'text_content': text_content}
+    
+    def _parse_with_omniparser(self, screenshot_base64: str, regions: Optional[list] = None,
+                               keywords: Optional[list] = None, idempotency_key: Optional[str] = None) -> list:
+        """Envoie une capture à OmniParser et retourne les éléments détectés.
+        
+        Avec `regions`, OmniParser ne fait que la reconnaissance de texte sur ces zones.
+        `idempotency_key` (la clé de la capture) permet de récupérer un résultat déjà calculé.
+        """
+        payload = {"base64_image": screenshot_base64}
+        if regions:
+            payload["regions"] = regions
+            payload["keywords"] = keywords
+        headers = correlation_headers({"Idempotency-Key": idempotency_key} if idempotency_key else None)
+        with span('omniparser', targeted=bool(regions)):
+            response = requests.post(f"{self.omniparser_url}/parse/", json=payload, headers=headers, timeout=30)
+        if not response.ok:
+            raise Exception(f"OmniParser error: {response.status_code}")
+        return response.json().get('parsed_content_list', [])
+    
+    def _parse_known_buttons(self, frame: bytes):
+        """OCR ciblé sur les boutons attendus; retourne (contenu, type) ou (None, None) si non concluant"""
+        with Image.open(io.BytesIO(frame)) as img:
+            frame_size = img.size
+        candidates = self.ram_classifier.candidate_regions(frame_size)
+        if not candidates:
+            return None, None
+        
+        try:
+            parsed_content = self._parse_with_omniparser(
+                base64.b64encode(frame).decode(), candidates['regions'], candidates['keywords']
+            )
+        except Exception as e:
+            print(f"[POPUP] Targeted OCR failed, falling back to full parse: {e}")
+            return None, None
+        
+        # Un seul type dont tous les boutons attendus ont été lus
+        found = {item.get('content', '').lower() for item in parsed_content}
+        matching = [
+            popup_type for popup_type in candidates['popup_types']
+            if set(MONOPOLY_POPUPS[popup_type]['expected_buttons']) <= found
+        ]
+        if len(matching) != 1:
+            return None, None
+        
+        expected = MONOPOLY_POPUPS[matching[0]]['expected_buttons']
+        return [item for item in parsed_content if item.get('content', '').lower() in expected], matching[0]
+    
+    @staticmethod
+    def _text_signature(parsed_content: list) -> list:
+        """Textes détectés, normalisés, pour comparer deux résultats de parsing"""
+        return sorted(
+            item.get('content', '').strip().lower()
+            for item in parsed_content
+            if item.get('type') == 'text'
+        )
+    
     def request_ai_decision(self, popup_id: str, game_context: dict) -> None:
         """Demande une décision à l'IA"""
         if popup_id not in self.active_popups:
@@ -149,7 +295,9 @@ class PopupService:
                 'popup_id': popup_id,
                 'popup_text': popup.get('text', ''),
                 'options': popup.get('options', []),
-                'game_context': game_context
+                'game_context': game_context,
+                'popup_type': popup.get('popup_type'),
+                'player': popup.get('player')  # Clé "player1"... si le détecteur l'a fournie
             },
             source='popup_service'
         )
@@ -160,9 +308,12 @@ class PopupService:
             return False
         
         # Mettre à jour le statut
-        self.active_popups[popup_id]['status'] = 'executed'
-        self.active_popups[popup_id]['decision'] = decision
-        self.active_popups[popup_id]['executed_at'] = datetime.utcnow().isoformat()
+        self.active_popups.update(
+            popup_id,
+            status='executed',
+            decision=decision,
+            executed_at=datetime.utcnow().isoformat()
+        )
         
         # Publier l'événement
         self.event_bus.publish(
@@ -186,32 +337,81 @@ class PopupService:
     
     def get_active_popups(self) -> list:
         """Récupère tous les popups actifs"""
-        return list(self.active_popups.values())
+        return self.active_popups.values()
+    
+    def get_stats(self) -> dict:
+        """Statistiques des popups actifs (O(1), tenues par le registre)"""
+        return self.active_popups.get_stats()
     
     def _on_popup_detected(self, event: dict):
         """Callback quand un popup est détecté"""
         data = event['data']
-        if 'screenshot_base64' in data:
+        if data.get('screenshot_key'):
             # Analyser automatiquement
-            self.analyze_popup(data['id'], data['screenshot_base64'])
+            self.analyze_popup(data['id'], data['screenshot_key'])
     
     def _on_decision_made(self, event: dict):
         """Callback quand une décision est prise"""
         data = event['data']
         popup_id = data.get('popup_id')
+        self.active_popups.update(
+            popup_id,
+            decision=data.get('decision'),
+            decision_reason=data.get('reason')
+        )
+    
+    def _on_decision_explained(self, event: dict):
+        """Explication reçue après une décision publiée en streaming"""
+        data = event['data']
+        popup_id = data.get('popup_id')
         if popup_id in self.active_popups:
-            self.active_popups[popup_id]['decision'] = data.get('decision')
-            self.active_popups[popup_id]['decision_reason'] = data.get('reason')
+            self.active_popups.update(popup_id, decision_reason=data.get('reason'))
+    
+    def _on_ram_message_gone(self, message_id: str):
+        """Un message a quitté la RAM: les popups non exécutés de ce type sont fermés"""
+        closing = [
+            popup for popup in self.active_popups.values()
+            if popup.get('status') != 'executed'
+            and message_id in MONOPOLY_POPUPS.get(popup.get('popup_type'), {}).get('ram_message_ids', [])
+        ]
+        for popup in closing:
+            self.active_popups.update(popup['id'], status='closed', closed_at=datetime.utcnow().isoformat())
+            self.event_bus.publish(
+                EventTypes.POPUP_CLOSED,
+                {
+                    'popup_id': popup['id'],
+                    'popup_type': popup.get('popup_type'),
+                    'message_id': message_id
+                },
+                source='popup_service'
+            )
+            self._schedule_cleanup(popup['id'], delay=5)
     
     def _schedule_cleanup(self, popup_id: str, delay: int = 5):
         """Planifie le nettoyage d'un popup"""
-        import threading
-        def cleanup():
-            time.sleep(delay)
-            if popup_id in self.active_popups:
-                del self.active_popups[popup_id]
-        
-        threading.Thread(target=cleanup, daemon=True).start()
+        self.active_popups.expire(popup_id, delay)
+    
+    def _on_popup_removed(self, popup_id: str, popup: dict):
+        """Callback du registre quand un popup expire ou est évincé"""
+        if self._popups_by_frame.get(popup.get('screenshot_key')) == popup_id:
+            del self._popups_by_frame[popup['screenshot_key']]
+    
+    @staticmethod
+    def _popup_type_key(popup: dict) -> str:
+        """Type utilisé pour les statistiques (type analysé, sinon déduit du texte)"""
+        if popup.get('popup_type'):
+            return popup['popup_type']
+        text_lower = popup.get('text', '').lower()
+        if 'buy' in text_lower:
+            return 'buy'
+        elif 'roll' in text_lower:
+            return 'roll'
+        elif 'trade' in text_lower:
+            return 'trade'
+        elif 'auction' in text_lower:
+            return 'auction'
+        else:
+            return 'other'
     
     def _generate_id(self) -> str:
         """Génère un ID unique"""
@@ -7,6 +7,7 @@ import requests
 from datetime import datetime
 from typing import Dict, Optional
 from .event_bus import EventBus, EventTypes
+from .popup_registry import PopupRegistry
 
 class PopupService:
     """Manages popup detection, analysis and decisions"""
@@ -14,7 +15,7 @@ class PopupService:
     def __init__(self, event_bus: EventBus, omniparser_url="http://localhost:8000"):
         self.event_bus = event_bus
         self.omniparser_url = omniparser_url
-        self.active_popups = {}
+        self.active_popups = PopupRegistry()
         
     def register_popup(self, popup_data: dict) -> str:
         """Register a new detected popup"""
@@ -24,7 +25,7 @@ class PopupService:
         popup_data['detected_at'] = datetime.utcnow().isoformat()
         popup_data['status'] = 'detected'
         
-        self.active_popups[popup_id] = popup_data
+        self.active_popups.add(popup_id, popup_data)
         
         print(f"[POPUP SERVICE] Registered popup: {popup_id}")
         
@@ -80,9 +81,12 @@ class PopupService:
                             })
                 
                 # Update popup data
-                self.active_popups[popup_id]['options'] = options
-                self.active_popups[popup_id]['text_content'] = text_content
-                self.active_popups[popup_id]['status'] = 'analyzed'
+                self.active_popups.update(
+                    popup_id,
+                    options=options,
+                    text_content=text_content,
+                    status='analyzed'
+                )
                 
                 print(f"[POPUP SERVICE] Found options: {[opt['name'] for opt in options]}")
                 
@@ -154,8 +158,7 @@ class PopupService:
         if decision:
             print(f"[POPUP SERVICE] Simple decision: clicking '{decision['name']}'")
             
-            self.active_popups[popup_id]['decision'] = decision
-            self.active_popups[popup_id]['status'] = 'decided'
+            self.active_popups.update(popup_id, decision=decision, status='decided')
             
             # Publish decision
             self.event_bus.publish(
@@ -186,14 +189,15 @@ class PopupService:
     
     def execute_decision(self, popup_id: str, decision: str, coordinates: tuple) -> bool:
         """Execute a decision (mark as executed)"""
-        if popup_id in self.active_popups:
-            self.active_popups[popup_id]['status'] = 'executed'
-            self.active_popups[popup_id]['executed_at'] = datetime.utcnow().isoformat()
-            
-            # Clean up after a delay
-            # In production, you might want to do this differently
-            if popup_id in self.active_popups:
-                del self.active_popups[popup_id]
-            
+        if self.active_popups.update(
+            popup_id,
+            status='executed',
+            executed_at=datetime.utcnow().isoformat()
+        ):
+            self.active_popups.remove(popup_id)
             return True
-        return False
\ No newline at end of file
+        return False
+    
+    def get_stats(self) -> dict:
+        """Get popup statistics (O(1), maintained by the registry)"""
+        return self.active_popups.get_stats()
\ No newline at end of file
@@ -0,0 +1,304 @@
+"""
+Compaction du contexte de décision et budget de tokens des prompts
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib
+import json
+import threading
+from typing import Dict, List, Optional
+
+from services.monopoly_popups import MONOPOLY_POPUPS
+from src.sim.board import MONOPOLY_BOARD, color_groups
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+try:
+    from src.sim.markov import get_tables
+except ImportError:
+    get_tables = None
+
+STATE_SCHEMA = "state/v1"
+
+# Légende fixe, placée dans le préfixe stable (mise en cache côté fournisseur)
+SCHEMA_LEGEND = (
+    "Game state format (compact JSON): "
+    '{"turn": turn number, "current": current player, "dice": last dice, '
+    '"players": [{"name", "money", "pos": board square 0-39, "jail": bool, '
+    '"groups": {"color": "owned/total"}, "trend": recent money values (optional)}], '
+    '"threats": [{"sq": square, "name", "owner", "rent", "p": landing probability next roll}]}. '
+    'Buttons format: [{"text", "box": [x1, y1, x2, y2]}].'
+)
+
+BUTTON_LABELS = sorted({label for popup in MONOPOLY_POPUPS.values() for label in popup["expected_buttons"]})
+GROUPS = color_groups(MONOPOLY_BOARD)
+GROUP_OF = {square: color for color, squares in GROUPS.items() for square in squares}
+
+
+def count_tokens(text: str) -> int:
+    """Nombre de tokens (tiktoken si installé, sinon ~4 caractères par token)"""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return (len(text) + 3) // 4
+
+
+def _dump(data) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+class PromptCompactor:
+    """Réduit le contexte de jeu et les éléments OmniParser à un état minimal pour le LLM.
+
+    L'état suit un schéma fixe (argent, positions, groupes possédés, menaces du
+    prochain lancer), quel que soit le format d'origine (Contexte ou moniteur);
+    seuls les éléments interactifs du parsing sont conservés. Chaque partie est
+    rognée pour tenir dans sa part du budget de tokens. Le préfixe (prompt
+    système + légende du schéma) ne change jamais pour un type de décision, ce
+    qui permet au fournisseur de réutiliser son cache de prompt.
+    """
+
+    def __init__(self, token_budget: int = 800, state_share: float = 0.6, max_elements: int = 12,
+                 max_threats: int = 3):
+        self.token_budget = token_budget
+        self.state_share = state_share
+        self.max_elements = max_elements
+        self.max_threats = max_threats
+        self._prefixes: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'decisions': 0,
+            'prompt_tokens': 0,
+            'max_prompt_tokens': 0,
+            'over_budget': 0,
+            'elements_dropped': 0,
+            'provider_prompt_tokens': 0,
+            'provider_cached_tokens': 0,
+            'by_type': {}
+        }
+        self.markov = None
+        if get_tables is not None:
+            try:
+                self.markov = get_tables()
+            except Exception as e:
+                print(f"⚠️  Tables Markov indisponibles pour les menaces: {e}")
+
+    # ------------------------------------------------------------------ #
+    # Préfixe stable
+    # ------------------------------------------------------------------ #
+    def prefix(self, decision_type: str, system_prompt: str) -> str:
+        """Prompt système suivi de la légende du schéma, identique d'un appel à l'autre"""
+        with self._lock:
+            if decision_type not in self._prefixes:
+                self._prefixes[decision_type] = f"{system_prompt.strip()}\n\n{SCHEMA_LEGEND}"
+            return self._prefixes[decision_type]
+
+    def prefix_hash(self, decision_type: str) -> Optional[str]:
+        prefix = self._prefixes.get(decision_type)
+        return hashlib.sha256(prefix.encode()).hexdigest()[:12] if prefix else None
+
+    # ------------------------------------------------------------------ #
+    # État minimal
+    # ------------------------------------------------------------------ #
+    def compact_state(self, context: Dict) -> Dict:
+        """État au schéma fixe à partir d'un contexte Contexte, moniteur ou déjà compact"""
+        if not context:
+            return {"schema": STATE_SCHEMA, "players": []}
+        if context.get("schema") == STATE_SCHEMA:
+            return context
+        if isinstance(context.get("state"), dict) and context["state"].get("schema") == STATE_SCHEMA:
+            return context["state"]
+        if "player_contexts" in context:
+            return self._from_monitor(context)
+        return self._from_contexte(context)
+
+    def _from_contexte(self, context: Dict) -> Dict:
+        global_ctx = context.get("global", {})
+        rents = {prop.get("id"): prop for prop in global_ctx.get("properties", [])}
+        players, owners, current = [], {}, None
+        for name, player in context.get("players", {}).items():
+            owned = [sq for sq in player.get("properties", []) if isinstance(sq, int)]
+            owners.update({sq: name for sq in owned})
+            if player.get("current_player") or global_ctx.get("current_player") == name:
+                current = name
+            players.append(self._player(name, player.get("money", 0), player.get("position", 0),
+                                        player.get("jail", False), owned))
+        state = {
+            "schema": STATE_SCHEMA,
+            "turn": global_ctx.get("current_turn", 0),
+            "current": current,
+            "players": players
+        }
+        current_player = context.get("players", {}).get(current, {})
+        if current is not None:
+            state["dice"] = current_player.get("dice_result")
+            state["threats"] = self._threats(current_player.get("position", 0), current, owners, rents)
+        return state
+
+    def _from_monitor(self, context: Dict) -> Dict:
+        global_ctx = context.get("global_state", {})
+        players, owners = [], {}
+        for player_id, player in context.get("player_contexts", {}).items():
+            name = str(player.get("name", player_id))
+            owned = [sq for sq in player.get("properties", []) if isinstance(sq, int)]
+            owners.update({sq: name for sq in owned})
+            players.append(self._player(name, player.get("current_money", 0), player.get("current_position", 0),
+                                        player.get("jail", False), owned))
+        current_index = global_ctx.get("current_turn", 0)
+        current = players[current_index] if isinstance(current_index, int) and 0 <= current_index < len(players) else None
+        state = {
+            "schema": STATE_SCHEMA,
+            "turn": current_index,
+            "current": current["name"] if current else None,
+            "dice": global_ctx.get("dice_values"),
+            "players": players
+        }
+        if current:
+            state["threats"] = self._threats(current["pos"], current["name"], owners, {})
+        return state
+
+    @staticmethod
+    def _player(name: str, money, position, jail, owned: List[int]) -> Dict:
+        groups = {}
+        for square in owned:
+            color = GROUP_OF.get(square)
+            if color:
+                groups[color] = groups.get(color, 0) + 1
+        return {
+            "name": name,
+            "money": int(money or 0),
+            "pos": int(position or 0),
+            "jail": bool(jail),
+            "groups": {color: f"{count}/{len(GROUPS[color])}" for color, count in sorted(groups.items())}
+        }
+
+    def _threats(self, position: int, current: str, owners: Dict[int, str], properties: Dict) -> List[Dict]:
+        """Cases adverses atteignables au prochain lancer, classées par loyer espéré"""
+        threats = []
+        for total in range(2, 13):
+            square = (position + total) % len(MONOPOLY_BOARD)
+            owner = owners.get(square)
+            if owner is None or owner == current:
+                continue
+            prob = (6 - abs(total - 7)) / 36
+            threats.append({
+                "sq": square,
+                "name": MONOPOLY_BOARD[square]["name"],
+                "owner": owner,
+                "rent": self._rent(square, owner, owners, properties, total),
+                "p": round(prob, 3)
+            })
+        threats.sort(key=lambda t: t["rent"] * t["p"], reverse=True)
+        return threats[:self.max_threats]
+
+    def _rent(self, square: int, owner: str, owners: Dict[int, str], properties: Dict, dice_total: int) -> int:
+        prop = properties.get(square, {})
+        if self.markov:
+            owned = [sq for sq, name in owners.items() if name == owner]
+            level, monopoly = self.markov.development_level(square, owned, prop.get("houses", 0))
+            return self.markov.rent_due(square, level, monopoly, dice_total)
+        rents = prop.get("rent") or [0]
+        return rents[0]
+
+    # ------------------------------------------------------------------ #
+    # Éléments OmniParser
+    # ------------------------------------------------------------------ #
+    def compact_elements(self, parsed_elements: Dict) -> List[Dict]:
+        """Éléments cliquables uniquement (interactifs ou libellés de boutons connus)"""
+        elements = (parsed_elements or {}).get("parsed_content_list", [])
+        kept = []
+        for element in elements:
+            text = (element.get("content") or "").strip()
+            interactive = element.get("interactivity") is True
+            if not interactive and text.lower() not in BUTTON_LABELS:
+                continue
+            bbox = element.get("bbox") or []
+            kept.append({"text": text, "box": [round(v, 3) if isinstance(v, float) else v for v in bbox[:4]]})
+        dropped = len(elements) - min(len(kept), self.max_elements)
+        if dropped:
+            with self._lock:
+                self.stats['elements_dropped'] += dropped
+        return kept[:self.max_elements]
+
+    # ------------------------------------------------------------------ #
+    # Budget
+    # ------------------------------------------------------------------ #
+    def format_state(self, context: Dict) -> str:
+        """État compact sérialisé, rogné pour tenir dans sa part du budget"""
+        state = dict(self.compact_state(context))
+        budget = int(self.token_budget * self.state_share)
+        text = _dump(state)
+        # Ordre de rognage: tendances, menaces, groupes des adversaires, dés
+        while count_tokens(text) > budget:
+            if any("trend" in p for p in state["players"]):
+                state["players"] = [{k: v for k, v in p.items() if k != "trend"} for p in state["players"]]
+            elif state.get("threats"):
+                state["threats"] = state["threats"][:-1]
+            elif any(p.get("groups") for p in state["players"] if p["name"] != state.get("current")):
+                state["players"] = [p if p["name"] == state.get("current") else {**p, "groups": {}}
+                                    for p in state["players"]]
+            elif "dice" in state:
+                del state["dice"]
+            else:
+                break
+            text = _dump(state)
+        return f"State: {text}"
+
+    def format_elements(self, parsed_elements: Dict) -> Optional[str]:
+        elements = self.compact_elements(parsed_elements)
+        if not elements:
+            return None
+        budget = self.token_budget - int(self.token_budget * self.state_share)
+        text = _dump(elements)
+        while len(elements) > 1 and count_tokens(text) > budget:
+            elements = elements[:-1]
+            text = _dump(elements)
+        return f"Buttons: {text}"
+
+    # ------------------------------------------------------------------ #
+    # Mesure
+    # ------------------------------------------------------------------ #
+    def record(self, decision_type: str, prefix: str, prompt: str, usage: Optional[Dict] = None) -> Dict:
+        """Compte les tokens d'une décision (estimation locale et usage renvoyé par le fournisseur)"""
+        prefix_tokens = count_tokens(prefix)
+        prompt_tokens = count_tokens(prompt)
+        report = {
+            "prefix_tokens": prefix_tokens,
+            "prompt_tokens": prompt_tokens,
+            "total_tokens": prefix_tokens + prompt_tokens,
+            "budget": self.token_budget,
+            "prefix_hash": self.prefix_hash(decision_type)
+        }
+        if usage:
+            report["provider_prompt_tokens"] = usage.get("prompt_tokens")
+            report["provider_cached_tokens"] = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+
+        with self._lock:
+            self.stats['decisions'] += 1
+            self.stats['prompt_tokens'] += report["total_tokens"]
+            self.stats['max_prompt_tokens'] = max(self.stats['max_prompt_tokens'], report["total_tokens"])
+            if prompt_tokens > self.token_budget:
+                self.stats['over_budget'] += 1
+            if usage:
+                self.stats['provider_prompt_tokens'] += report["provider_prompt_tokens"] or 0
+                self.stats['provider_cached_tokens'] += report["provider_cached_tokens"] or 0
+            by_type = self.stats['by_type'].setdefault(decision_type, {'decisions': 0, 'prompt_tokens': 0})
+            by_type['decisions'] += 1
+            by_type['prompt_tokens'] += report["total_tokens"]
+        return report
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            decisions = self.stats['decisions']
+            return {
+                **self.stats,
+                'by_type': {k: dict(v) for k, v in self.stats['by_type'].items()},
+                'avg_prompt_tokens': self.stats['prompt_tokens'] / decisions if decisions else 0,
+                'token_budget': self.token_budget,
+                'tokenizer': 'tiktoken' if _ENCODING is not None else 'approx'
+            }
@@ -0,0 +1,274 @@
+"""
+Classification des popups à partir des messages lus en RAM, sans capture d'écran
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .decision_scheduler import current_player_slot
+from .monopoly_popups import MONOPOLY_POPUPS, get_popup_types_for_messages, popup_text_matches
+from .tracing import get_tracer
+
+WORKSPACE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_POSITIONS_FILE = os.path.join(WORKSPACE_DIR, "game_files", "popup_buttons.json")
+
+
+class ButtonPositionStore:
+    """Positions fixes des boutons de chaque type de popup.
+
+    Les positions sont apprises à partir des analyses OmniParser réussies et
+    stockées en coordonnées normalisées (0-1) par rapport à la capture, puis
+    persistées sur disque. Un bouton est considéré calibré après `min_samples`
+    observations.
+    """
+
+    def __init__(self, positions_file: str = DEFAULT_POSITIONS_FILE, min_samples: int = 3):
+        self.positions_file = positions_file
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self.positions: Dict[str, Dict[str, dict]] = {}
+        self.frame_size: Optional[List[int]] = None
+        self._mtime: Optional[float] = None
+        self._load()
+
+    def _load(self):
+        try:
+            self._mtime = os.path.getmtime(self.positions_file)
+            with open(self.positions_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.positions = data.get('popups', {})
+            self.frame_size = data.get('frame_size')
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"⚠️  Positions de boutons illisibles ({self.positions_file}): {e}")
+
+    def refresh(self):
+        """Recharge le fichier s'il a été modifié par un autre processus"""
+        try:
+            mtime = os.path.getmtime(self.positions_file)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            with self._lock:
+                self._load()
+
+    def _save(self):
+        try:
+            with open(self.positions_file, 'w', encoding='utf-8') as f:
+                json.dump({'frame_size': self.frame_size, 'popups': self.positions}, f, indent=2)
+        except OSError as e:
+            print(f"⚠️  Impossible d'enregistrer les positions de boutons: {e}")
+
+    def record(self, popup_type: str, options: List[dict], frame_size: Tuple[int, int]):
+        """Intègre les boutons attendus trouvés par OmniParser (moyenne glissante)"""
+        expected = MONOPOLY_POPUPS.get(popup_type, {}).get('expected_buttons', [])
+        width, height = frame_size
+        if not expected or not width or not height:
+            return
+
+        updated = False
+        with self._lock:
+            popup_positions = self.positions.setdefault(popup_type, {})
+            for button in expected:
+                option = next((o for o in options if o.get('name', '').strip() == button), None)
+                if option is None or len(option.get('bbox', [])) != 4:
+                    continue
+
+                x1, y1, x2, y2 = option['bbox']
+                observed = [x1 / width, y1 / height, x2 / width, y2 / height]
+                entry = popup_positions.setdefault(button, {'bbox': observed, 'samples': 0})
+                n = entry['samples']
+                entry['bbox'] = [(old * n + new) / (n + 1) for old, new in zip(entry['bbox'], observed)]
+                entry['samples'] = n + 1
+                updated = True
+
+            if updated:
+                self.frame_size = [width, height]
+                self._save()
+
+    def get_options(self, popup_type: str) -> Optional[List[dict]]:
+        """Boutons calibrés du popup, en pixels de la capture de référence"""
+        expected = MONOPOLY_POPUPS.get(popup_type, {}).get('expected_buttons', [])
+        with self._lock:
+            if not expected or not self.frame_size:
+                return None
+            popup_positions = self.positions.get(popup_type, {})
+            width, height = self.frame_size
+
+            options = []
+            for button in expected:
+                entry = popup_positions.get(button)
+                if not entry or entry['samples'] < self.min_samples:
+                    return None
+                x1, y1, x2, y2 = entry['bbox']
+                options.append({
+                    'name': button,
+                    'bbox': [x1 * width, y1 * height, x2 * width, y2 * height],
+                    'confidence': 1.0,
+                    'type': 'button',
+                    'source': 'calibration'
+                })
+            return options
+
+    def get_regions(self, popup_type: str, frame_size: Tuple[int, int],
+                    padding: float = 0.01) -> Optional[List[List[float]]]:
+        """Zones calibrées des boutons du popup, en pixels de `frame_size`, légèrement élargies"""
+        expected = MONOPOLY_POPUPS.get(popup_type, {}).get('expected_buttons', [])
+        width, height = frame_size
+        with self._lock:
+            popup_positions = self.positions.get(popup_type, {})
+            regions = []
+            for button in expected:
+                entry = popup_positions.get(button)
+                if not entry or entry['samples'] < self.min_samples:
+                    return None
+                x1, y1, x2, y2 = entry['bbox']
+                regions.append([
+                    max(0.0, x1 - padding) * width, max(0.0, y1 - padding) * height,
+                    min(1.0, x2 + padding) * width, min(1.0, y2 + padding) * height
+                ])
+            return regions or None
+
+
+class RamPopupClassifier:
+    """Identifie le popup affiché à partir des IDs de messages actifs en RAM.
+
+    Quand les messages désignent un seul type de `MONOPOLY_POPUPS` dont le
+    texte du popup confirme les motifs, et que les positions de ses boutons
+    sont calibrées, le popup peut être traité sans capture ni OmniParser. Le
+    texte écarte les IDs restés en RAM d'un popup précédent. Sinon la
+    classification est jugée incertaine.
+    """
+
+    def __init__(self, position_store: Optional[ButtonPositionStore] = None):
+        self.position_store = position_store or ButtonPositionStore()
+        self._active_messages: Counter = Counter()
+        self._message_texts: Dict[str, str] = {}  # Texte (avec %1, %2...) de chaque message actif
+        self._removed_callbacks: List[Callable[[str], None]] = []
+        self._first_seen_ns: Dict[str, int] = {}  # Apparition en RAM, pour le span de détection
+        self._lock = threading.Lock()
+        self.stats = {'ram_classified': 0, 'unclear': 0}
+
+    def attach(self, listeners):
+        """S'abonne aux messages détectés par MonopolyListeners"""
+        listeners.on("message_added", self._on_message_added)
+        listeners.on("message_removed", self._on_message_removed)
+
+    def _on_message_added(self, id, text, address, group):
+        with self._lock:
+            self._active_messages[id] += 1
+            self._message_texts[id] = text
+            self._first_seen_ns.setdefault(id, time.perf_counter_ns())
+
+    def _on_message_removed(self, id, text, address):
+        with self._lock:
+            self._active_messages[id] -= 1
+            gone = self._active_messages[id] <= 0
+            if gone:
+                del self._active_messages[id]
+                self._message_texts.pop(id, None)
+                self._first_seen_ns.pop(id, None)
+        if gone:
+            for callback in self._removed_callbacks:
+                callback(id)
+
+    def on_message_gone(self, callback: Callable[[str], None]):
+        """Appelle `callback(message_id)` quand plus aucune instance du message n'est en RAM"""
+        self._removed_callbacks.append(callback)
+
+    @property
+    def active_message_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._active_messages)
+
+    @property
+    def active_messages(self) -> List[dict]:
+        """Messages actifs en RAM avec leur texte, pour les processus sans accès à la RAM"""
+        with self._lock:
+            return [{'id': id, 'text': self._message_texts.get(id, '')} for id in self._active_messages]
+
+    def popup_owner(self, game_context: Dict) -> Optional[str]:
+        """Clé ("player1"...) du joueur visé par le popup affiché.
+
+        Le premier joueur nommé dans un message actif (loyer, enchère...)
+        l'emporte; sinon c'est le joueur courant du contexte.
+        """
+        players = game_context.get('players', {})
+        names = list(players)
+        cited = [(text.find(name), name) for text in (m['text'] for m in self.active_messages)
+                 for name in names if name and name in text]
+        if cited:
+            owner = min(cited)[1]
+        else:
+            owner = game_context.get('global', {}).get('current_player') or next(
+                (name for name, player in players.items() if player.get('current_player')), None)
+        return current_player_slot(names, owner)
+
+    def classify(self, text: str, message_ids: Optional[Iterable[str]] = None) -> Optional[dict]:
+        """Retourne le popup et ses boutons si la RAM, confirmée par `text`, suffit à l'identifier"""
+        if message_ids is None:
+            message_ids = self.active_message_ids
+
+        message_ids = list(message_ids)
+        popup_types = [t for t in get_popup_types_for_messages(message_ids) if popup_text_matches(t, text)]
+        options = self.position_store.get_options(popup_types[0]) if len(popup_types) == 1 else None
+
+        with self._lock:
+            # Délai entre l'apparition du message en RAM et la prise en charge du popup
+            seen = [self._first_seen_ns.pop(id) for id in message_ids if id in self._first_seen_ns]
+            if seen and popup_types:
+                get_tracer().record('detect', min(seen), time.perf_counter_ns(), source='ram',
+                                    popup_type=popup_types[0] if len(popup_types) == 1 else 'ambiguous')
+            if options is None:
+                self.stats['unclear'] += 1
+                return None
+            self.stats['ram_classified'] += 1
+
+        popup_type = popup_types[0]
+        return {
+            'popup_type': popup_type,
+            'expected_buttons': MONOPOLY_POPUPS[popup_type]['expected_buttons'],
+            'options': options,
+            'text_content': [MONOPOLY_POPUPS[popup_type]['name']]
+        }
+
+    def candidate_regions(self, frame_size: Tuple[int, int],
+                          message_ids: Optional[Iterable[str]] = None) -> Optional[dict]:
+        """Zones et libellés des boutons de tous les popups possibles d'après la RAM.
+
+        Sert à l'OCR ciblé d'OmniParser quand la RAM ne suffit pas à trancher
+        seule. Retourne None si un des candidats n'est pas calibré.
+        """
+        if message_ids is None:
+            message_ids = self.active_message_ids
+
+        popup_types = get_popup_types_for_messages(message_ids)
+        if not popup_types:
+            return None
+
+        regions, keywords = [], []
+        for popup_type in popup_types:
+            type_regions = self.position_store.get_regions(popup_type, frame_size)
+            if type_regions is None:
+                return None
+            regions.extend(type_regions)
+            keywords.extend(b for b in MONOPOLY_POPUPS[popup_type]['expected_buttons'] if b not in keywords)
+        return {'popup_types': popup_types, 'regions': regions, 'keywords': keywords}
+
+    def learn(self, popup_type: str, options: List[dict], frame_size: Tuple[int, int]):
+        """Calibre les positions de boutons à partir d'une analyse OmniParser"""
+        if popup_type in MONOPOLY_POPUPS:
+            self.position_store.record(popup_type, options, frame_size)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            total = self.stats['ram_classified'] + self.stats['unclear']
+            return {
+                **self.stats,
+                'ram_hit_rate': self.stats['ram_classified'] / total if total else 0,
+                'active_message_ids': list(self._active_messages)
+            }
@@ -0,0 +1,241 @@
+"""
+Traçage par étapes du pipeline popup → clic: spans perf_counter_ns, identifiant de corrélation
+"""
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+WORKSPACE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TRACE_DIR = os.path.join(WORKSPACE_DIR, "game_files", "traces")
+
+# En-tête HTTP transportant l'identifiant de corrélation d'un service à l'autre
+CORRELATION_HEADER = "X-Correlation-ID"
+
+# Bornes des seaux de latence (ms), espacées géométriquement de 10 ms à ~70 s
+LATENCY_BUCKETS_MS = [10 * 1.25 ** i for i in range(40)]
+# Étapes du pipeline: de 50 µs (encodage, clic) à ~70 s (LLM)
+STAGE_BUCKETS_MS = [0.05 * 1.25 ** i for i in range(72)]
+
+_correlation_id: contextvars.ContextVar = contextvars.ContextVar("correlation_id", default=None)
+
+
+def new_correlation_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def get_correlation_id() -> Optional[str]:
+    """Identifiant de corrélation du popup en cours de traitement (None hors pipeline)"""
+    return _correlation_id.get()
+
+
+@contextmanager
+def correlation(correlation_id: Optional[str] = None):
+    """Rattache le code du bloc à un identifiant de corrélation (nouveau si absent)"""
+    correlation_id = correlation_id or new_correlation_id()
+    token = _correlation_id.set(correlation_id)
+    try:
+        yield correlation_id
+    finally:
+        _correlation_id.reset(token)
+
+
+def correlation_headers(headers: Optional[Dict[str, str]] = None) -> Optional[Dict[str, str]]:
+    """En-têtes HTTP complétés par l'identifiant de corrélation courant"""
+    correlation_id = get_correlation_id()
+    if not correlation_id or (headers and CORRELATION_HEADER in headers):
+        return headers
+    return {**(headers or {}), CORRELATION_HEADER: correlation_id}
+
+
+def bind_flask(app):
+    """Reprend l'identifiant de corrélation de la requête entrante (ou en crée un) et le renvoie"""
+    from flask import g, request
+
+    @app.before_request
+    def _bind_correlation():
+        correlation_id = request.headers.get(CORRELATION_HEADER) or new_correlation_id()
+        g.correlation_token = _correlation_id.set(correlation_id)
+
+    @app.after_request
+    def _return_correlation(response):
+        correlation_id = get_correlation_id()
+        if correlation_id:
+            response.headers[CORRELATION_HEADER] = correlation_id
+        return response
+
+    @app.teardown_request
+    def _unbind_correlation(exc=None):
+        token = g.pop('correlation_token', None)
+        if token is not None:
+            _correlation_id.reset(token)
+
+
+class LatencyHistogram:
+    """Histogramme de latences à seaux fixes; les quantiles sont lus sur les bornes des seaux"""
+
+    def __init__(self, buckets: List[float] = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, latency_ms: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, latency_ms)] += 1
+            self.total += 1
+            self.sum_ms += latency_ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self.total:
+                return None
+            target = q * self.total
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= target:
+                    return self.buckets[min(index, len(self.buckets) - 1)]
+            return self.buckets[-1]
+
+    def get_stats(self) -> Dict:
+        return {
+            'count': self.total,
+            'avg_ms': self.sum_ms / self.total if self.total else 0,
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99)
+        }
+
+
+class Tracer:
+    """Spans des étapes du pipeline (détection, capture, encodage, OmniParser, LLM, clic).
+
+    Chaque span est mesuré avec `perf_counter_ns` et rattaché à l'identifiant de
+    corrélation courant. Les durées alimentent un histogramme par étape et, si
+    le span porte un attribut `model`, un histogramme par étape et par modèle.
+    Les derniers spans sont gardés en mémoire et exportables au format Chrome
+    trace (chrome://tracing, Perfetto); les horodatages sont ramenés à l'heure
+    murale pour pouvoir fusionner les fichiers de plusieurs processus.
+    """
+
+    def __init__(self, service: str = "app", max_spans: int = 20000, trace_dir: str = DEFAULT_TRACE_DIR):
+        self.service = service
+        self.trace_dir = trace_dir
+        self.spans: deque = deque(maxlen=max_spans)
+        self.stages: Dict[str, LatencyHistogram] = defaultdict(lambda: LatencyHistogram(STAGE_BUCKETS_MS))
+        self.models: Dict[str, Dict[str, LatencyHistogram]] = defaultdict(
+            lambda: defaultdict(lambda: LatencyHistogram(STAGE_BUCKETS_MS)))
+        self.errors: Dict[str, int] = defaultdict(int)
+        self._epoch_offset_ns = time.time_ns() - time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage: str, **attrs):
+        """Mesure le bloc; les attributs ajoutés au dict retourné (ex. `model`) sont enregistrés"""
+        start_ns = time.perf_counter_ns()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs['error'] = type(e).__name__
+            raise
+        finally:
+            self.record(stage, start_ns, time.perf_counter_ns(), **attrs)
+
+    def record(self, stage: str, start_ns: int, end_ns: int, correlation_id: Optional[str] = None, **attrs):
+        """Enregistre un span mesuré ailleurs (bornes en perf_counter_ns)"""
+        duration_ms = (end_ns - start_ns) / 1e6
+        with self._lock:
+            self.spans.append({
+                'stage': stage,
+                'correlation_id': correlation_id or get_correlation_id(),
+                'start_ns': start_ns,
+                'duration_ns': end_ns - start_ns,
+                'thread': threading.get_ident(),
+                'attrs': attrs
+            })
+            if 'error' in attrs:
+                self.errors[stage] += 1
+        self.stages[stage].observe(duration_ms)
+        if attrs.get('model'):
+            self.models[stage][attrs['model']].observe(duration_ms)
+
+    def get_trace(self, correlation_id: str) -> List[Dict]:
+        """Spans d'un popup, dans l'ordre chronologique, avec leur décalage depuis le premier"""
+        with self._lock:
+            spans = sorted((s for s in self.spans if s['correlation_id'] == correlation_id),
+                           key=lambda s: s['start_ns'])
+        origin = spans[0]['start_ns'] if spans else 0
+        return [{
+            'stage': s['stage'],
+            'offset_ms': (s['start_ns'] - origin) / 1e6,
+            'duration_ms': s['duration_ns'] / 1e6,
+            **s['attrs']
+        } for s in spans]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stages = list(self.stages.items())
+            models = {stage: list(by_model.items()) for stage, by_model in self.models.items()}
+            recorded = len(self.spans)
+            errors = dict(self.errors)
+        return {
+            'service': self.service,
+            'stages': {stage: histogram.get_stats() for stage, histogram in stages},
+            'models': {stage: {model: histogram.get_stats() for model, histogram in by_model}
+                       for stage, by_model in models.items()},
+            'errors': errors,
+            'spans_in_memory': recorded
+        }
+
+    def export_chrome_trace(self, path: Optional[str] = None) -> str:
+        """Écrit les spans en mémoire au format Chrome trace; retourne le chemin du fichier"""
+        if path is None:
+            os.makedirs(self.trace_dir, exist_ok=True)
+            path = os.path.join(self.trace_dir, f"{self.service}-{os.getpid()}.json")
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': self.service}}]
+        for s in spans:
+            events.append({
+                'name': s['stage'],
+                'cat': 'pipeline',
+                'ph': 'X',
+                'ts': (s['start_ns'] + self._epoch_offset_ns) / 1000,
+                'dur': s['duration_ns'] / 1000,
+                'pid': pid,
+                'tid': s['thread'],
+                'args': {'correlation_id': s['correlation_id'], **s['attrs']}
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+        return path
+
+
+_shared_tracer: Optional[Tracer] = None
+_shared_lock = threading.Lock()
+
+
+def get_tracer(service: Optional[str] = None) -> Tracer:
+    """Traceur partagé par tout le processus; `service` nomme le processus dans les exports"""
+    global _shared_tracer
+    with _shared_lock:
+        if _shared_tracer is None:
+            _shared_tracer = Tracer(service or "app")
+        elif service:
+            _shared_tracer.service = service
+        return _shared_tracer
+
+
+def span(stage: str, **attrs):
+    """Span sur le traceur partagé"""
+    return get_tracer().span(stage, **attrs)
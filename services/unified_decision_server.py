@@ -3,18 +3,27 @@ Serveur unifié pour toutes les décisions tierces
 Centralise les appels à OmniParser, AI Service, et autres services externes
 """
 
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import asyncio
-import aiohttp
 from flask import Flask, request, jsonify
-import requests
 import logging
-import os
 from typing import Dict, Any, Optional
 import base64
 from io import BytesIO
 from PIL import Image
 import json
 from datetime import datetime
+from services.async_http_client import get_http_client
+from services.decision_scheduler import current_player_slot
+from services.model_router import ModelRouter
+from services.monopoly_popups import MONOPOLY_POPUPS, get_popup_types_for_messages, popup_text_matches
+from services.prompt_compactor import PromptCompactor
+from services.ram_popup_classifier import ButtonPositionStore
+from services.tracing import bind_flask, get_tracer, span
+from api.trace_endpoints import create_trace_blueprint
 
 class UnifiedDecisionServer:
     """Serveur unifié pour gérer toutes les décisions tierces"""
@@ -22,20 +31,29 @@ class UnifiedDecisionServer:
     def __init__(self, app: Flask = None):
         self.app = app or Flask(__name__)
         self.logger = logging.getLogger(__name__)
+        # Client partagé: connexions keep-alive vers OmniParser et l'API OpenAI
+        self.http = get_http_client()
+        # Budget d'une décision, retries compris: sous le timeout de 30 s du monitor
+        self.decision_deadline = float(os.getenv("DECISION_DEADLINE", "25"))
+        # Positions de boutons calibrées par l'application (partagées via game_files/)
+        self.button_positions = ButtonPositionStore()
+        # État minimal et éléments cliquables, dans un budget de tokens
+        self.compactor = PromptCompactor(token_budget=int(os.getenv("PROMPT_TOKEN_BUDGET", "800")))
+        # Modèle par joueur et requêtes couvertes (sinon OPENAI_MODEL / OPENAI_BASE_URL / OPENAI_API_KEY)
+        self.router = ModelRouter.from_env(self.http)
         self.services = {
             "omniparser": {
-                "url": "http://localhost:8000",
+                "url": os.getenv("OMNIPARSER_URL", "http://localhost:8000"),
                 "endpoints": {
                     "parse": "/parse/",
                     "health": "/health"
                 }
-            },
-            "openai": {
-                "api_key": os.getenv("OPENAI_API_KEY"),
-                "model": "gpt-4o-mini",
-                "base_url": "https://api.openai.com/v1"
             }
         }
+        # Spans par étape, corrélés avec le monitor et l'application (X-Correlation-ID)
+        self.tracer = get_tracer("unified_decision_server")
+        bind_flask(self.app)
+        self.app.register_blueprint(create_trace_blueprint(self.tracer))
         self.setup_routes()
         
     def setup_routes(self):
@@ -50,10 +68,8 @@ class UnifiedDecisionServer:
                     return jsonify({'error': 'No image provided'}), 400
                     
                 # Transmettre à OmniParser
-                response = requests.post(
-                    f"{self.services['omniparser']['url']}/parse/",
-                    json={"image": data['image']}
-                )
+                response = self.http.run(self._parse_image_async(data['image'], self._idempotency_headers(data)),
+                                         timeout=self.decision_deadline)
                 
                 if response.status_code == 200:
                     return jsonify({
@@ -83,30 +99,11 @@ class UnifiedDecisionServer:
                 parsed_elements = data.get('parsed_elements', {})
                 decision_type = data.get('type', 'popup')
                 
-                # Construire le prompt
+                # Construire le prompt et appeler OpenAI
                 prompt = self._build_ai_prompt(context, parsed_elements, decision_type)
-                
-                # Appeler OpenAI
-                headers = {
-                    "Authorization": f"Bearer {self.services['openai']['api_key']}",
-                    "Content-Type": "application/json"
-                }
-                
-                payload = {
-                    "model": self.services['openai']['model'],
-                    "messages": [
-                        {"role": "system", "content": self._get_system_prompt(decision_type)},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 200
-                }
-                
-                response = requests.post(
-                    f"{self.services['openai']['base_url']}/chat/completions",
-                    headers=headers,
-                    json=payload
-                )
+                player = self._player_slot(data, context)
+                response, routing = self.http.run(self._call_llm_async(decision_type, prompt, player),
+                                                 timeout=self.decision_deadline)
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -115,8 +112,9 @@ class UnifiedDecisionServer:
                     return jsonify({
                         'success': True,
                         'decision': decision,
-                        'service': 'openai',
-                        'model': self.services['openai']['model']
+                        'service': routing['endpoint'],
+                        'model': routing['model'],
+                        'hedged': routing['hedged']
                     })
                 else:
                     return jsonify({
@@ -140,42 +138,21 @@ class UnifiedDecisionServer:
                 context = data.get('context', {})
                 decision_type = data.get('type', 'popup')
                 
-                # Étape 1: Parser l'image si fournie
-                parsed_elements = {}
-                if image_data:
-                    parse_response = requests.post(
-                        f"{self.services['omniparser']['url']}/parse/",
-                        json={"image": image_data}
-                    )
-                    
-                    if parse_response.status_code == 200:
-                        parsed_elements = parse_response.json()
-                    else:
-                        self.logger.warning("Failed to parse image, continuing without parsed elements")
-                        
-                # Étape 2: Prendre une décision IA
-                prompt = self._build_ai_prompt(context, parsed_elements, decision_type)
-                
-                headers = {
-                    "Authorization": f"Bearer {self.services['openai']['api_key']}",
-                    "Content-Type": "application/json"
-                }
-                
-                payload = {
-                    "model": self.services['openai']['model'],
-                    "messages": [
-                        {"role": "system", "content": self._get_system_prompt(decision_type)},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 200
-                }
+                # Popup identifié par la RAM: décision spéculative en parallèle du parsing
+                popup_type = self._resolve_popup_type(data) if decision_type == 'popup' else None
+                player = self._player_slot(data, context)
+                if popup_type and data.get('mode', 'auto') != 'sequential':
+                    result = self.http.run(self._speculative_async(
+                        image_data, context, popup_type, self._idempotency_headers(data), player
+                    ), timeout=self.decision_deadline)
+                    status = 200 if result.get('success') else result.pop('status_code', 502)
+                    return jsonify(result), status
                 
-                ai_response = requests.post(
-                    f"{self.services['openai']['base_url']}/chat/completions",
-                    headers=headers,
-                    json=payload
-                )
+                # Étape 1: parsing de l'image et préparation du prompt en parallèle
+                # Étape 2: décision IA
+                parsed_elements, ai_response = self.http.run(self._unified_async(
+                    image_data, context, decision_type, self._idempotency_headers(data), player
+                ), timeout=self.decision_deadline)
                 
                 if ai_response.status_code == 200:
                     result = ai_response.json()
@@ -193,10 +170,23 @@ class UnifiedDecisionServer:
                         'error': f'AI decision error: {ai_response.status_code}'
                     }), ai_response.status_code
                     
+            except TimeoutError:
+                self.logger.error(f"Unified decision exceeded {self.decision_deadline}s")
+                return jsonify({'success': False, 'error': 'Decision deadline exceeded'}), 504
             except Exception as e:
                 self.logger.error(f"Error in unified decision: {e}")
                 return jsonify({'success': False, 'error': str(e)}), 500
                 
+        @self.app.route('/api/decision/prompt/stats')
+        def prompt_stats():
+            """Tokens par décision et réutilisation du préfixe en cache"""
+            return jsonify(self.compactor.get_stats())
+            
+        @self.app.route('/api/decision/router/stats')
+        def router_stats():
+            """Endpoints, couverture et histogrammes de latence par fournisseur"""
+            return jsonify(self.router.get_stats())
+            
         @self.app.route('/api/decision/health')
         def health_check():
             """Vérifie la santé de tous les services de décision"""
@@ -207,23 +197,27 @@ class UnifiedDecisionServer:
             
             # Vérifier OmniParser
             try:
-                response = requests.get(
+                response = self.http.run(self.http.get(
                     f"{self.services['omniparser']['url']}/health",
-                    timeout=5
-                )
+                    timeout=5,
+                    retries=0
+                ))
                 health_status["services"]["omniparser"] = {
                     "status": "healthy" if response.status_code == 200 else "unhealthy",
-                    "response_time": response.elapsed.total_seconds()
+                    "response_time": response.elapsed
                 }
             except:
                 health_status["services"]["omniparser"] = {
                     "status": "unreachable"
                 }
                 
-            # Vérifier OpenAI
-            health_status["services"]["openai"] = {
-                "status": "configured" if self.services['openai']['api_key'] else "not_configured"
-            }
+            # Vérifier les endpoints de modèles
+            for name, endpoint in self.router.endpoints.items():
+                local = endpoint.base_url.startswith(("http://localhost", "http://127.0.0.1"))
+                health_status["services"][f"llm:{name}"] = {
+                    "status": "configured" if endpoint.api_key or local else "not_configured",
+                    "model": endpoint.model
+                }
             
             overall_health = all(
                 service.get("status") in ["healthy", "configured"] 
@@ -255,29 +249,227 @@ class UnifiedDecisionServer:
                             Respond with JSON: {"action": "roll/end_turn/click_button", "target": "element to click", "reason": "why"}"""
         }
         return prompts.get(decision_type, prompts["popup"])
+
+    async def _parse_image_async(self, image_data: str, headers: Optional[Dict[str, str]] = None):
+        """Envoie une image à OmniParser"""
+        with span('omniparser'):
+            return await self.http.post_json(
+                f"{self.services['omniparser']['url']}/parse/",
+                {"base64_image": image_data},
+                headers=headers
+            )
+
+    async def _call_llm_async(self, decision_type: str, prompt: str, player: Optional[str] = None):
+        """Appelle le modèle du joueur via le routeur; retourne (réponse, routage)"""
+        # Préfixe identique d'un appel à l'autre: réutilisable par le cache de prompt du fournisseur
+        prefix = self.compactor.prefix(decision_type, self._get_system_prompt(decision_type))
+        messages = [
+            {"role": "system", "content": prefix},
+            {"role": "user", "content": prompt}
+        ]
         
-    def _build_ai_prompt(self, context: Dict, parsed_elements: Dict, decision_type: str) -> str:
-        """Build the prompt for AI"""
-        prompt_parts = []
+        with span('llm', decision_type=decision_type) as trace:
+            response, routing = await self.router.complete_async(
+                player, messages, temperature=0.7, max_tokens=200
+            )
+            trace.update(model=routing['model'], endpoint=routing['endpoint'], hedged=routing['hedged'])
+        usage = response.json().get('usage') if response.ok and isinstance(response.json(), dict) else None
+        tokens = self.compactor.record(decision_type, prefix, prompt, usage)
+        self.logger.info(f"Prompt tokens ({decision_type}): {tokens['total_tokens']} "
+                         f"(prefix {tokens['prefix_tokens']}, cached {tokens.get('provider_cached_tokens', 0)}, "
+                         f"{routing['endpoint']}{' hedged' if routing['hedged'] else ''})")
+        return response, routing
+
+    async def _unified_async(self, image_data: Optional[str], context: Dict, decision_type: str,
+                             headers: Optional[Dict[str, str]] = None, player: Optional[str] = None):
+        """Parse l'image pendant la préparation du prompt, puis appelle le LLM"""
+        loop = asyncio.get_running_loop()
+        prompt_task = loop.run_in_executor(None, self._build_context_prompt, context, decision_type)
         
-        # Game context
-        if context:
-            prompt_parts.append(f"Game context: {json.dumps(context, indent=2)}")
+        parsed_elements = {}
+        if image_data:
+            try:
+                parse_response = await self._parse_image_async(image_data, headers)
+                if parse_response.status_code == 200:
+                    parsed_elements = parse_response.json()
+                else:
+                    self.logger.warning("Failed to parse image, continuing without parsed elements")
+            except Exception as e:
+                self.logger.warning(f"Failed to parse image ({e}), continuing without parsed elements")
+        
+        context_part, question_part = await prompt_task
+        prompt = self._assemble_prompt(context_part, parsed_elements, question_part)
+        response, _ = await self._call_llm_async(decision_type, prompt, player)
+        return parsed_elements, response
+
+    def _resolve_popup_type(self, data: Dict) -> Optional[str]:
+        """Popup type given by the caller or identified from the RAM message ids.
+
+        The ids are only trusted when `popup_text` matches the popup's text
+        patterns: ids left in RAM by a previous popup must not pick the buttons.
+        """
+        popup_type = data.get('popup_type')
+        if popup_type not in MONOPOLY_POPUPS:
+            popup_types = [t for t in get_popup_types_for_messages(data.get('message_ids') or [])
+                           if popup_text_matches(t, data.get('popup_text', ''))]
+            popup_type = popup_types[0] if len(popup_types) == 1 else None
+        if popup_type and MONOPOLY_POPUPS[popup_type]['expected_buttons']:
+            return popup_type
+        return None
+
+    def _calibrated_buttons(self, popup_type: str, image_data: Optional[str]) -> Optional[Dict[str, list]]:
+        """Button bboxes from calibration, scaled to the sent image (None if unknown)"""
+        if not image_data:
+            return None
+        self.button_positions.refresh()
+        with Image.open(BytesIO(base64.b64decode(image_data))) as img:
+            size = img.size
+        regions = self.button_positions.get_regions(popup_type, size, padding=0)
+        if regions is None:
+            return None
+        return dict(zip(MONOPOLY_POPUPS[popup_type]['expected_buttons'], regions))
+
+    @staticmethod
+    def _locate_button(action: str, parsed_elements: Dict, calibrated: Optional[Dict[str, list]]):
+        """Center of the button matching the chosen action, in image pixels"""
+        action = str(action or '').strip().lower()
+        bbox = (calibrated or {}).get(action)
+        if bbox is None:
+            for item in parsed_elements.get('parsed_content_list', []):
+                content = item.get('content', '').strip().lower()
+                if item.get('type') == 'text' and action and (content == action or action in content):
+                    bbox = item.get('bbox')
+                    break
+        if not bbox or len(bbox) != 4:
+            return None
+        return [(bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2]
+
+    async def _speculative_async(self, image_data: Optional[str], context: Dict, popup_type: str,
+                                 headers: Optional[Dict[str, str]] = None, player: Optional[str] = None) -> Dict:
+        """Décision LLM lancée depuis le contexte RAM pendant le parsing de l'image.
+        
+        Le parsing ne sert qu'à retrouver les coordonnées du bouton choisi: il est
+        annulé (ou jamais lancé) si la calibration les connaît déjà. Si le parsing
+        montre que la RAM s'est trompée de popup, la décision spéculative est
+        annulée et refaite à partir des éléments détectés.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        info = MONOPOLY_POPUPS[popup_type]
+        buttons = info['expected_buttons']
+        
+        context_part, _ = self._build_context_prompt(context, 'popup')
+        question = (f"Popup: \"{info['name']}\" ({info['action']}).\n"
+                    f"Available buttons: {', '.join(buttons)}.\n"
+                    f"Answer with exactly one of these buttons as the action.")
+        llm_task = asyncio.ensure_future(
+            self._call_llm_async('popup', self._assemble_prompt(context_part, {}, question), player)
+        )
+        
+        calibrated = await loop.run_in_executor(None, self._calibrated_buttons, popup_type, image_data)
+        parse_task = None
+        if calibrated is None and image_data:
+            parse_task = asyncio.ensure_future(self._parse_image_async(image_data, headers))
+        
+        pipeline = 'speculative'
+        parsed_elements = {}
+        try:
+            if parse_task:
+                try:
+                    parse_response = await parse_task
+                    if parse_response.status_code == 200:
+                        parsed_elements = parse_response.json()
+                except Exception as e:
+                    self.logger.warning(f"Failed to parse image ({e}), continuing without parsed elements")
+                
+                texts = [item.get('content', '').lower()
+                         for item in parsed_elements.get('parsed_content_list', [])
+                         if item.get('type') == 'text']
+                if texts and not any(button in text for button in buttons for text in texts):
+                    # Aucun bouton attendu à l'écran: la spéculation est invalide
+                    llm_task.cancel()
+                    pipeline = 'sequential_fallback'
+                    llm_task = asyncio.ensure_future(self._call_llm_async(
+                        'popup', self._build_ai_prompt(context, parsed_elements, 'popup'), player
+                    ))
             
-        # Parsed elements
-        if parsed_elements:
-            prompt_parts.append(f"Detected elements: {json.dumps(parsed_elements, indent=2)}")
+            ai_response, routing = await llm_task
+        finally:
+            for task in (llm_task, parse_task):
+                if task and not task.done():
+                    task.cancel()
+        
+        if ai_response.status_code != 200:
+            return {
+                'success': False,
+                'error': f'AI decision error: {ai_response.status_code}',
+                'status_code': ai_response.status_code
+            }
+        
+        decision = self._parse_ai_response(ai_response.json(), 'popup')
+        return {
+            'success': True,
+            'decision': decision,
+            'popup_type': popup_type,
+            'coordinates': self._locate_button(
+                decision.get('action'), parsed_elements, calibrated if pipeline == 'speculative' else None
+            ),
+            'coordinates_from': 'calibration' if calibrated and pipeline == 'speculative' else 'parse',
+            'parsed_elements': parsed_elements,
+            'pipeline': pipeline,
+            'model': routing['model'],
+            'hedged': routing['hedged'],
+            'latency_ms': (loop.time() - started) * 1000,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def _player_slot(self, data: Dict, context: Dict) -> Optional[str]:
+        """Player whose model answers ("player1"...): given by the caller, else the current player of the context"""
+        if data.get('player'):
+            return data['player']
+        state = self.compactor.compact_state(context)
+        return current_player_slot([p['name'] for p in state.get('players', [])], state.get('current'))
+
+    def _idempotency_headers(self, data: Dict) -> Optional[Dict[str, str]]:
+        """Forward the caller's idempotency key so OmniParser can reuse a cached parse"""
+        key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+        return {"Idempotency-Key": key} if key else None
+
+    def _build_ai_prompt(self, context: Dict, parsed_elements: Dict, decision_type: str) -> str:
+        """Build the prompt for AI"""
+        context_part, question_part = self._build_context_prompt(context, decision_type)
+        return self._assemble_prompt(context_part, parsed_elements, question_part)
+
+    def _build_context_prompt(self, context: Dict, decision_type: str):
+        """Prompt parts that do not depend on the parsed image: (game context, question)"""
+        # Game context, reduced to the fixed-schema state
+        context_part = self.compactor.format_state(context) if context else None
             
         # Specific question
+        question_part = None
         if decision_type == "popup":
-            prompt_parts.append("What action do you recommend for this popup?")
+            question_part = "What action do you recommend for this popup?"
         elif decision_type == "property":
-            prompt_parts.append("Should I buy this property?")
+            question_part = "Should I buy this property?"
         elif decision_type == "trade":
-            prompt_parts.append("Is this trade advantageous?")
+            question_part = "Is this trade advantageous?"
         elif decision_type == "idle_action":
-            idle_instruction = context.get("instruction", "The game appears idle. What should the player do?")
-            prompt_parts.append(idle_instruction)
+            question_part = context.get("instruction", "The game appears idle. What should the player do?")
+            
+        return context_part, question_part
+
+    def _assemble_prompt(self, context_part: Optional[str], parsed_elements: Dict,
+                         question_part: Optional[str]) -> str:
+        """Join the context, the parsed elements and the question"""
+        prompt_parts = [context_part] if context_part else []
+        
+        # Clickable elements only
+        elements_part = self.compactor.format_elements(parsed_elements)
+        if elements_part:
+            prompt_parts.append(elements_part)
+            
+        if question_part:
+            prompt_parts.append(question_part)
             
         return "\n\n".join(prompt_parts)
         
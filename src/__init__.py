@@ -1,3 +1,9 @@
-from .game.monopoly import MonopolyGame
+__all__ = ['MonopolyGame']
 
-__all__ = ['MonopolyGame'] 
\ No newline at end of file
+
+def __getattr__(name):
+    # Import paresseux: src.sim (moteur headless) ne doit pas dépendre de Dolphin
+    if name == 'MonopolyGame':
+        from .game.monopoly import MonopolyGame
+        return MonopolyGame
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -4,6 +4,12 @@ import time
 from typing import Dict, List, Any
 from .monopoly import MonopolyGame
 from .listeners import MonopolyListeners
+from src.sim.board import get_board
+
+try:
+    from src.sim.markov import get_tables
+except ImportError:
+    get_tables = None
 
 class Contexte:
     """Classe gérant le contexte global du jeu Monopoly"""
@@ -20,6 +26,7 @@ class Contexte:
         self.turn_events = []  # Événements du tour actuel
         self.monopoly_board = self._initialize_monopoly_board()  # Initialiser le plateau de Monopoly
         self.duplicate_events = set()  # Pour éviter les événements en double
+        self.markov = self._load_markov_tables()  # Probabilités d'arrêt et loyers espérés
         
         # Créer le dossier d'historique s'il n'existe pas
         if not os.path.exists(self.context_history_dir):
@@ -49,49 +56,27 @@ class Contexte:
     
     def _initialize_monopoly_board(self):
         """Initialise le plateau de Monopoly avec les noms réels des cases (version UK)"""
-        board = [
-            {"id": 0, "name": "GO", "type": "special"},
-            {"id": 1, "name": "Old Kent Road", "type": "property", "color": "brown"},
-            {"id": 2, "name": "Community Chest", "type": "special"},
-            {"id": 3, "name": "Whitechapel Road", "type": "property", "color": "brown"},
-            {"id": 4, "name": "Income Tax", "type": "special"},
-            {"id": 5, "name": "Kings Cross Station", "type": "property", "color": "station"},
-            {"id": 6, "name": "The Angel Islington", "type": "property", "color": "light_blue"},
-            {"id": 7, "name": "Chance", "type": "special"},
-            {"id": 8, "name": "Euston Road", "type": "property", "color": "light_blue"},
-            {"id": 9, "name": "Pentonville Road", "type": "property", "color": "light_blue"},
-            {"id": 10, "name": "Jail / Just Visiting", "type": "special"},
-            {"id": 11, "name": "Pall Mall", "type": "property", "color": "pink"},
-            {"id": 12, "name": "Electric Company", "type": "property", "color": "utility"},
-            {"id": 13, "name": "Whitehall", "type": "property", "color": "pink"},
-            {"id": 14, "name": "Northumberland Avenue", "type": "property", "color": "pink"},
-            {"id": 15, "name": "Marylebone Station", "type": "property", "color": "station"},
-            {"id": 16, "name": "Bow Street", "type": "property", "color": "orange"},
-            {"id": 17, "name": "Community Chest", "type": "special"},
-            {"id": 18, "name": "Marlborough Street", "type": "property", "color": "orange"},
-            {"id": 19, "name": "Vine Street", "type": "property", "color": "orange"},
-            {"id": 20, "name": "Free Parking", "type": "special"},
-            {"id": 21, "name": "Strand", "type": "property", "color": "red"},
-            {"id": 22, "name": "Chance", "type": "special"},
-            {"id": 23, "name": "Fleet Street", "type": "property", "color": "red"},
-            {"id": 24, "name": "Trafalgar Square", "type": "property", "color": "red"},
-            {"id": 25, "name": "Fenchurch Street Station", "type": "property", "color": "station"},
-            {"id": 26, "name": "Leicester Square", "type": "property", "color": "yellow"},
-            {"id": 27, "name": "Coventry Street", "type": "property", "color": "yellow"},
-            {"id": 28, "name": "Water Works", "type": "property", "color": "utility"},
-            {"id": 29, "name": "Piccadilly", "type": "property", "color": "yellow"},
-            {"id": 30, "name": "Go To Jail", "type": "special"},
-            {"id": 31, "name": "Regent Street", "type": "property", "color": "green"},
-            {"id": 32, "name": "Oxford Street", "type": "property", "color": "green"},
-            {"id": 33, "name": "Community Chest", "type": "special"},
-            {"id": 34, "name": "Bond Street", "type": "property", "color": "green"},
-            {"id": 35, "name": "Liverpool Street Station", "type": "property", "color": "station"},
-            {"id": 36, "name": "Chance", "type": "special"},
-            {"id": 37, "name": "Park Lane", "type": "property", "color": "dark_blue"},
-            {"id": 38, "name": "Super Tax", "type": "special"},
-            {"id": 39, "name": "Mayfair", "type": "property", "color": "dark_blue"}
-        ]
-        return board
+        return get_board()
+    
+    def _load_markov_tables(self):
+        """Tables de la chaîne de Markov du plateau (résolues une fois, puis relues depuis le disque)"""
+        if get_tables is None:
+            return None
+        try:
+            return get_tables()
+        except Exception as e:
+            print(f"⚠️  Tables Markov indisponibles: {e}")
+            return None
+    
+    def _rent_due(self, prop, dice_sum=None):
+        """Loyer exigible sur une propriété selon les cases de son propriétaire"""
+        if not self.markov:
+            return prop["rent"][0]
+        owned = [p["id"] for p in self.context["global"]["properties"] if p["owner"] == prop["owner"]]
+        level, monopoly = self.markov.development_level(prop["id"], owned, prop.get("houses", 0))
+        if dice_sum:
+            return self.markov.rent_due(prop["id"], level, monopoly, dice_sum)
+        return self.markov.rent_due(prop["id"], level, monopoly)
     
     def _register_events(self):
         """Enregistre les callbacks pour les événements intéressants"""
@@ -174,6 +159,14 @@ class Contexte:
         except Exception as e:
             print(f"Erreur lors de l'accès aux propriétés: {e}")
         
+        # Dynamique du plateau: fréquence d'arrêt, loyer espéré par tour adverse, rentabilité
+        if self.markov:
+            opponents = max(1, len(self.game.players) - 1)
+            for prop in properties:
+                owned = [p["id"] for p in properties if prop["owner"] is not None and p["owner"] == prop["owner"]]
+                level, monopoly = self.markov.development_level(prop["id"], owned, prop["houses"])
+                prop.update(self.markov.describe(prop["id"], level, monopoly, opponents))
+        
         self.context["global"]["properties"] = properties
         
         # Mise à jour des joueurs
@@ -717,8 +710,7 @@ class Contexte:
                             owner_name = p.name
                             break
                     
-                    # Calculer le loyer (simplifié)
-                    rent = prop["rent"][0]  # Loyer de base
+                    rent = self._rent_due(prop, dice_sum)
                     self._add_event(player_name, "pay_rent", f"{rent}€ to {owner_name} pour {space_name}")
                     break
         
@@ -758,8 +750,7 @@ class Contexte:
                         owner_name = p.name
                         break
                 
-                # Calculer le loyer (simplifié)
-                rent = prop["rent"][0]  # Loyer de base
+                rent = self._rent_due(prop)
                 self._add_event(player_name, "pay_rent", f"{rent}€ to {owner_name} pour {space_name}")
                 break
         
@@ -795,8 +786,7 @@ class Contexte:
                             owner_name = p.name
                             break
                     
-                    # Calculer le loyer (simplifié)
-                    rent = prop["rent"][0]  # Loyer de base
+                    rent = self._rent_due(prop)
                     self._add_event(player_name, "pay_rent", f"{rent}€ to {owner_name} pour {space_name}")
                     break
         
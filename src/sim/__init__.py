@@ -0,0 +1,21 @@
+from .board import DEFAULT_PROPERTIES, MONOPOLY_BOARD, get_board, get_default_properties
+from .markov import MarkovTables, get_tables
+
+__all__ = [
+    'HeadlessMonopoly', 'PropertyTable', 'GreedyAgent', 'RandomAgent', 'RolloutEvaluator', 'RolloutAgent',
+    'MONOPOLY_BOARD', 'DEFAULT_PROPERTIES', 'get_board', 'get_default_properties', 'MarkovTables', 'get_tables'
+]
+
+
+def __getattr__(name):
+    # Import paresseux: Contexte n'utilise que le plateau et n'a pas besoin de NumPy
+    if name in ('HeadlessMonopoly', 'PropertyTable'):
+        from . import engine
+        return getattr(engine, name)
+    if name in ('GreedyAgent', 'RandomAgent'):
+        from . import agents
+        return getattr(agents, name)
+    if name in ('RolloutEvaluator', 'RolloutAgent'):
+        from . import rollout
+        return getattr(rollout, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
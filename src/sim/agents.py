@@ -0,0 +1,44 @@
+"""
+Agents de référence pour le moteur headless (même interface que AIService.make_decision)
+"""
+import random
+from typing import Dict, List, Optional
+
+
+def _current_player(game_context: Dict) -> Dict:
+    name = game_context.get("global", {}).get("current_player")
+    return game_context.get("players", {}).get(name, {})
+
+
+class RandomAgent:
+    """Choisit une option au hasard"""
+
+    needs_context = False
+
+    def __init__(self, seed: Optional[int] = None):
+        self.rng = random.Random(seed)
+
+    def __call__(self, popup_text: str, options: List[Dict], game_context: Dict) -> Dict:
+        choice = self.rng.choice(options)["name"] if options else "none"
+        return {"choice": choice, "reason": "Choix aléatoire", "confidence": 0.0}
+
+
+class GreedyAgent:
+    """Achète tout ce qui laisse une réserve suffisante, paie la caution si l'argent le permet"""
+
+    def __init__(self, reserve: int = 150, bail_threshold: int = 400):
+        self.reserve = reserve
+        self.bail_threshold = bail_threshold
+
+    def __call__(self, popup_text: str, options: List[Dict], game_context: Dict) -> Dict:
+        names = [opt.get("name", "") for opt in options]
+        money = _current_player(game_context).get("money", 0)
+        pending = game_context.get("global", {}).get("pending_property")
+
+        if "buy" in names and pending:
+            choice = "buy" if money - pending["price"] >= self.reserve else "auction"
+        elif "pay bail" in names:
+            choice = "pay bail" if money >= self.bail_threshold else "roll dice"
+        else:
+            choice = names[0] if names else "none"
+        return {"choice": choice, "reason": "Règle fixe", "confidence": 0.5}
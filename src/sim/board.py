@@ -0,0 +1,116 @@
+"""
+Plateau de Monopoly (version UK) et table des propriétés, sans dépendance au jeu
+"""
+import copy
+from typing import Dict, List
+
+MONOPOLY_BOARD = [
+    {"id": 0, "name": "GO", "type": "special"},
+    {"id": 1, "name": "Old Kent Road", "type": "property", "color": "brown"},
+    {"id": 2, "name": "Community Chest", "type": "special"},
+    {"id": 3, "name": "Whitechapel Road", "type": "property", "color": "brown"},
+    {"id": 4, "name": "Income Tax", "type": "special"},
+    {"id": 5, "name": "Kings Cross Station", "type": "property", "color": "station"},
+    {"id": 6, "name": "The Angel Islington", "type": "property", "color": "light_blue"},
+    {"id": 7, "name": "Chance", "type": "special"},
+    {"id": 8, "name": "Euston Road", "type": "property", "color": "light_blue"},
+    {"id": 9, "name": "Pentonville Road", "type": "property", "color": "light_blue"},
+    {"id": 10, "name": "Jail / Just Visiting", "type": "special"},
+    {"id": 11, "name": "Pall Mall", "type": "property", "color": "pink"},
+    {"id": 12, "name": "Electric Company", "type": "property", "color": "utility"},
+    {"id": 13, "name": "Whitehall", "type": "property", "color": "pink"},
+    {"id": 14, "name": "Northumberland Avenue", "type": "property", "color": "pink"},
+    {"id": 15, "name": "Marylebone Station", "type": "property", "color": "station"},
+    {"id": 16, "name": "Bow Street", "type": "property", "color": "orange"},
+    {"id": 17, "name": "Community Chest", "type": "special"},
+    {"id": 18, "name": "Marlborough Street", "type": "property", "color": "orange"},
+    {"id": 19, "name": "Vine Street", "type": "property", "color": "orange"},
+    {"id": 20, "name": "Free Parking", "type": "special"},
+    {"id": 21, "name": "Strand", "type": "property", "color": "red"},
+    {"id": 22, "name": "Chance", "type": "special"},
+    {"id": 23, "name": "Fleet Street", "type": "property", "color": "red"},
+    {"id": 24, "name": "Trafalgar Square", "type": "property", "color": "red"},
+    {"id": 25, "name": "Fenchurch Street Station", "type": "property", "color": "station"},
+    {"id": 26, "name": "Leicester Square", "type": "property", "color": "yellow"},
+    {"id": 27, "name": "Coventry Street", "type": "property", "color": "yellow"},
+    {"id": 28, "name": "Water Works", "type": "property", "color": "utility"},
+    {"id": 29, "name": "Piccadilly", "type": "property", "color": "yellow"},
+    {"id": 30, "name": "Go To Jail", "type": "special"},
+    {"id": 31, "name": "Regent Street", "type": "property", "color": "green"},
+    {"id": 32, "name": "Oxford Street", "type": "property", "color": "green"},
+    {"id": 33, "name": "Community Chest", "type": "special"},
+    {"id": 34, "name": "Bond Street", "type": "property", "color": "green"},
+    {"id": 35, "name": "Liverpool Street Station", "type": "property", "color": "station"},
+    {"id": 36, "name": "Chance", "type": "special"},
+    {"id": 37, "name": "Park Lane", "type": "property", "color": "dark_blue"},
+    {"id": 38, "name": "Super Tax", "type": "special"},
+    {"id": 39, "name": "Mayfair", "type": "property", "color": "dark_blue"}
+]
+
+BOARD_SIZE = len(MONOPOLY_BOARD)
+GO_SALARY = 200
+JAIL_SQUARE = 10
+GO_TO_JAIL_SQUARE = 30
+BAIL = 50
+TAX_SQUARES = {4: 200, 38: 100}
+CHANCE_SQUARES = (7, 22, 36)
+COMMUNITY_CHEST_SQUARES = (2, 17, 33)
+
+# Cartes qui déplacent le joueur (16 cartes par paquet, les autres ne déplacent pas)
+CARD_GO_BACK_3 = "back_3"
+CARD_GO_TO_JAIL = "jail"
+CHANCE_MOVES = [0, 24, 11, 15, 39, CARD_GO_BACK_3, CARD_GO_TO_JAIL]
+COMMUNITY_CHEST_MOVES = [0, 1, CARD_GO_TO_JAIL]
+CARDS_PER_DECK = 16
+
+# Même format que MonopolyGame.properties: loyers nu puis 1 à 4 maisons et hôtel
+# (gares: 1 à 4 gares possédées, compagnies: multiplicateur des dés pour 1 ou 2)
+DEFAULT_PROPERTIES = [
+    {"id": 1, "name": "Old Kent Road", "price": 60, "mortgage": 30, "cost": 50, "rents": [2, 10, 30, 90, 160, 250]},
+    {"id": 3, "name": "Whitechapel Road", "price": 60, "mortgage": 30, "cost": 50, "rents": [4, 20, 60, 180, 320, 450]},
+    {"id": 5, "name": "Kings Cross Station", "price": 200, "mortgage": 100, "cost": -1, "rents": [25, 50, 100, 200]},
+    {"id": 6, "name": "The Angel Islington", "price": 100, "mortgage": 50, "cost": 50, "rents": [6, 30, 90, 270, 400, 550]},
+    {"id": 8, "name": "Euston Road", "price": 100, "mortgage": 50, "cost": 50, "rents": [6, 30, 90, 270, 400, 550]},
+    {"id": 9, "name": "Pentonville Road", "price": 120, "mortgage": 60, "cost": 50, "rents": [8, 40, 100, 300, 450, 600]},
+    {"id": 11, "name": "Pall Mall", "price": 140, "mortgage": 70, "cost": 100, "rents": [10, 50, 150, 450, 625, 750]},
+    {"id": 12, "name": "Electric Company", "price": 150, "mortgage": 75, "cost": -1, "rents": [4, 10]},
+    {"id": 13, "name": "Whitehall", "price": 140, "mortgage": 70, "cost": 100, "rents": [10, 50, 150, 450, 625, 750]},
+    {"id": 14, "name": "Northumberland Avenue", "price": 160, "mortgage": 80, "cost": 100, "rents": [12, 60, 180, 500, 700, 900]},
+    {"id": 15, "name": "Marylebone Station", "price": 200, "mortgage": 100, "cost": -1, "rents": [25, 50, 100, 200]},
+    {"id": 16, "name": "Bow Street", "price": 180, "mortgage": 90, "cost": 100, "rents": [14, 70, 200, 550, 750, 950]},
+    {"id": 18, "name": "Marlborough Street", "price": 180, "mortgage": 90, "cost": 100, "rents": [14, 70, 200, 550, 750, 950]},
+    {"id": 19, "name": "Vine Street", "price": 200, "mortgage": 100, "cost": 100, "rents": [16, 80, 220, 600, 800, 1000]},
+    {"id": 21, "name": "Strand", "price": 220, "mortgage": 110, "cost": 150, "rents": [18, 90, 250, 700, 875, 1050]},
+    {"id": 23, "name": "Fleet Street", "price": 220, "mortgage": 110, "cost": 150, "rents": [18, 90, 250, 700, 875, 1050]},
+    {"id": 24, "name": "Trafalgar Square", "price": 240, "mortgage": 120, "cost": 150, "rents": [20, 100, 300, 750, 925, 1100]},
+    {"id": 25, "name": "Fenchurch Street Station", "price": 200, "mortgage": 100, "cost": -1, "rents": [25, 50, 100, 200]},
+    {"id": 26, "name": "Leicester Square", "price": 260, "mortgage": 130, "cost": 150, "rents": [22, 110, 330, 800, 975, 1150]},
+    {"id": 27, "name": "Coventry Street", "price": 260, "mortgage": 130, "cost": 150, "rents": [22, 110, 330, 800, 975, 1150]},
+    {"id": 28, "name": "Water Works", "price": 150, "mortgage": 75, "cost": -1, "rents": [4, 10]},
+    {"id": 29, "name": "Piccadilly", "price": 280, "mortgage": 140, "cost": 150, "rents": [24, 120, 360, 850, 1025, 1200]},
+    {"id": 31, "name": "Regent Street", "price": 300, "mortgage": 150, "cost": 200, "rents": [26, 130, 390, 900, 1100, 1275]},
+    {"id": 32, "name": "Oxford Street", "price": 300, "mortgage": 150, "cost": 200, "rents": [26, 130, 390, 900, 1100, 1275]},
+    {"id": 34, "name": "Bond Street", "price": 320, "mortgage": 160, "cost": 200, "rents": [28, 150, 450, 1000, 1200, 1400]},
+    {"id": 35, "name": "Liverpool Street Station", "price": 200, "mortgage": 100, "cost": -1, "rents": [25, 50, 100, 200]},
+    {"id": 37, "name": "Park Lane", "price": 350, "mortgage": 175, "cost": 200, "rents": [35, 175, 500, 1100, 1300, 1500]},
+    {"id": 39, "name": "Mayfair", "price": 400, "mortgage": 200, "cost": 200, "rents": [50, 200, 600, 1400, 1700, 2000]}
+]
+
+
+def get_board() -> List[Dict]:
+    """Copie du plateau, modifiable par l'appelant"""
+    return copy.deepcopy(MONOPOLY_BOARD)
+
+
+def get_default_properties() -> List[Dict]:
+    """Copie de la table des propriétés par défaut"""
+    return copy.deepcopy(DEFAULT_PROPERTIES)
+
+
+def color_groups(board: List[Dict] = MONOPOLY_BOARD) -> Dict[str, List[int]]:
+    """Cases de chaque groupe (couleurs, gares, compagnies)"""
+    groups: Dict[str, List[int]] = {}
+    for space in board:
+        if space["type"] == "property":
+            groups.setdefault(space["color"], []).append(space["id"])
+    return groups
@@ -0,0 +1,501 @@
+"""
+Moteur de règles Monopoly headless, vectorisé sur des milliers de parties
+"""
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .board import (BAIL, BOARD_SIZE, CARD_GO_BACK_3, CARD_GO_TO_JAIL, CARDS_PER_DECK, CHANCE_MOVES,
+                    CHANCE_SQUARES, COMMUNITY_CHEST_MOVES, COMMUNITY_CHEST_SQUARES, DEFAULT_PROPERTIES,
+                    GO_SALARY, GO_TO_JAIL_SQUARE, JAIL_SQUARE, TAX_SQUARES, color_groups, get_board)
+
+# Nature des cases
+SPECIAL, STREET, STATION, UTILITY = 0, 1, 2, 3
+
+# Codes des cartes dans les tables de déplacement
+NO_MOVE, BACK_3, TO_JAIL = -1, -2, -3
+
+# Un agent a la même interface que AIService.make_decision:
+# (popup_text, options, game_context) -> {'choice': ..., 'reason': ..., 'confidence': ...}
+Agent = Callable[[str, List[Dict], Dict], Dict]
+
+
+def _card_table(moves: list) -> np.ndarray:
+    table = np.full(CARDS_PER_DECK, NO_MOVE, dtype=np.int16)
+    for i, move in enumerate(moves):
+        table[i] = BACK_3 if move == CARD_GO_BACK_3 else TO_JAIL if move == CARD_GO_TO_JAIL else move
+    return table
+
+
+class PropertyTable:
+    """Table des propriétés (format MonopolyGame.properties) sous forme de tableaux par case"""
+
+    def __init__(self, properties: Optional[List[Dict]] = None, board: Optional[List[Dict]] = None):
+        self.board = board or get_board()
+        self.price = np.zeros(BOARD_SIZE, dtype=np.int64)
+        self.house_cost = np.zeros(BOARD_SIZE, dtype=np.int64)
+        self.mortgage = np.zeros(BOARD_SIZE, dtype=np.int64)
+        self.rents = np.zeros((BOARD_SIZE, 6), dtype=np.int64)
+        self.kind = np.full(BOARD_SIZE, SPECIAL, dtype=np.int8)
+        self.group = np.full(BOARD_SIZE, -1, dtype=np.int8)
+        self.tax = np.zeros(BOARD_SIZE, dtype=np.int64)
+
+        groups = color_groups(self.board)
+        self.group_names = list(groups)
+        self.group_squares = [np.array(squares) for squares in groups.values()]
+        for index, (color, squares) in enumerate(groups.items()):
+            kind = STATION if color == "station" else UTILITY if color == "utility" else STREET
+            self.kind[squares] = kind
+            self.group[squares] = index
+        self.street_groups = [squares for squares in self.group_squares if self.kind[squares[0]] == STREET]
+        self.stations = np.flatnonzero(self.kind == STATION)
+        self.utilities = np.flatnonzero(self.kind == UTILITY)
+
+        for prop in properties or DEFAULT_PROPERTIES:
+            square = prop["id"]
+            rents = [max(0, r) for r in prop.get("rents", [])][:6]
+            self.price[square] = prop.get("price", 0)
+            self.mortgage[square] = max(0, prop.get("mortgage", self.price[square] // 2))
+            self.house_cost[square] = max(0, prop.get("cost", 0))
+            self.rents[square, :len(rents)] = rents
+        for square, amount in TAX_SQUARES.items():
+            self.tax[square] = amount
+
+        # Même groupe que la case (masque 40x40) pour tester les monopoles
+        self.same_group = (self.group[:, None] == self.group[None, :]) & (self.group[:, None] >= 0)
+
+        self.chance = _card_table(CHANCE_MOVES)
+        self.community_chest = _card_table(COMMUNITY_CHEST_MOVES)
+        self.card_deck = np.full(BOARD_SIZE, -1, dtype=np.int8)
+        self.card_deck[list(CHANCE_SQUARES)] = 0
+        self.card_deck[list(COMMUNITY_CHEST_SQUARES)] = 1
+
+    def name(self, square: int) -> str:
+        return self.board[square]["name"]
+
+    def group_of(self, square: int) -> str:
+        return self.board[square].get("color", "unknown")
+
+
+class HeadlessMonopoly:
+    """Parties de Monopoly sans Dolphin, avancées en parallèle.
+
+    L'état de toutes les parties est stocké dans des tableaux NumPy (parties x
+    joueurs, parties x cases). Dés, déplacements, cartes, loyers, prison et
+    faillites sont calculés en bloc pour toutes les parties; seuls les points
+    de décision (achat, prison) sont envoyés, partie par partie, à l'agent du
+    joueur concerné avec la même interface que `AIService.make_decision`.
+    Les enchères, la construction et la levée d'hypothèques suivent des règles
+    simples et fixes. Un joueur qui ne peut pas payer vend ses maisons à moitié
+    prix puis hypothèque ses propriétés avant de faire faillite.
+    """
+
+    def __init__(self, n_games: int, agents: Sequence[Agent], player_names: Optional[List[str]] = None,
+                 properties: Optional[List[Dict]] = None, starting_money: int = 1500,
+                 max_turns: int = 200, auto_build: bool = True, build_reserve: int = 200,
+                 seed: Optional[int] = None):
+        self.n_games = n_games
+        self.agents = list(agents)
+        self.n_players = len(self.agents)
+        self.player_names = player_names or [f"player{i + 1}" for i in range(self.n_players)]
+        self.table = PropertyTable(properties)
+        self.max_turns = max_turns
+        self.auto_build = auto_build
+        self.build_reserve = build_reserve
+        self.rng = np.random.default_rng(seed)
+
+        shape = (n_games, self.n_players)
+        self.position = np.zeros(shape, dtype=np.int16)
+        self.money = np.full(shape, starting_money, dtype=np.int64)
+        self.in_jail = np.zeros(shape, dtype=bool)
+        self.jail_turns = np.zeros(shape, dtype=np.int8)
+        self.bankrupt = np.zeros(shape, dtype=bool)
+        self.owner = np.full((n_games, BOARD_SIZE), -1, dtype=np.int8)
+        self.houses = np.zeros((n_games, BOARD_SIZE), dtype=np.int8)
+        self.mortgaged = np.zeros((n_games, BOARD_SIZE), dtype=bool)
+        self.current = np.zeros(n_games, dtype=np.int64)
+        self.turn = np.zeros(n_games, dtype=np.int64)
+        self.done = np.zeros(n_games, dtype=bool)
+        self.forced_choices: Dict[tuple, str] = {}  # (partie, joueur) -> choix imposé à la prochaine décision
+        self.stats = {'steps': 0, 'decisions': 0, 'auctions': 0, 'bankruptcies': 0,
+                      'houses_sold': 0, 'mortgages': 0}
+
+    def load_context(self, game_context: Dict, games: Optional[np.ndarray] = None):
+        """Initialise des parties à partir d'un contexte au format de Contexte.
+
+        Les joueurs sont associés par nom (dans l'ordre de `player_names`), leurs
+        propriétés par id de case; le joueur courant devient le joueur à jouer.
+        """
+        games = np.arange(self.n_games) if games is None else games
+        global_properties = game_context.get("global", {}).get("properties", [])
+        houses = {prop["id"]: prop.get("houses", 0) for prop in global_properties}
+        mortgaged = {prop["id"] for prop in global_properties if prop.get("mortgaged")}
+        players = game_context.get("players", {})
+        for i, name in enumerate(self.player_names):
+            player = players.get(name, {})
+            self.money[games, i] = player.get("money", 0)
+            self.position[games, i] = player.get("position", 0) % BOARD_SIZE
+            self.in_jail[games, i] = bool(player.get("jail", False))
+            self.bankrupt[games, i] = bool(player.get("bankrupt", False))
+            for square in player.get("properties", []):
+                if isinstance(square, int) and 0 <= square < BOARD_SIZE:
+                    self.owner[games, square] = i
+                    self.houses[games, square] = houses.get(square, 0) or 0
+                    self.mortgaged[games, square] = square in mortgaged
+            if player.get("current_player"):
+                self.current[games] = i
+        self.turn[games] = max(0, game_context.get("global", {}).get("current_turn", 1) - 1) * self.n_players
+
+    # ------------------------------------------------------------------ #
+    # Boucle de jeu
+    # ------------------------------------------------------------------ #
+    def run(self) -> Dict:
+        """Joue toutes les parties jusqu'au bout et retourne les résultats"""
+        while not self.done.all():
+            self.step()
+        return self.results()
+
+    def step(self):
+        """Joue le tour du joueur courant dans chaque partie non terminée"""
+        games = np.flatnonzero(~self.done)
+        if not games.size:
+            return
+        players = self.current[games]
+        rolling = np.ones(games.size, dtype=bool)
+
+        for roll in range(3):
+            idx = np.flatnonzero(rolling)
+            if not idx.size:
+                break
+            g, p = games[idx], players[idx]
+            dice = self.rng.integers(1, 7, size=(idx.size, 2))
+            total = dice.sum(axis=1)
+            doubles = dice[:, 0] == dice[:, 1]
+
+            stays = np.zeros(idx.size, dtype=bool)
+            if roll == 0:
+                stays, doubles = self._jail_phase(g, p, doubles)
+
+            # Troisième double consécutif: prison
+            to_jail = doubles & (roll == 2)
+            self._send_to_jail(g[to_jail], p[to_jail])
+
+            moving = ~stays & ~to_jail
+            self._move(g[moving], p[moving], total[moving], total[moving])
+
+            rolling[idx] = doubles & moving & ~self.in_jail[g, p] & ~self.bankrupt[g, p]
+
+        if self.auto_build:
+            self._build(games, players)
+        self._end_turn(games)
+        self.stats['steps'] += 1
+
+    def _jail_phase(self, g: np.ndarray, p: np.ndarray, doubles: np.ndarray):
+        """Joueurs en prison: caution (décision de l'agent) ou tentative de double"""
+        jailed = np.flatnonzero(self.in_jail[g, p])
+        stays = np.zeros(g.size, dtype=bool)
+        doubles = doubles.copy()
+        for i in jailed:
+            gi, pi = g[i], p[i]
+            options = ["pay bail", "roll dice"] if self.money[gi, pi] >= BAIL else ["roll dice"]
+            choice = self._decide(gi, pi, "jail_decision", "You are in jail. Pay the bail?", options)
+            if choice == "pay bail":
+                self.money[gi, pi] -= BAIL
+                self.in_jail[gi, pi] = False
+                continue
+
+            if doubles[i]:
+                self.in_jail[gi, pi] = False
+                doubles[i] = False  # Sortie sur un double: pas de relance
+                continue
+            self.jail_turns[gi, pi] += 1
+            if self.jail_turns[gi, pi] >= 3:
+                self.in_jail[gi, pi] = False
+                self._charge(np.array([gi]), np.array([pi]), np.array([BAIL]))
+            else:
+                stays[i] = True
+
+        self.jail_turns[g[~self.in_jail[g, p]], p[~self.in_jail[g, p]]] = 0
+        return stays | self.bankrupt[g, p], doubles
+
+    def _send_to_jail(self, g: np.ndarray, p: np.ndarray):
+        self.position[g, p] = JAIL_SQUARE
+        self.in_jail[g, p] = True
+        self.jail_turns[g, p] = 0
+
+    def _move(self, g: np.ndarray, p: np.ndarray, steps: np.ndarray, dice_total: np.ndarray):
+        if not g.size:
+            return
+        target = self.position[g, p] + steps
+        self.money[g, p] += np.where(target >= BOARD_SIZE, GO_SALARY, 0)
+        self.position[g, p] = target % BOARD_SIZE
+        self._land(g, p, dice_total)
+
+    def _land(self, g: np.ndarray, p: np.ndarray, dice_total: np.ndarray):
+        """Effets de la case d'arrivée, pour toutes les parties en même temps"""
+        square = self.position[g, p].astype(np.int64)
+        table = self.table
+
+        jail = square == GO_TO_JAIL_SQUARE
+        self._send_to_jail(g[jail], p[jail])
+
+        taxed = table.tax[square] > 0
+        self._charge(g[taxed], p[taxed], table.tax[square[taxed]])
+
+        deck = table.card_deck[square]
+        drawing = deck >= 0
+        if drawing.any():
+            self._draw_cards(g[drawing], p[drawing], deck[drawing], dice_total[drawing])
+
+        buyable = table.kind[square] != SPECIAL
+        owner = self.owner[g, square]
+        unowned = buyable & (owner < 0)
+        if unowned.any():
+            self._offer_purchase(g[unowned], p[unowned], square[unowned])
+
+        renting = buyable & (owner >= 0) & (owner != p) & ~self.mortgaged[g, square]
+        if renting.any():
+            rent = self._rent(g[renting], square[renting], owner[renting], dice_total[renting])
+            self._charge(g[renting], p[renting], rent, owner[renting])
+
+    def _draw_cards(self, g: np.ndarray, p: np.ndarray, deck: np.ndarray, dice_total: np.ndarray):
+        """Cartes Chance / Caisse de communauté qui déplacent le joueur"""
+        draw = self.rng.integers(0, CARDS_PER_DECK, size=g.size)
+        move = np.where(deck == 0, self.table.chance[draw], self.table.community_chest[draw])
+
+        jail = move == TO_JAIL
+        self._send_to_jail(g[jail], p[jail])
+
+        back = move == BACK_3
+        self.position[g[back], p[back]] -= 3
+
+        advance = move >= 0
+        current = self.position[g[advance], p[advance]]
+        target = move[advance]
+        self.money[g[advance], p[advance]] += np.where(target < current, GO_SALARY, 0)
+        self.position[g[advance], p[advance]] = target
+
+        moved = back | advance
+        if moved.any():
+            self._land(g[moved], p[moved], dice_total[moved])
+
+    def _rent(self, g: np.ndarray, square: np.ndarray, owner: np.ndarray, dice_total: np.ndarray) -> np.ndarray:
+        table = self.table
+        kind = table.kind[square]
+        owned_by = self.owner[g] == owner[:, None]  # Cases de l'owner, partie par partie
+        rent = np.zeros(g.size, dtype=np.int64)
+
+        street = kind == STREET
+        if street.any():
+            houses = self.houses[g[street], square[street]].astype(np.int64)
+            group = table.same_group[square[street]]
+            monopoly = (owned_by[street] | ~group).all(axis=1)
+            base = table.rents[square[street], houses]
+            rent[street] = np.where((houses == 0) & monopoly, base * 2, base)
+
+        station = kind == STATION
+        if station.any():
+            count = owned_by[station][:, table.stations].sum(axis=1)
+            rent[station] = table.rents[square[station], np.clip(count - 1, 0, 3)]
+
+        utility = kind == UTILITY
+        if utility.any():
+            count = owned_by[utility][:, table.utilities].sum(axis=1)
+            multiplier = table.rents[square[utility], np.clip(count - 1, 0, 1)]
+            rent[utility] = multiplier * dice_total[utility]
+
+        return rent
+
+    def _charge(self, g: np.ndarray, p: np.ndarray, amount: np.ndarray, creditor: Optional[np.ndarray] = None):
+        """Débite `amount` après liquidation si nécessaire; un joueur qui ne peut toujours pas payer fait faillite"""
+        if not g.size:
+            return
+        for i in np.flatnonzero(self.money[g, p] < amount):
+            self._raise_cash(g[i], p[i], amount[i])
+        paid = np.minimum(amount, self.money[g, p])
+        self.money[g, p] -= amount
+        if creditor is not None:
+            self.money[g, creditor] += paid
+
+        broke = self.money[g, p] < 0
+        if broke.any():
+            gb, pb = g[broke], p[broke]
+            self.bankrupt[gb, pb] = True
+            self.money[gb, pb] = 0
+            released = self.owner[gb] == pb[:, None]
+            self.owner[gb] = np.where(released, -1, self.owner[gb])
+            self.houses[gb] = np.where(released, 0, self.houses[gb])
+            self.mortgaged[gb] = np.where(released, False, self.mortgaged[gb])
+            self.stats['bankruptcies'] += int(broke.sum())
+
+    def _raise_cash(self, game: int, player: int, needed: int):
+        """Vend des maisons à moitié prix (uniformément), puis hypothèque, jusqu'à pouvoir payer `needed`"""
+        table = self.table
+        owned = self.owner[game] == player
+        while self.money[game, player] < needed:
+            built = np.flatnonzero(owned & (self.houses[game] > 0))
+            if not built.size:
+                break
+            square = built[self.houses[game, built].argmax()]  # Vente régulière: le plus construit d'abord
+            self.houses[game, square] -= 1
+            self.money[game, player] += table.house_cost[square] // 2
+            self.stats['houses_sold'] += 1
+
+        # Hypothèques, en commençant par les propriétés les moins chères
+        candidates = np.flatnonzero(owned & ~self.mortgaged[game] & (self.houses[game] == 0))
+        for square in candidates[np.argsort(table.price[candidates], kind="stable")]:
+            if self.money[game, player] >= needed:
+                break
+            self.mortgaged[game, square] = True
+            self.money[game, player] += table.mortgage[square]
+            self.stats['mortgages'] += 1
+
+    def _offer_purchase(self, g: np.ndarray, p: np.ndarray, square: np.ndarray):
+        """Point de décision d'achat; un refus (ou un manque d'argent) part aux enchères"""
+        price = self.table.price[square]
+        auction = np.ones(g.size, dtype=bool)
+        for i in np.flatnonzero(self.money[g, p] >= price):
+            gi, pi, sq = g[i], p[i], square[i]
+            text = f"Do you want to buy {self.table.name(sq)} for {price[i]}?"
+            if self._decide(gi, pi, "property_purchase", text, ["buy", "auction"], pending_square=sq) == "buy":
+                self.owner[gi, sq] = pi
+                self.money[gi, pi] -= price[i]
+                auction[i] = False
+        if auction.any():
+            self._auction(g[auction], square[auction])
+
+    def _auction(self, g: np.ndarray, square: np.ndarray):
+        """Enchère simplifiée: le joueur le plus riche l'emporte à la moitié du prix"""
+        bid = np.maximum(10, self.table.price[square] // 2)
+        wealth = np.where(self.bankrupt[g], -1, self.money[g])
+        winner = wealth.argmax(axis=1)
+        can_pay = wealth[np.arange(g.size), winner] >= bid
+        g, square, winner, bid = g[can_pay], square[can_pay], winner[can_pay], bid[can_pay]
+        self.owner[g, square] = winner
+        self.money[g, winner] -= bid
+        self.stats['auctions'] += int(can_pay.sum())
+
+    def _build(self, games: np.ndarray, players: np.ndarray):
+        """Levée d'hypothèques (+10 %) puis construction régulière: une maison par tour sur un
+        monopole sans hypothèque, au-delà d'une réserve"""
+        table = self.table
+        for square in np.flatnonzero(table.mortgage):
+            repay = table.mortgage[square] * 11 // 10
+            lift = (self.mortgaged[games, square] & (self.owner[games, square] == players)
+                    & (self.money[games, players] >= repay + self.build_reserve))
+            rows = np.flatnonzero(lift)
+            if rows.size:
+                self.mortgaged[games[rows], square] = False
+                self.money[games[rows], players[rows]] -= repay
+
+        for squares in table.street_groups:
+            owners = self.owner[games][:, squares]
+            houses = self.houses[games][:, squares]
+            cost = table.house_cost[squares[0]]
+            full = (owners == players[:, None]).all(axis=1) & ~self.mortgaged[games][:, squares].any(axis=1)
+            can = full & (houses.min(axis=1) < 5) & (self.money[games, players] >= cost + self.build_reserve)
+            rows = np.flatnonzero(can)
+            if rows.size:
+                target = squares[houses[rows].argmin(axis=1)]
+                self.houses[games[rows], target] += 1
+                self.money[games[rows], players[rows]] -= cost
+
+    def _end_turn(self, games: np.ndarray):
+        """Passe au joueur suivant encore en jeu et détecte les fins de partie"""
+        self.turn[games] += 1
+        order = (self.current[games][:, None] + np.arange(1, self.n_players + 1)) % self.n_players
+        alive = ~self.bankrupt[games[:, None], order]
+        self.current[games] = order[np.arange(games.size), alive.argmax(axis=1)]
+
+        remaining = (~self.bankrupt[games]).sum(axis=1)
+        self.done[games] = (remaining <= 1) | (self.turn[games] >= self.max_turns * self.n_players)
+
+    # ------------------------------------------------------------------ #
+    # Décisions et contexte
+    # ------------------------------------------------------------------ #
+    def _decide(self, game: int, player: int, popup_type: str, popup_text: str,
+                option_names: List[str], pending_square: Optional[int] = None) -> str:
+        """Demande un choix à l'agent du joueur; un choix invalide retombe sur la première option"""
+        self.stats['decisions'] += 1
+        forced = self.forced_choices.pop((int(game), int(player)), None)
+        if forced in option_names:
+            return forced
+
+        agent = self.agents[player]
+        # Les agents qui n'utilisent pas le contexte (rollouts) évitent sa construction
+        if getattr(agent, "needs_context", True):
+            context = self.game_context(game, player, pending_square)
+        else:
+            context = {"global": {}, "players": {}}
+        context["global"]["popup_type"] = popup_type
+        decision = agent(popup_text, [{"name": name} for name in option_names], context)
+        choice = decision.get("choice") if isinstance(decision, dict) else decision
+        return choice if choice in option_names else option_names[0]
+
+    def game_context(self, game: int, player: int, pending_square: Optional[int] = None) -> Dict:
+        """Contexte d'une partie au format de Contexte (joueurs, tour, propriétés)"""
+        table = self.table
+        properties = []
+        for square in np.flatnonzero(self.owner[game] >= 0):
+            owner = int(self.owner[game, square])
+            properties.append({
+                "id": int(square),
+                "name": table.name(square),
+                "group": table.group_of(square),
+                "price": int(table.price[square]),
+                "rent": table.rents[square].tolist(),
+                "house_price": int(table.house_cost[square]),
+                "owner": self.player_names[owner],
+                "houses": int(self.houses[game, square]),
+                "mortgaged": bool(self.mortgaged[game, square])
+            })
+
+        players = {}
+        for i, name in enumerate(self.player_names):
+            players[name] = {
+                "name": name,
+                "money": int(self.money[game, i]),
+                "position": int(self.position[game, i]),
+                "jail": bool(self.in_jail[game, i]),
+                "bankrupt": bool(self.bankrupt[game, i]),
+                "properties": [prop["id"] for prop in properties if prop["owner"] == name],
+                "current_player": i == player
+            }
+
+        context = {
+            "global": {
+                "current_turn": int(self.turn[game]) // self.n_players + 1,
+                "current_player": self.player_names[player],
+                "properties": properties
+            },
+            "players": players
+        }
+        if pending_square is not None:
+            context["global"]["pending_property"] = {
+                "id": int(pending_square),
+                "name": table.name(pending_square),
+                "group": table.group_of(pending_square),
+                "price": int(table.price[pending_square]),
+                "rent": table.rents[pending_square].tolist()
+            }
+        return context
+
+    def net_worth(self) -> np.ndarray:
+        """Argent + valeur des propriétés (moins les hypothèques) et des maisons, par partie et par joueur"""
+        table = self.table
+        worth = self.money.copy()
+        value = (table.price[None, :] - np.where(self.mortgaged, table.mortgage[None, :], 0)
+                 + self.houses * table.house_cost[None, :])
+        for i in range(self.n_players):
+            worth[:, i] += np.where(self.owner == i, value, 0).sum(axis=1)
+        return np.where(self.bankrupt, 0, worth)
+
+    def results(self) -> Dict:
+        worth = self.net_worth()
+        return {
+            "winner": np.where(self.bankrupt, -1, worth).argmax(axis=1),
+            "net_worth": worth,
+            "bankrupt": self.bankrupt.copy(),
+            "turns": self.turn // self.n_players,
+            "stats": dict(self.stats)
+        }
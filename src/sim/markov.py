@@ -0,0 +1,236 @@
+"""
+Probabilités d'arrêt sur chaque case (chaîne de Markov du plateau) et loyers espérés
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .board import (BOARD_SIZE, CARD_GO_BACK_3, CARD_GO_TO_JAIL, CARDS_PER_DECK, CHANCE_MOVES,
+                    CHANCE_SQUARES, COMMUNITY_CHEST_MOVES, COMMUNITY_CHEST_SQUARES, DEFAULT_PROPERTIES,
+                    GO_TO_JAIL_SQUARE, JAIL_SQUARE, MONOPOLY_BOARD, color_groups)
+
+WORKSPACE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_CACHE_FILE = os.path.join(WORKSPACE_DIR, "game_files", "markov_tables.json")
+
+JAIL_POLICIES = ("roll", "pay")  # Rester en prison en tentant les doubles, ou payer la caution
+EXPECTED_DICE_TOTAL = 7
+CACHE_VERSION = 1
+
+_JAIL = "jail"
+_DICE = [(a, b) for a in range(1, 7) for b in range(1, 7)]
+
+
+def _resolve_landing(square: int) -> Dict:
+    """Case finale (ou prison) après la case d'arrivée et une éventuelle carte"""
+    if square == GO_TO_JAIL_SQUARE:
+        return {_JAIL: 1.0}
+    if square in CHANCE_SQUARES or square in COMMUNITY_CHEST_SQUARES:
+        moves = CHANCE_MOVES if square in CHANCE_SQUARES else COMMUNITY_CHEST_MOVES
+        outcomes = {square: (CARDS_PER_DECK - len(moves)) / CARDS_PER_DECK}
+        for move in moves:
+            if move == CARD_GO_TO_JAIL:
+                targets = {_JAIL: 1.0}
+            elif move == CARD_GO_BACK_3:
+                targets = _resolve_landing((square - 3) % BOARD_SIZE)
+            else:
+                targets = {move: 1.0}
+            for target, prob in targets.items():
+                outcomes[target] = outcomes.get(target, 0.0) + prob / CARDS_PER_DECK
+        return outcomes
+    return {square: 1.0}
+
+
+def solve_landing_probabilities(jail_policy: str = "roll") -> List[float]:
+    """Nombre moyen d'arrêts sur chaque case par tour de jeu d'un joueur.
+
+    États: (case, doubles consécutifs 0-2) et trois états « en prison » (tours
+    passés). Une transition est un lancer de dés; la distribution stationnaire
+    est ramenée au tour en divisant par la fréquence des fins de tour (états
+    sans double en cours, ou en prison).
+    """
+    import numpy as np
+
+    n_states = BOARD_SIZE * 3 + 3
+    jail_state = BOARD_SIZE * 3
+    transitions = np.zeros((n_states, n_states))
+
+    def land(row: int, square: int, doubles: int, prob: float):
+        for target, p in _resolve_landing(square % BOARD_SIZE).items():
+            column = jail_state if target == _JAIL else target * 3 + doubles
+            transitions[row, column] += prob * p
+
+    def roll_from(row: int, position: int, doubles_so_far: int):
+        for a, b in _DICE:
+            if a == b and doubles_so_far == 2:
+                transitions[row, jail_state] += 1 / 36
+            else:
+                land(row, position + a + b, doubles_so_far + 1 if a == b else 0, 1 / 36)
+
+    for position in range(BOARD_SIZE):
+        for doubles in range(3):
+            roll_from(position * 3 + doubles, position, doubles)
+
+    for turns in range(3):
+        row = jail_state + turns
+        if jail_policy == "pay":
+            roll_from(row, JAIL_SQUARE, 0)
+            continue
+        for a, b in _DICE:
+            if a == b or turns == 2:
+                land(row, JAIL_SQUARE + a + b, 0, 1 / 36)  # Sortie de prison: pas de relance
+            else:
+                transitions[row, row + 1] += 1 / 36
+
+    # pi P = pi avec sum(pi) = 1
+    system = np.vstack([transitions.T - np.eye(n_states), np.ones(n_states)])
+    target = np.zeros(n_states + 1)
+    target[-1] = 1.0
+    stationary = np.linalg.lstsq(system, target, rcond=None)[0]
+
+    per_roll = stationary[:jail_state].reshape(BOARD_SIZE, 3)
+    turn_ends = per_roll[:, 0].sum() + stationary[jail_state:].sum()
+    landing = per_roll.sum(axis=1) / turn_ends
+    return [float(value) for value in landing]
+
+
+class MarkovTables:
+    """Tables précalculées: probabilité d'arrêt, loyer espéré et délai de rentabilité.
+
+    `landing[case]` est le nombre moyen d'arrêts d'un adversaire sur la case à
+    chacun de ses tours. Le niveau de développement d'une case est le nombre de
+    maisons (5 = hôtel) pour une rue, le nombre de gares (ou compagnies)
+    possédées moins un sinon; une rue nue dont le groupe est complet rapporte
+    le double. Toutes les consultations sont en O(1).
+    """
+
+    def __init__(self, landing: List[float], properties: Optional[List[Dict]] = None,
+                 jail_policy: str = "roll"):
+        self.landing = landing
+        self.jail_policy = jail_policy
+        self.groups = color_groups(MONOPOLY_BOARD)
+        self.group_of = {square: color for color, squares in self.groups.items() for square in squares}
+        self.price = [0] * BOARD_SIZE
+        self.house_cost = [0] * BOARD_SIZE
+        self.rents = [[0] * 6 for _ in range(BOARD_SIZE)]
+        for prop in properties or DEFAULT_PROPERTIES:
+            square = prop["id"]
+            self.price[square] = prop.get("price", 0)
+            self.house_cost[square] = max(0, prop.get("cost", 0))
+            rents = [max(0, r) for r in prop.get("rents", [])][:6]
+            self.rents[square][:len(rents)] = rents
+
+        # Loyer espéré par tour d'un adversaire, pour chaque niveau de développement
+        self.expected_rent = [
+            [self.rent_due(square, level) * landing[square] for level in range(6)]
+            for square in range(BOARD_SIZE)
+        ]
+
+    def kind(self, square: int) -> Optional[str]:
+        color = self.group_of.get(square)
+        return None if color is None else color if color in ("station", "utility") else "street"
+
+    def rent_due(self, square: int, level: int = 0, monopoly: bool = False,
+                 dice_total: int = EXPECTED_DICE_TOTAL) -> int:
+        """Loyer exigible sur la case (compagnies: multiplicateur appliqué aux dés)"""
+        kind = self.kind(square)
+        if kind is None:
+            return 0
+        if kind == "utility":
+            return self.rents[square][min(level, 1)] * dice_total
+        if kind == "station":
+            return self.rents[square][min(level, 3)]
+        rent = self.rents[square][min(level, 5)]
+        return rent * 2 if monopoly and level == 0 else rent
+
+    def development_level(self, square: int, owned_squares: Iterable[int], houses: int = 0) -> Tuple[int, bool]:
+        """(niveau, groupe complet) d'une case pour l'ensemble des cases de son propriétaire"""
+        owned = set(owned_squares) | {square}
+        group = self.groups.get(self.group_of.get(square), [])
+        count = sum(1 for other in group if other in owned)
+        monopoly = count == len(group) and bool(group)
+        if self.kind(square) == "street":
+            return houses, monopoly
+        return max(0, count - 1), monopoly
+
+    def landing_probability(self, square: int) -> float:
+        return self.landing[square]
+
+    def expected_rent_per_turn(self, square: int, level: int = 0, monopoly: bool = False) -> float:
+        if monopoly and level == 0 and self.kind(square) == "street":
+            return self.expected_rent[square][0] * 2
+        return self.expected_rent[square][min(level, 5)]
+
+    def payback_turns(self, square: int, level: int = 0, monopoly: bool = False,
+                      opponents: int = 1) -> Optional[float]:
+        """Tours de jeu nécessaires pour rembourser l'achat et les maisons (None si aucun loyer)"""
+        income = self.expected_rent_per_turn(square, level, monopoly) * max(1, opponents)
+        if income <= 0:
+            return None
+        houses = level if self.kind(square) == "street" else 0
+        return (self.price[square] + houses * self.house_cost[square]) / income
+
+    def describe(self, square: int, level: int = 0, monopoly: bool = False, opponents: int = 1) -> Dict:
+        """Résumé d'une case pour le contexte et les prompts"""
+        payback = self.payback_turns(square, level, monopoly, opponents)
+        return {
+            "landing_probability": round(self.landing[square], 4),
+            "expected_rent_per_turn": round(self.expected_rent_per_turn(square, level, monopoly), 2),
+            "payback_turns": round(payback, 1) if payback is not None else None
+        }
+
+
+def _cache_key(jail_policy: str) -> str:
+    """Les probabilités ne dépendent que du plateau, des cartes et de la politique de prison"""
+    canonical = json.dumps({
+        "version": CACHE_VERSION,
+        "jail_policy": jail_policy,
+        "board": [(space["id"], space.get("color")) for space in MONOPOLY_BOARD],
+        "chance": CHANCE_MOVES,
+        "community_chest": COMMUNITY_CHEST_MOVES
+    }, sort_keys=True)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+_tables: Dict[str, MarkovTables] = {}
+_lock = threading.Lock()
+
+
+def get_tables(jail_policy: str = "roll", properties: Optional[List[Dict]] = None,
+               cache_file: str = DEFAULT_CACHE_FILE) -> MarkovTables:
+    """Tables de la politique de prison demandée, résolues une seule fois puis mises en cache sur disque.
+
+    Seule la résolution de la chaîne nécessite NumPy; les probabilités déjà
+    en cache sont relues sans.
+    """
+    if jail_policy not in JAIL_POLICIES:
+        raise ValueError(f"Politique de prison inconnue: {jail_policy}")
+    with _lock:
+        if jail_policy in _tables and properties is None:
+            return _tables[jail_policy]
+
+        key = _cache_key(jail_policy)
+        cached = {}
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Cache Markov illisible: {e}")
+
+        landing = cached.get(key)
+        if landing is None:
+            landing = solve_landing_probabilities(jail_policy)
+            cached[key] = landing
+            try:
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                with open(cache_file, "w", encoding="utf-8") as f:
+                    json.dump(cached, f)
+            except OSError as e:
+                print(f"⚠️  Impossible d'écrire le cache Markov: {e}")
+
+        tables = MarkovTables(landing, properties, jail_policy)
+        if properties is None:
+            _tables[jail_policy] = tables
+        return tables
@@ -0,0 +1,185 @@
+"""
+Évaluation Monte Carlo des décisions (achat, enchère, prison) par simulation de futurs aléatoires
+"""
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .agents import GreedyAgent, RandomAgent
+from .engine import HeadlessMonopoly
+
+# Options simulables pour chaque type de popup
+SUPPORTED_OPTIONS = {
+    "property_purchase": ("buy", "auction"),
+    "jail_decision": ("pay bail", "roll dice"),
+}
+
+
+class RolloutEvaluator:
+    """Estime la valeur de chaque option en jouant des futurs aléatoires.
+
+    Pour chaque option candidate, l'état courant est recopié dans un lot de
+    parties headless, l'option y est appliquée, puis toutes les parties sont
+    jouées `horizon_turns` tours avec des agents aléatoires. La valeur d'une
+    option est la variation moyenne de l'avance du joueur courant: sa fortune
+    nette moins la fortune nette moyenne de ses adversaires. Une partie gagnée
+    avant l'horizon compte ainsi comme une victoire (adversaires à 0) au lieu
+    d'être figée pendant que les autres futurs continuent d'encaisser. Les
+    lots sont joués jusqu'à `n_rollouts` futurs par option ou jusqu'à
+    épuisement de `time_budget_ms` (au moins un lot est toujours joué), ce qui
+    règle le compromis latence / précision.
+    """
+
+    def __init__(self, n_rollouts: int = 512, horizon_turns: int = 30, time_budget_ms: float = 150,
+                 batch: int = 128, properties: Optional[List[Dict]] = None, seed: Optional[int] = None):
+        self.n_rollouts = n_rollouts
+        self.horizon_turns = horizon_turns
+        self.time_budget_ms = time_budget_ms
+        self.batch = batch
+        self.properties = properties
+        self.rng = np.random.default_rng(seed)
+
+    def supports(self, popup_type: Optional[str], option_names: List[str]) -> bool:
+        supported = SUPPORTED_OPTIONS.get(popup_type, ())
+        return sum(name in supported for name in option_names) >= 2
+
+    def evaluate(self, game_context: Dict, popup_type: Optional[str], option_names: List[str],
+                 time_budget_ms: Optional[float] = None) -> Optional[Dict]:
+        """Valeur espérée de chaque option, ou None si le type de popup n'est pas simulable"""
+        if not self.supports(popup_type, option_names):
+            return None
+        player_names = list(game_context.get("players", {}))
+        me = self._current_index(game_context, player_names)
+        if me is None or len(player_names) < 2:
+            return None
+
+        options = [name for name in option_names if name in SUPPORTED_OPTIONS[popup_type]]
+        budget = (self.time_budget_ms if time_budget_ms is None else time_budget_ms) / 1000
+        started = time.perf_counter()
+        deltas: Dict[str, List[np.ndarray]] = {name: [] for name in options}
+        wins: Dict[str, List[np.ndarray]] = {name: [] for name in options}
+        played = 0
+
+        while played < self.n_rollouts:
+            size = min(self.batch, self.n_rollouts - played)
+            for name, (delta, won) in zip(options, self._run_batch(game_context, player_names, me,
+                                                                   popup_type, options, size)):
+                deltas[name].append(delta)
+                wins[name].append(won)
+            played += size
+            if time.perf_counter() - started >= budget:
+                break
+
+        results = {}
+        for name in options:
+            values = np.concatenate(deltas[name])
+            results[name] = {
+                "mean": float(values.mean()),
+                "stderr": float(values.std(ddof=1) / np.sqrt(values.size)) if values.size > 1 else 0.0,
+                "win_rate": float(np.concatenate(wins[name]).mean()),
+                "rollouts": int(values.size)
+            }
+        return {
+            "popup_type": popup_type,
+            "options": results,
+            "best": max(results, key=lambda name: results[name]["mean"]),
+            "horizon_turns": self.horizon_turns,
+            "elapsed_ms": (time.perf_counter() - started) * 1000
+        }
+
+    def _run_batch(self, game_context: Dict, player_names: List[str], me: int, popup_type: str,
+                   options: List[str], size: int) -> List[tuple]:
+        """Joue `size` futurs par option dans un seul moteur (un bloc de parties par option).
+
+        Retourne, par option, (variation de l'avance, victoire) pour chaque futur.
+        """
+        seeds = self.rng.integers(0, 2 ** 31, size=len(player_names) + 1)
+        agents = [RandomAgent(int(seed)) for seed in seeds[1:]]
+        engine = HeadlessMonopoly(size * len(options), agents, player_names, self.properties,
+                                  max_turns=self.horizon_turns, auto_build=True, seed=int(seeds[0]))
+        engine.load_context(game_context)
+        engine.turn[:] = 0
+        engine.current[:] = me
+        baseline = self._lead(engine.net_worth(), me)[0]
+
+        blocks = [np.arange(k * size, (k + 1) * size) for k in range(len(options))]
+        for name, games in zip(options, blocks):
+            if popup_type == "property_purchase":
+                self._apply_purchase(engine, game_context, games, me, name)
+            else:
+                engine.in_jail[games, me] = True
+                engine.forced_choices.update({(int(g), me): name for g in games})
+
+        # Achat: le tour en cours est terminé; prison: le tour commence par la décision
+        if popup_type == "property_purchase":
+            engine._end_turn(np.arange(engine.n_games))
+        while not engine.done.all():
+            engine.step()
+
+        lead = self._lead(engine.net_worth(), me) - baseline
+        opponents = np.delete(engine.bankrupt, me, axis=1)
+        won = ~engine.bankrupt[:, me] & opponents.all(axis=1)
+        return [(lead[games], won[games]) for games in blocks]
+
+    @staticmethod
+    def _lead(worth: np.ndarray, me: int) -> np.ndarray:
+        """Fortune nette du joueur moins la moyenne de celles de ses adversaires (faillite = 0)"""
+        return worth[:, me] - np.delete(worth, me, axis=1).mean(axis=1)
+
+    def _apply_purchase(self, engine: HeadlessMonopoly, game_context: Dict, games: np.ndarray,
+                        me: int, option: str):
+        square = self._pending_square(game_context, engine.position[0, me])
+        if engine.owner[0, square] >= 0:
+            return
+        price = engine.table.price[square]
+        if option == "buy" and engine.money[0, me] >= price:
+            engine.owner[games, square] = me
+            engine.money[games, me] -= price
+        else:
+            engine._auction(games, np.full(games.size, square))
+
+    @staticmethod
+    def _pending_square(game_context: Dict, position: int) -> int:
+        pending = game_context.get("global", {}).get("pending_property") or {}
+        return int(pending.get("id", position))
+
+    @staticmethod
+    def _current_index(game_context: Dict, player_names: List[str]) -> Optional[int]:
+        current = game_context.get("global", {}).get("current_player")
+        if current in player_names:
+            return player_names.index(current)
+        for i, name in enumerate(player_names):
+            if game_context["players"][name].get("current_player"):
+                return i
+        return None
+
+
+class RolloutAgent:
+    """Adversaire de référence: choisit l'option de meilleure valeur simulée, sinon règle gloutonne"""
+
+    def __init__(self, evaluator: Optional[RolloutEvaluator] = None, fallback=None):
+        self.evaluator = evaluator or RolloutEvaluator(n_rollouts=128, horizon_turns=20, time_budget_ms=50)
+        self.fallback = fallback or GreedyAgent()
+
+    def __call__(self, popup_text: str, options: List[Dict], game_context: Dict) -> Dict:
+        names = [opt.get("name", "") for opt in options]
+        popup_type = game_context.get("global", {}).get("popup_type")
+        evaluation = self.evaluator.evaluate(game_context, popup_type, names)
+        if not evaluation:
+            return self.fallback(popup_text, options, game_context)
+        best = evaluation["options"][evaluation["best"]]
+        return {
+            "choice": evaluation["best"],
+            "reason": f"Simulation: {best['mean']:+.0f} d'avance espérée, {best['win_rate']:.0%} de victoires",
+            "confidence": 0.7
+        }
+
+
+def format_hint(evaluation: Dict) -> str:
+    """Résumé d'une évaluation, à ajouter au prompt de l'IA"""
+    parts = [f"{name}: {value['mean']:+.0f}€ (±{value['stderr']:.0f}, {value['win_rate']:.0%} de victoires)"
+             for name, value in evaluation["options"].items()]
+    rollouts = max(value["rollouts"] for value in evaluation["options"].values())
+    return (f"Simulation ({rollouts} futurs aléatoires, {evaluation['horizon_turns']} tours), "
+            f"variation espérée de l'avance en fortune nette sur les adversaires: {', '.join(parts)}")
@@ -0,0 +1,334 @@
+"""
+Tournois entre modèles sur le moteur headless: pool de processus, limites par
+modèle, reprise sur checkpoint et classement Elo (ou TrueSkill)
+"""
+import itertools
+import json
+import multiprocessing as mp
+import os
+import random
+import time
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import trueskill
+except ImportError:
+    trueskill = None
+
+# Estimation des tokens d'une décision (prompt + réponse) pour le budget de débit
+TOKENS_PER_DECISION = 400
+
+
+class TokenBucket:
+    """Budget de tokens par minute partagé entre les processus du pool"""
+
+    def __init__(self, tokens_per_minute: float, ctx=mp):
+        self.rate = tokens_per_minute / 60.0
+        self.capacity = tokens_per_minute
+        self._tokens = ctx.Value('d', tokens_per_minute)
+        self._updated = ctx.Value('d', time.time())
+        self._lock = ctx.Lock()
+
+    def acquire(self, tokens: float):
+        while True:
+            with self._lock:
+                now = time.time()
+                available = min(self.capacity, self._tokens.value + (now - self._updated.value) * self.rate)
+                self._updated.value = now
+                if available >= tokens:
+                    self._tokens.value = available - tokens
+                    return
+                self._tokens.value = available
+                wait = (tokens - available) / self.rate
+            time.sleep(min(wait, 1.0))
+
+
+class LimitedAgent:
+    """Applique la limite de requêtes simultanées et le budget de tokens d'un modèle"""
+
+    def __init__(self, agent, semaphore=None, bucket: Optional[TokenBucket] = None):
+        self.agent = agent
+        self.semaphore = semaphore
+        self.bucket = bucket
+
+    def __call__(self, popup_text: str, options: List[Dict], game_context: Dict) -> Dict:
+        if self.bucket:
+            self.bucket.acquire(TOKENS_PER_DECISION)
+        if self.semaphore is None:
+            return self.agent(popup_text, options, game_context)
+        with self.semaphore:
+            return self.agent(popup_text, options, game_context)
+
+
+def build_agent(config: Dict, seed: Optional[int] = None):
+    """Agent décrit par une config: {"name", "type": "llm"|"greedy"|"random"|"rollout", ...}"""
+    kind = config.get("type", "llm")
+    if kind == "random":
+        from .agents import RandomAgent
+        return RandomAgent(seed)
+    if kind == "greedy":
+        from .agents import GreedyAgent
+        return GreedyAgent(**config.get("params", {}))
+    if kind == "rollout":
+        from .rollout import RolloutAgent, RolloutEvaluator
+        return RolloutAgent(RolloutEvaluator(seed=seed, **config.get("params", {})))
+
+    from services.ai_service import AIService
+    service = AIService(
+        model=config.get("model", config["name"]),
+        api_key=os.getenv(config["api_key_env"]) if config.get("api_key_env") else None,
+        base_url=config.get("base_url"),
+        streaming=config.get("streaming")
+    )
+    return lambda text, options, context: service.make_decision(
+        text, options, context, context.get("global", {}).get("popup_type")
+    )
+
+
+# État des processus du pool (initialisé une fois par processus)
+_worker = {}
+
+
+def _init_worker(configs: Dict[str, Dict], semaphores: Dict, buckets: Dict):
+    _worker.update(configs=configs, semaphores=semaphores, buckets=buckets)
+
+
+def play_match(match: Dict) -> Dict:
+    """Joue une partie headless entre les modèles du match (exécuté dans un processus du pool)"""
+    from .engine import HeadlessMonopoly
+
+    names = match["players"]
+    agents = [
+        LimitedAgent(
+            build_agent(_worker["configs"][name], seed=match["seed"] + seat),
+            _worker["semaphores"].get(name),
+            _worker["buckets"].get(name)
+        )
+        for seat, name in enumerate(names)
+    ]
+
+    started = time.time()
+    game = HeadlessMonopoly(1, agents, player_names=names, max_turns=match.get("max_turns", 200),
+                            seed=match["seed"])
+    results = game.run()
+    worth = results["net_worth"][0].tolist()
+    winner = int(results["winner"][0])
+    draw = worth.count(max(worth)) > 1 and not results["bankrupt"][0].any()
+
+    return {
+        "match_id": match["match_id"],
+        "round": match.get("round", 0),
+        "players": names,
+        "winner": None if draw else names[winner],
+        "net_worth": worth,
+        "turns": int(results["turns"][0]),
+        "decisions": results["stats"]["decisions"],
+        "duration_s": round(time.time() - started, 3)
+    }
+
+
+def round_robin(names: List[str], games_per_pair: int, seed: int = 0, max_turns: int = 200) -> List[Dict]:
+    """Chaque paire joue `games_per_pair` parties, en alternant la place de départ"""
+    matches = []
+    for a, b in itertools.combinations(names, 2):
+        for k in range(games_per_pair):
+            players = [a, b] if k % 2 == 0 else [b, a]
+            matches.append({
+                "match_id": f"rr:{a}:{b}:{k}",
+                "players": players,
+                "seed": seed + len(matches) * 7919,
+                "max_turns": max_turns
+            })
+    return matches
+
+
+def swiss_pairings(names: List[str], results: List[Dict], round_index: int,
+                   seed: int = 0, max_turns: int = 200) -> List[Dict]:
+    """Appariements d'une ronde suisse: scores proches, en évitant les revanches"""
+    score = {name: 0.0 for name in names}
+    played = set()
+    for r in results:
+        a, b = r["players"]
+        played.add(frozenset((a, b)))
+        if r["winner"] is None:
+            score[a] += 0.5
+            score[b] += 0.5
+        else:
+            score[r["winner"]] += 1
+
+    rng = random.Random(seed + round_index)
+    pool = sorted(names, key=lambda n: (-score[n], rng.random()))
+    matches = []
+    while len(pool) > 1:
+        a = pool.pop(0)
+        opponent = next((b for b in pool if frozenset((a, b)) not in played), pool[0])
+        pool.remove(opponent)
+        players = [a, opponent] if round_index % 2 == 0 else [opponent, a]
+        matches.append({
+            "match_id": f"swiss:{round_index}:{a}:{opponent}",
+            "round": round_index,
+            "players": players,
+            "seed": seed + round_index * 104729 + len(matches) * 7919,
+            "max_turns": max_turns
+        })
+    return matches
+
+
+def load_checkpoint(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def elo_ratings(results: Iterable[Dict], names: List[str], k: float = 24.0, base: float = 1500.0) -> Dict[str, float]:
+    ratings = {name: base for name in names}
+    for r in results:
+        a, b = r["players"]
+        expected = 1 / (1 + 10 ** ((ratings[b] - ratings[a]) / 400))
+        score = 0.5 if r["winner"] is None else 1.0 if r["winner"] == a else 0.0
+        ratings[a] += k * (score - expected)
+        ratings[b] -= k * (score - expected)
+    return ratings
+
+
+def rating_table(results: List[Dict], names: List[str], bootstrap: int = 500, seed: int = 0) -> List[Dict]:
+    """Classement avec intervalle de confiance à 95%: TrueSkill si installé, sinon Elo bootstrappé"""
+    wins = {name: 0 for name in names}
+    games = {name: 0 for name in names}
+    for r in results:
+        for name in r["players"]:
+            games[name] += 1
+        if r["winner"]:
+            wins[r["winner"]] += 1
+
+    table = []
+    if trueskill is not None:
+        env = trueskill.TrueSkill(draw_probability=0.05)
+        ratings = {name: env.create_rating() for name in names}
+        for r in results:
+            a, b = r["players"]
+            if r["winner"] is None:
+                ratings[a], ratings[b] = env.rate_1vs1(ratings[a], ratings[b], drawn=True)
+            elif r["winner"] == a:
+                ratings[a], ratings[b] = env.rate_1vs1(ratings[a], ratings[b])
+            else:
+                ratings[b], ratings[a] = env.rate_1vs1(ratings[b], ratings[a])
+        for name in names:
+            mu, sigma = ratings[name].mu, ratings[name].sigma
+            table.append({"name": name, "rating": mu, "ci_low": mu - 2 * sigma, "ci_high": mu + 2 * sigma})
+    else:
+        point = elo_ratings(results, names)
+        rng = random.Random(seed)
+        samples = {name: [] for name in names}
+        for _ in range(bootstrap if results else 0):
+            resampled = [rng.choice(results) for _ in results]
+            for name, rating in elo_ratings(resampled, names).items():
+                samples[name].append(rating)
+        for name in names:
+            values = sorted(samples[name]) or [point[name]]
+            table.append({
+                "name": name,
+                "rating": point[name],
+                "ci_low": values[int(0.025 * (len(values) - 1))],
+                "ci_high": values[int(0.975 * (len(values) - 1))]
+            })
+
+    for row in table:
+        row.update(games=games[row["name"]], wins=wins[row["name"]],
+                   rating_system="trueskill" if trueskill else "elo")
+    return sorted(table, key=lambda row: -row["rating"])
+
+
+class Tournament:
+    """Tournoi round-robin ou suisse entre configs de modèles, sur un pool de processus.
+
+    Chaque processus joue une partie à la fois. Les limites de requêtes
+    simultanées et les budgets de tokens par minute de chaque modèle sont
+    partagés entre tous les processus. Chaque résultat est ajouté au fichier
+    checkpoint (JSONL) dès qu'il arrive: après un arrêt, les matchs déjà joués
+    sont relus et seuls les autres sont relancés.
+    """
+
+    def __init__(self, configs: List[Dict], checkpoint: str, processes: int = 4,
+                 format: str = "round_robin", games_per_pair: int = 2, rounds: int = 5,
+                 max_turns: int = 200, seed: int = 0):
+        self.configs = {c["name"]: c for c in configs}
+        self.names = list(self.configs)
+        self.checkpoint = checkpoint
+        self.processes = processes
+        self.format = format
+        self.games_per_pair = games_per_pair
+        self.rounds = rounds
+        self.max_turns = max_turns
+        self.seed = seed
+        self.ctx = mp.get_context("spawn")
+
+    def _limits(self):
+        semaphores, buckets = {}, {}
+        for name, config in self.configs.items():
+            if config.get("max_concurrency"):
+                semaphores[name] = self.ctx.BoundedSemaphore(config["max_concurrency"])
+            if config.get("tokens_per_minute"):
+                buckets[name] = TokenBucket(config["tokens_per_minute"], self.ctx)
+        return semaphores, buckets
+
+    def _play(self, pool, matches: List[Dict], results: List[Dict]):
+        done = {r["match_id"] for r in results}
+        pending = [m for m in matches if m["match_id"] not in done]
+        if not pending:
+            return
+        print(f"🎲 {len(pending)} matchs à jouer ({len(matches) - len(pending)} repris du checkpoint)")
+        with open(self.checkpoint, 'a', encoding='utf-8') as f:
+            for result in pool.imap_unordered(play_match, pending):
+                f.write(json.dumps(result) + "\n")
+                f.flush()
+                results.append(result)
+                print(f"   {result['players'][0]} vs {result['players'][1]} -> {result['winner'] or 'nul'} "
+                      f"({result['turns']} tours, {result['duration_s']}s)")
+
+    def run(self) -> List[Dict]:
+        results = load_checkpoint(self.checkpoint)
+        semaphores, buckets = self._limits()
+        with self.ctx.Pool(self.processes, initializer=_init_worker,
+                           initargs=(self.configs, semaphores, buckets)) as pool:
+            if self.format == "swiss":
+                for round_index in range(self.rounds):
+                    previous = [r for r in results if r.get("round", 0) < round_index]
+                    matches = swiss_pairings(self.names, previous, round_index, self.seed, self.max_turns)
+                    self._play(pool, matches, results)
+            else:
+                matches = round_robin(self.names, self.games_per_pair, self.seed, self.max_turns)
+                self._play(pool, matches, results)
+        return rating_table(results, self.names, seed=self.seed)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tournoi de modèles sur le moteur Monopoly headless")
+    parser.add_argument("configs", help="Fichier JSON: liste de {name, type, model, base_url, max_concurrency, tokens_per_minute}")
+    parser.add_argument("--format", choices=["round_robin", "swiss"], default="round_robin")
+    parser.add_argument("--games-per-pair", type=int, default=2)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--max-turns", type=int, default=200)
+    parser.add_argument("--checkpoint", default="tournament_results.jsonl")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.configs, 'r', encoding='utf-8') as f:
+        configs = json.load(f)
+
+    tournament = Tournament(configs, args.checkpoint, args.processes, args.format,
+                            args.games_per_pair, args.rounds, args.max_turns, args.seed)
+    table = tournament.run()
+
+    print("\n🏆 Classement")
+    for rank, row in enumerate(table, 1):
+        print(f"{rank:>2}. {row['name']:<24} {row['rating']:7.1f}  "
+              f"[{row['ci_low']:.1f}, {row['ci_high']:.1f}]  {row['wins']}/{row['games']} victoires")
+
+
+if __name__ == "__main__":
+    main()
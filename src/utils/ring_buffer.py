@@ -0,0 +1,59 @@
+"""
+Historiques de taille fixe adossés à NumPy
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class RingBuffer:
+    """Historique (horodatage, valeur) de capacité fixe, stocké dans deux tableaux NumPy.
+
+    Seuls les changements de valeur sont enregistrés; une fois plein, les
+    entrées les plus anciennes sont écrasées, la mémoire reste donc constante.
+    """
+
+    def __init__(self, capacity: int = 512, dtype=np.int64):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros(capacity, dtype=dtype)
+        self._next = 0      # Prochain emplacement écrit
+        self._size = 0
+        self.total = 0      # Changements enregistrés depuis la création
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamp: float, value) -> bool:
+        """Ajoute la valeur si elle diffère de la dernière; retourne True si elle a été ajoutée"""
+        if self._size and self.values[self._next - 1] == value:
+            return False
+        self.times[self._next] = timestamp
+        self.values[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self.total += 1
+        return True
+
+    def last(self) -> Optional[Tuple[float, float]]:
+        if not self._size:
+            return None
+        return float(self.times[self._next - 1]), self.values[self._next - 1].item()
+
+    def _ordered(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Copies chronologiques des entrées valides"""
+        if self._size < self.capacity:
+            return self.times[:self._size].copy(), self.values[:self._size].copy()
+        order = np.roll(np.arange(self.capacity), -self._next)
+        return self.times[order], self.values[order]
+
+    def downsample(self, points: int = 10) -> List[Tuple[float, float]]:
+        """Au plus `points` entrées régulièrement espacées, la plus récente toujours incluse"""
+        times, values = self._ordered()
+        if len(values) > points > 0:
+            index = np.linspace(0, len(values) - 1, points).round().astype(np.int64)
+            times, values = times[index], values[index]
+        return [(float(t), v.item()) for t, v in zip(times, values)]
+
+    def nbytes(self) -> int:
+        return self.times.nbytes + self.values.nbytes
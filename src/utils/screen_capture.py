@@ -0,0 +1,94 @@
+import base64
+import io
+from typing import Optional, Tuple
+
+from mss import mss
+from PIL import Image
+
+try:
+    import pygetwindow as gw
+    import win32gui
+except ImportError:  # Hors Windows: capture du moniteur principal uniquement
+    gw = None
+    win32gui = None
+
+# Taille d'entrée du détecteur YOLO d'OmniParser
+DETECTOR_INPUT_SIZE = 640
+
+
+class CapturedFrame:
+    """Image capturée en mémoire avec de quoi revenir aux coordonnées écran"""
+
+    def __init__(self, data: bytes, image_format: str, size: Tuple[int, int],
+                 offset: Tuple[int, int], scale: float):
+        self.data = data
+        self.format = image_format
+        self.size = size        # Taille de l'image envoyée (après réduction)
+        self.offset = offset    # Coin supérieur gauche de la zone capturée, en pixels écran
+        self.scale = scale      # Facteur appliqué: pixels image = pixels écran * scale
+
+    def base64(self) -> str:
+        return base64.b64encode(self.data).decode()
+
+    def to_screen(self, x: float, y: float) -> Tuple[int, int]:
+        """Convertit un point de l'image envoyée en coordonnées écran"""
+        return (int(self.offset[0] + x / self.scale),
+                int(self.offset[1] + y / self.scale))
+
+
+class ScreenCapture:
+    """Capture la zone cliente de Dolphin et la réduit
+    à la taille d'entrée du détecteur, encodée en mémoire sans passer par le disque."""
+
+    def __init__(self, max_side: int = DETECTOR_INPUT_SIZE, image_format: str = "JPEG",
+                 jpeg_quality: int = 85, window_title: str = "Dolphin"):
+        self.max_side = max_side
+        self.image_format = image_format
+        self.jpeg_quality = jpeg_quality
+        self.window_title = window_title
+        self.sct = mss()
+
+    def find_client_area(self) -> Optional[Tuple[int, int, int, int]]:
+        """Retourne (left, top, width, height) de la zone cliente de Dolphin"""
+        if gw is None:
+            return None
+        try:
+            windows = [w for w in gw.getWindowsWithTitle(self.window_title) if w.width > 0 and w.height > 0]
+            if not windows:
+                return None
+            # Priorité à la fenêtre du jeu plutôt qu'à la fenêtre principale de Dolphin
+            window = next((w for w in windows if "monopoly" in w.title.lower()), windows[0])
+            hwnd = window._hWnd
+            _, _, width, height = win32gui.GetClientRect(hwnd)
+            left, top = win32gui.ClientToScreen(hwnd, (0, 0))
+            if width > 0 and height > 0:
+                return left, top, width, height
+            return window.left, window.top, window.width, window.height
+        except Exception as e:
+            print(f"⚠️  Zone cliente Dolphin introuvable: {e}")
+            return None
+
+    def capture(self, area: Optional[Tuple[int, int, int, int]] = None) -> CapturedFrame:
+        """Capture la zone de jeu (zone cliente de Dolphin, ou `area` si fournie)"""
+        if area is None:
+            area = self.find_client_area()
+        if area is None:
+            monitor = self.sct.monitors[1]
+            area = (monitor["left"], monitor["top"], monitor["width"], monitor["height"])
+
+        left, top, width, height = area
+
+        shot = self.sct.grab({"left": left, "top": top, "width": width, "height": height})
+        img = Image.frombytes("RGB", shot.size, shot.bgra, "raw", "BGRX")
+
+        scale = min(1.0, self.max_side / max(img.size))
+        if scale < 1.0:
+            img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.BILINEAR)
+
+        buffered = io.BytesIO()
+        if self.image_format.upper() == "JPEG":
+            img.save(buffered, format="JPEG", quality=self.jpeg_quality)
+        else:
+            img.save(buffered, format=self.image_format)
+
+        return CapturedFrame(buffered.getvalue(), self.image_format.upper(), img.size, (left, top), scale)
@@ -13,6 +13,7 @@ import json
 import urllib.request
 import urllib.error
 from PIL import Image
+from src.utils.screen_capture import ScreenCapture, CapturedFrame
 
 # ---------------- WINDOW SELECTION ---------------- #
 def get_dolphin_game_window():
@@ -109,89 +110,45 @@ KEYWORDS = {
     },
 }
 # --------- SCREENSHOT UTILITY --------- #
-# Retourne désormais un tuple (chemin_image, bbox_fenetre)
+# Retourne un tuple (frame, bbox_fenetre)
 # bbox_fenetre = (left, top, width, height)
-def capture_dolphin_screenshot(prefix: str = "popup"):
-    """
-    Capture un screenshot de la fenêtre Dolphin et le sauvegarde dans un
-    sous-dossier «captures». Si la fenêtre Dolphin n'est pas détectée, capture
-    tout l'écran.
+screen_capture = ScreenCapture()
+
 
-    Parameters
-    ----------
-    prefix : str
-        Préfixe du nom de fichier (ex : "popup", "debug"…)
+def capture_dolphin_screenshot():
+    """
+    Capture la zone cliente de la fenêtre Dolphin en mémoire, réduite à la
+    taille d'entrée du détecteur. Si la fenêtre Dolphin n'est pas détectée,
+    capture tout l'écran.
 
     Returns
     -------
-    Path
-        Chemin complet vers l'image PNG générée.
+    tuple
+        (CapturedFrame, bbox de la zone capturée)
     """
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    out_dir = Path(__file__).parent / "captures"
-    out_dir.mkdir(exist_ok=True)
-    out_path = out_dir / f"{prefix}_{timestamp}.png"
-
-    # Initialise la bbox (left, top, width, height) – sera définie plus tard
-    bbox = None
-
     try:
-        # Recherche de la fenêtre Dolphin jeu via helper
-        win = get_dolphin_game_window()
-        if win:
-            # S'assure que la fenêtre est bien visible/active
-            try:
-                # Clique dans le coin de la fenêtre pour récupérer le focus et éloigner le curseur avant la capture
-                focus_dolphin_window()
-            except Exception as e:
-                print(f"⚠️  focus_dolphin_window() a échoué : {e}")
-            bbox = (win.left, win.top, win.width, win.height)
-            # Utilise mss pour mieux supporter les fenêtres DirectX/OpenGL
-            try:
-                with mss.mss() as sct:
-                    monitor = {
-                        "left": bbox[0],
-                        "top": bbox[1],
-                        "width": bbox[2],
-                        "height": bbox[3],
-                    }
-                    img = sct.grab(monitor)
-                    mss.tools.to_png(img.rgb, img.size, output=str(out_path))
-                    print(f"📸 Screenshot sauvegardé → {out_path}")
-                    return out_path, bbox
-            except Exception as e:
-                print(f"⚠️  mss a échoué, fallback pyautogui: {e}")
-                screenshot = pyautogui.screenshot(region=bbox)
-        else:
-            # Fallback : capture plein écran
-            screenshot = pyautogui.screenshot()
+        # S'assure que la fenêtre est bien visible/active et éloigne le curseur avant la capture
+        focus_dolphin_window()
     except Exception as e:
-        print(f"⚠️  Impossible de cibler la fenêtre Dolphin : {e}")
-        screenshot = pyautogui.screenshot()
+        print(f"⚠️  focus_dolphin_window() a échoué : {e}")
 
-    screenshot.save(out_path)
-    print(f"📸 Screenshot sauvegardé → {out_path}")
-    if bbox is None:
-        bbox = (0, 0, screenshot.width, screenshot.height)
-    return out_path, bbox
+    frame = screen_capture.capture()
+    width = round(frame.size[0] / frame.scale)
+    height = round(frame.size[1] / frame.scale)
+    bbox = (frame.offset[0], frame.offset[1], width, height)
+    print(f"📸 Screenshot capturé en mémoire ({frame.size[0]}x{frame.size[1]}, {len(frame.data) // 1024} Ko)")
+    return frame, bbox
 
 # --------- PARSE SCREENSHOT VIA API --------- #
 # La fonction retourne désormais un dict {icon_name: (abs_x, abs_y)}
 PARSE_API_URL = "http://127.0.0.1:8000/parse/"
 
 
-def parse_and_display(image_path: Path, trigger: str, window_bbox=None):
+def parse_and_display(frame: CapturedFrame, trigger: str, window_bbox=None):
     """Envoie l'image à l'API /parse/ et affiche les infos extraites."""
     try:
-        if not image_path.exists():
-            print(f"❌ Image introuvable: {image_path}")
-            return
-
-        with Image.open(image_path) as img:
-            img_width, img_height = img.size
-
-        with image_path.open("rb") as f:
-            base64_image = base64.b64encode(f.read()).decode("utf-8")
+        img_width, img_height = frame.size
+        base64_image = frame.base64()
 
         payload = json.dumps({"base64_image": base64_image}).encode("utf-8")
         headers = {"Content-Type": "application/json", "Accept": "application/json"}
@@ -242,20 +199,18 @@ def parse_and_display(image_path: Path, trigger: str, window_bbox=None):
                     if len(bbox) == 4:
                         cx = (x1 + x2) // 2
                         cy = (y1 + y2) // 2
-                        if window_bbox is not None:
-                            abs_x = window_bbox[0] + cx
-                            abs_y = window_bbox[1] + cy
-                        else:
-                            abs_x, abs_y = cx, cy
+                        # Revient aux coordonnées écran (l'image envoyée est recadrée et réduite)
+                        abs_x, abs_y = frame.to_screen(cx, cy)
                         icon_key = element["content"].strip().lower()
                         icon_positions[icon_key] = (abs_x, abs_y)
 
         # Image parsée (overlay) si dispo
         base64_parsed = data.get("som_image_base64")
         if base64_parsed:
-            parsed_dir = image_path.parent / "parsed"
-            parsed_dir.mkdir(exist_ok=True)
-            parsed_path = parsed_dir / (image_path.stem + "_parsed.png")
+            parsed_dir = Path(__file__).parent / "captures" / "parsed"
+            parsed_dir.mkdir(parents=True, exist_ok=True)
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            parsed_path = parsed_dir / f"{trigger.replace(' ', '_')}_{timestamp}_parsed.png"
             with parsed_path.open("wb") as f_out:
                 f_out.write(base64.b64decode(base64_parsed))
             print(f"🖼️  Image annotée enregistrée: {parsed_path}")
@@ -332,8 +287,8 @@ while True:
                         print(f"    [DEBUG] Longueur bytes: {len(message_bytes)} | Longueur texte: {len(cleaned_text)}")
                     already_seen.add(key)
                     # Capture un screenshot et parse immédiatement
-                    img_path, win_bbox = capture_dolphin_screenshot(prefix="popup")
-                    icon_positions = parse_and_display(img_path, trigger, win_bbox)
+                    frame, win_bbox = capture_dolphin_screenshot()
+                    icon_positions = parse_and_display(frame, trigger, win_bbox)
 
                     if icon_positions:
                         print("📋 Options détectées: " + ", ".join(icon_positions.keys()))
@@ -0,0 +1,62 @@
+"""
+Tests du budget de temps du client HTTP partagé
+"""
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+from services.async_http_client import AsyncHttpClient
+
+
+@pytest.fixture
+def slow_upstream():
+    """Service amont qui répond 503 après 0,3 s, sur la boucle du client"""
+    client = AsyncHttpClient(backoff_base=0.01, backoff_max=0.05)
+    calls = []
+
+    async def handler(request):
+        calls.append(time.monotonic())
+        await asyncio.sleep(0.3)
+        return web.json_response({'error': 'busy'}, status=503)
+
+    async def start():
+        app = web.Application()
+        app.router.add_post('/parse/', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        return runner, site._server.sockets[0].getsockname()[1]
+
+    runner, port = client.run(start())
+    yield client, f"http://127.0.0.1:{port}/parse/", calls
+    client.run(runner.cleanup())
+    client.close()
+
+
+def test_retries_stay_within_request_timeout(slow_upstream):
+    client, url, calls = slow_upstream
+
+    started = time.monotonic()
+    try:
+        # Dernière réponse 503, ou timeout si le budget expire pendant une tentative
+        assert client.run(client.post_json(url, {}, timeout=1.0, retries=10)).status_code == 503
+    except TimeoutError:
+        pass
+    assert time.monotonic() - started < 1.3
+    assert 2 <= len(calls) <= 4  # Retenté, mais pas 11 fois
+
+
+def test_run_timeout_bounds_every_request_of_the_coroutine(slow_upstream):
+    client, url, _ = slow_upstream
+
+    async def two_calls():
+        await client.post_json(url, {}, retries=10)
+        return await client.post_json(url, {}, retries=10)
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        client.run(two_calls(), timeout=0.5)
+    assert time.monotonic() - started < 0.8
@@ -0,0 +1,59 @@
+"""
+Tests du cache des décisions IA
+"""
+import time
+
+from services.decision_cache import DecisionCache
+
+CONTEXT = {
+    'global': {'current_turn': 12},
+    'players': {'player1': {'money': 1510, 'position': 5}, 'player2': {'money': 900, 'position': 24}}
+}
+
+
+def test_close_states_share_a_key_but_models_do_not():
+    cache = DecisionCache()
+    richer = {**CONTEXT, 'players': {**CONTEXT['players'], 'player1': {'money': 1540, 'position': 5}}}
+
+    key = cache.make_key("gpt-4o-mini", "property_purchase", ["buy", "Auction "], CONTEXT)
+
+    assert cache.make_key("gpt-4o-mini", "property_purchase", ["auction", "buy"], richer) == key
+    assert cache.make_key("claude", "property_purchase", ["auction", "buy"], CONTEXT) != key
+    moved = {**CONTEXT, 'players': {**CONTEXT['players'], 'player1': {'money': 1510, 'position': 6}}}
+    assert cache.make_key("gpt-4o-mini", "property_purchase", ["auction", "buy"], moved) != key
+
+
+def test_entries_expire_after_ttl():
+    cache = DecisionCache(ttl=0.05)
+    cache.put("k", {'decision': 'buy'}, latency_ms=800)
+
+    assert cache.get("k") == {'decision': 'buy'}
+    time.sleep(0.1)
+    assert cache.get("k") is None
+
+    stats = cache.get_stats()
+    assert stats['hits'] == 1 and stats['expired'] == 1
+    assert stats['latency_saved_ms'] == 800
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = DecisionCache(max_entries=2)
+    cache.put("a", {'decision': 'a'}, 1)
+    cache.put("b", {'decision': 'b'}, 1)
+    cache.get("a")
+    cache.put("c", {'decision': 'c'}, 1)
+
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_trading_decisions_are_not_cached_and_clear_is_per_model():
+    cache = DecisionCache()
+    cache.put("gpt:1", {'decision': 'buy'}, 1)
+    cache.put("claude:1", {'decision': 'buy'}, 1)
+
+    assert not cache.is_enabled("trading_confirm")
+    assert cache.is_enabled("property_purchase")
+    cache.clear("gpt")
+    assert cache.get("gpt:1") is None and cache.get("claude:1") is not None
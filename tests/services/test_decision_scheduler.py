@@ -0,0 +1,103 @@
+"""
+Tests de l'ordonnanceur de décisions par joueur
+"""
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from services.decision_scheduler import DecisionScheduler
+from services.tracing import correlation, get_correlation_id
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = DecisionScheduler(max_workers=4)
+    yield scheduler
+    scheduler.close()
+
+
+def test_same_player_in_order_other_players_in_parallel(scheduler):
+    order, started = [], {}
+    gate = threading.Event()
+
+    def decide(job, label, hold):
+        started[label] = time.monotonic()
+        if hold:
+            gate.wait(2)
+        order.append(label)
+        return label
+
+    first = scheduler.submit("player1", "a", decide, "p1-a", True)
+    second = scheduler.submit("player1", "b", decide, "p1-b", False)
+    other = scheduler.submit("player2", "c", decide, "p2-c", False)
+
+    # player2 n'attend pas la décision bloquée de player1
+    assert other.result(1) == "p2-c"
+    assert not second.done()
+    gate.set()
+    assert [first.result(1), second.result(1)] == ["p1-a", "p1-b"]
+    assert order.index("p1-a") < order.index("p1-b")
+
+
+def test_cancelled_job_is_dropped_and_player_moves_on(scheduler):
+    gate = threading.Event()
+    seen = []
+
+    def decide(job, label):
+        if label == "stuck":
+            gate.wait(2)
+        seen.append((label, job.cancelled))
+        return label
+
+    stuck = scheduler.submit("player1", "stuck", decide, "stuck")
+    queued = scheduler.submit("player1", "queued", decide, "queued")
+    following = scheduler.submit("player1", "following", decide, "following")
+    time.sleep(0.1)
+
+    assert scheduler.cancel("stuck") and scheduler.cancel("queued")
+    assert following.result(1) == "following"  # Sans attendre la fin de l'appel abandonné
+    with pytest.raises(CancelledError):
+        stuck.result(0)
+    assert not scheduler.cancel("queued")
+    gate.set()
+    time.sleep(0.1)
+    assert ("queued", False) not in seen and ("queued", True) not in seen
+    assert ("stuck", True) in seen
+    assert scheduler.get_stats()['abandoned_running'] == 1
+
+
+def test_duplicate_job_id_and_correlation_are_kept(scheduler):
+    gate = threading.Event()
+
+    def decide(job):
+        gate.wait(2)
+        return get_correlation_id()
+
+    with correlation("popup-42"):
+        future = scheduler.submit("player1", "popup-42", decide)
+    assert scheduler.submit("player1", "popup-42", decide) is future
+    assert scheduler.pending("player1") == 1
+
+    gate.set()
+    assert future.result(1) == "popup-42"
+
+
+def test_full_queue_rejects_new_decisions():
+    scheduler = DecisionScheduler(max_workers=2, max_queue_per_player=1)
+    gate = threading.Event()
+    try:
+        running = scheduler.submit("player1", "running", lambda job: gate.wait(2))
+        time.sleep(0.1)
+        queued = scheduler.submit("player1", "queued", lambda job: "queued")
+        rejected = scheduler.submit("player1", "rejected", lambda job: "rejected")
+
+        with pytest.raises(RuntimeError):
+            rejected.result(1)
+        gate.set()
+        assert running.result(1) is True
+        assert queued.result(1) == "queued"
+        assert scheduler.get_stats()['rejected'] == 1
+    finally:
+        scheduler.close()
@@ -0,0 +1,41 @@
+"""
+Tests du stockage des captures adressé par contenu
+"""
+import base64
+
+from services.frame_store import FrameStore
+
+
+def test_same_frame_is_stored_once(tmp_path):
+    store = FrameStore(spill_dir=str(tmp_path))
+
+    key = store.put(b"frame-a")
+
+    assert store.put_base64(base64.b64encode(b"frame-a").decode()) == key
+    assert store.get(key) == b"frame-a"
+    stats = store.get_stats()
+    assert stats['memory_frames'] == 1 and stats['dedup_hits'] == 1
+
+
+def test_evicted_frames_spill_to_disk_and_reload(tmp_path):
+    store = FrameStore(max_memory_bytes=10, spill_dir=str(tmp_path))
+
+    old = store.put(b"0123456789")
+    new = store.put(b"abcdefghij")
+
+    assert store.get_stats()['memory_frames'] == 1
+    assert store.get(old) == b"0123456789"  # Relue depuis le disque
+    assert store.get(new) == b"abcdefghij"
+    assert store.get_stats()['disk_hits'] == 1
+    assert store.put(b"0123456789") == old  # Déjà sur disque: pas de nouvelle copie
+    assert store.get_stats()['memory_frames'] == 1
+
+
+def test_disk_is_trimmed_under_its_limit(tmp_path):
+    store = FrameStore(max_memory_bytes=1, spill_dir=str(tmp_path), max_disk_bytes=25)
+
+    keys = [store.put(bytes([i]) * 10) for i in range(5)]
+
+    assert store.get_stats()['disk_bytes'] <= 25
+    assert store.get(keys[-1]) is not None
+    assert store.get("0" * 64) is None
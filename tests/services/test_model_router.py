@@ -0,0 +1,128 @@
+"""
+Tests du routeur de modèles: routage par joueur, couverture et annulation
+"""
+import asyncio
+import json
+import queue
+
+from services.ai_service import AIService
+from services.async_http_client import HttpResponse
+from services.decision_scheduler import current_player_slot, player_slot
+from services.event_bus import EventBus, EventTypes
+from services.model_router import ModelRouter
+
+
+class FakeHttp:
+    """Endpoints simulés: latence et contenu par base_url, annulations enregistrées"""
+
+    def __init__(self, delays, contents=None):
+        self.delays = delays
+        self.contents = contents or {}
+        self.calls, self.cancelled = [], []
+
+    async def post_json(self, url, payload, **kwargs):
+        base_url = url.rsplit('/chat/completions', 1)[0]
+        self.calls.append(base_url)
+        try:
+            await asyncio.sleep(self.delays[base_url])
+        except asyncio.CancelledError:
+            self.cancelled.append(base_url)
+            raise
+        content = self.contents.get(base_url, f"buy|from {base_url}")
+        return HttpResponse(200, {'choices': [{'message': {'content': content}}]}, {}, self.delays[base_url])
+
+    def run(self, coro, timeout=None):
+        return asyncio.run(coro)
+
+
+def router(http, hedge_after_ms=20):
+    return ModelRouter({
+        "endpoints": {"slow": {"model": "big", "base_url": "http://slow"},
+                      "fast": {"model": "small", "base_url": "http://fast"}},
+        "players": {"player1": {"primary": "slow", "hedge": "fast"},
+                    "player2": {"primary": "fast"}},
+        "default": {"primary": "fast"},
+        "hedge": {"default_after_ms": hedge_after_ms}
+    }, http)
+
+
+def complete(model_router, player, validate=None):
+    return asyncio.run(model_router.complete_async(player, [{"role": "user", "content": "?"}], validate))
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    http = FakeHttp({"http://slow": 1.0, "http://fast": 0.01})
+    model_router = router(http)
+
+    response, routing = complete(model_router, "player1")
+
+    assert routing == {'player': 'player1', 'endpoint': 'fast', 'model': 'small', 'hedged': True}
+    assert ModelRouter.content_of(response) == "buy|from http://fast"
+    assert http.cancelled == ["http://slow"]
+    assert model_router.stats['hedge_wins'] == 1
+
+
+def test_fast_primary_is_not_hedged():
+    http = FakeHttp({"http://slow": 0.001, "http://fast": 0.001})
+
+    _, routing = complete(router(http, hedge_after_ms=500), "player1")
+
+    assert routing['endpoint'] == 'slow' and not routing['hedged']
+    assert http.calls == ["http://slow"]
+
+
+def test_invalid_primary_answer_falls_back_to_hedge():
+    http = FakeHttp({"http://slow": 0.001, "http://fast": 0.001}, {"http://slow": "???"})
+
+    _, routing = complete(router(http, hedge_after_ms=500), "player1", validate=lambda c: '|' in c)
+
+    assert routing['endpoint'] == 'fast' and routing['hedged']
+
+
+def test_players_are_routed_by_turn_order_slot():
+    model_router = router(FakeHttp({}))
+
+    assert player_slot(0) == "player1"
+    assert current_player_slot(["Alice", "Bob"], "Bob") == "player2"
+    assert current_player_slot(["Alice", "Bob"], "Carol") is None
+    assert model_router.route("player1")[0].name == "slow"
+    assert model_router.route(None)[0].name == "fast"
+
+
+def test_ai_service_keeps_explicit_model_over_router_config(tmp_path, monkeypatch):
+    config = tmp_path / "model_router.json"
+    config.write_text(json.dumps({"endpoints": {"mini": {"model": "gpt-4o-mini"}}}))
+    monkeypatch.setenv("MODEL_ROUTER_CONFIG", str(config))
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+    assert AIService().router is not None
+    explicit = AIService(model="llama3", base_url="http://localhost:11434/v1")
+    assert explicit.router is None and explicit.model == "llama3"
+
+    context = {"global": {"current_player": "Bob"}, "players": {"Alice": {}, "Bob": {}}}
+    assert AIService._player_slot(context) == "player2"
+
+
+def test_off_turn_popup_is_answered_by_its_owner_model(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    http = FakeHttp({"http://slow": 0, "http://fast": 0}, {"http://slow": "auction|p1", "http://fast": "buy|p2"})
+    bus = EventBus()
+    made = queue.Queue()
+    bus.subscribe(EventTypes.AI_DECISION_MADE, lambda event: made.put(event['data']))
+    service = AIService(event_bus=bus, router=router(http))
+    # Alice (player1) joue, mais l'enchère est adressée à Bob (player2)
+    data = {
+        'popup_id': 'bid-1', 'popup_text': 'Do you want to bid?', 'popup_type': 'auction_bid',
+        'options': [{'name': 'buy'}, {'name': 'auction'}], 'player': 'player2',
+        'game_context': {'global': {'current_player': 'Alice'}, 'players': {'Alice': {}, 'Bob': {}}}
+    }
+
+    bus.publish(EventTypes.AI_DECISION_REQUESTED, data)
+
+    assert made.get(timeout=5)['decision'] == 'buy'
+    assert http.calls == ["http://fast"]
+    cache_key = lambda model: service.decision_cache.make_key(model, "auction_bid", ["buy", "auction"],
+                                                              data['game_context'])
+    assert service.decision_cache.get(cache_key("fast")) is not None
+    assert service.decision_cache.get(cache_key("slow")) is None
+    service.scheduler.close()
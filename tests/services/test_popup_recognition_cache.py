@@ -0,0 +1,70 @@
+import io
+
+from PIL import Image, ImageDraw
+
+from services.popup_recognition_cache import PopupRecognitionCache
+
+
+def render_popup(text: str, noise: int = 0):
+    """Même plateau, même boîte de dialogue, seul le texte change; retourne (png, parsed_content)"""
+    img = Image.new('RGB', (320, 240), (30, 110, 60))
+    draw = ImageDraw.Draw(img)
+    for i in range(0, 320, 40):
+        draw.rectangle([i, 0, i + 20, 240], fill=(200, 180, 40))
+    draw.rectangle([60, 60, 260, 180], fill=(240, 240, 240), outline=(0, 0, 0))
+    draw.text((80, 90), text, fill=(0, 0, 0))
+    bbox = list(draw.textbbox((80, 90), text))
+    if noise:
+        draw.point([(5, 5), (300, 220)], fill=(noise, noise, noise))
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue(), [{'type': 'text', 'content': text, 'bbox': bbox}]
+
+
+def test_same_popup_is_recognised():
+    cache = PopupRecognitionCache()
+    frame, content = render_popup("Do you want to buy Mayfair?")
+    cache.store(cache.perceptual_hash(frame), content, frame)
+
+    again, _ = render_popup("Do you want to buy Mayfair?", noise=255)
+    assert cache.lookup(cache.perceptual_hash(again), again) == content
+
+
+def test_different_popups_over_the_same_board_do_not_match():
+    cache = PopupRecognitionCache()
+    buy, buy_content = render_popup("Do you want to buy Mayfair?")
+    jail, jail_content = render_popup("You are in Jail. Pay bail?")
+
+    # Même gabarit: le dHash seul ne distingue pas les deux popups
+    assert cache.distance(cache.perceptual_hash(buy), cache.perceptual_hash(jail)) <= cache.threshold
+
+    cache.store(cache.perceptual_hash(buy), buy_content, buy)
+    assert cache.lookup(cache.perceptual_hash(jail), jail) is None
+    assert cache.get_stats()['text_mismatches'] == 1
+
+    # Les deux entrées coexistent et chacune retrouve son popup
+    cache.store(cache.perceptual_hash(jail), jail_content, jail)
+    assert cache.lookup(cache.perceptual_hash(buy), buy) == buy_content
+    assert cache.lookup(cache.perceptual_hash(jail), jail) == jail_content
+
+
+def test_invalidate_only_drops_the_matching_popup():
+    cache = PopupRecognitionCache()
+    buy, buy_content = render_popup("Do you want to buy Mayfair?")
+    jail, jail_content = render_popup("You are in Jail. Pay bail?")
+    cache.store(cache.perceptual_hash(buy), buy_content, buy)
+    cache.store(cache.perceptual_hash(jail), jail_content, jail)
+
+    cache.invalidate(cache.perceptual_hash(buy), buy)
+    assert cache.lookup(cache.perceptual_hash(buy), buy) is None
+    assert cache.lookup(cache.perceptual_hash(jail), jail) == jail_content
+
+
+def test_lru_eviction():
+    cache = PopupRecognitionCache(max_entries=1)
+    buy, buy_content = render_popup("Do you want to buy Mayfair?")
+    jail, jail_content = render_popup("You are in Jail. Pay bail?")
+    cache.store(cache.perceptual_hash(buy), buy_content, buy)
+    cache.store(cache.perceptual_hash(jail), jail_content, jail)
+    assert cache.get_stats()['entries'] == 1
+    assert cache.lookup(cache.perceptual_hash(buy), buy) is None
@@ -0,0 +1,79 @@
+"""
+Tests du registre borné des popups actifs
+"""
+import math
+import random
+import time
+
+from services.popup_registry import PopupRegistry
+
+
+def test_oldest_popup_is_evicted_when_full():
+    removed = []
+    registry = PopupRegistry(max_size=2, on_remove=lambda popup_id, popup: removed.append(popup_id))
+
+    for popup_id in ("a", "b", "c"):
+        registry.add(popup_id, {'status': 'detected', 'popup_type': 'turn_options'})
+
+    assert "a" not in registry and len(registry) == 2
+    assert removed == ["a"]
+    stats = registry.get_stats()
+    assert stats['evicted'] == 1
+    assert stats['by_status'] == {'detected': 2}
+
+
+def test_popups_expire_after_their_ttl():
+    registry = PopupRegistry(ttl=0.1, tick=0.02)
+
+    registry.add("short", {'status': 'detected'})
+    registry.add("long", {'status': 'detected'}, ttl=5)
+    time.sleep(0.3)
+
+    assert "short" not in registry and "long" in registry
+    assert registry.get_stats()['expired'] == 1
+
+
+def test_expire_reschedules_and_update_keeps_counters():
+    registry = PopupRegistry(ttl=0.05, tick=0.02)
+
+    registry.add("p", {'status': 'detected', 'popup_type': 'jail_decision',
+                       'detected_at': '2026-01-01T00:00:00'})
+    registry.expire("p", 5)
+    registry.update("p", status='executed', executed_at='2026-01-01T00:00:02')
+    time.sleep(0.2)
+
+    stats = registry.get_stats()
+    assert "p" in registry
+    assert stats['by_status'] == {'executed': 1}
+    assert stats['by_type'] == {'jail_decision': 1}
+    assert stats['average_response_time'] == 2.0
+
+
+def test_deadline_late_in_a_tick_expires_within_one_tick():
+    tick = 0.1
+    registry = PopupRegistry(tick=tick, wheel_size=32)
+    registry.add("warmup", {'status': 'detected'}, ttl=60)  # Démarre la roue
+
+    # Échéance à 90 % d'un tick, traité juste avant qu'elle ne soit atteinte
+    boundary = math.ceil(time.monotonic() / tick) * tick
+    time.sleep(boundary + 0.005 - time.monotonic())
+    registry.add("late", {'status': 'detected'}, ttl=0.085)
+    deadline = time.monotonic() + 0.085
+
+    while "late" in registry and time.monotonic() < deadline + 5:
+        time.sleep(0.005)
+    assert "late" not in registry
+    assert time.monotonic() - deadline < tick + 0.05
+
+
+def test_random_ttls_all_expire_on_time():
+    tick = 0.05
+    registry = PopupRegistry(tick=tick, wheel_size=32)
+    ttls = [random.uniform(0.05, 0.5) for _ in range(40)]
+    for index, ttl in enumerate(ttls):
+        registry.add(str(index), {'status': 'detected'}, ttl=ttl)
+
+    time.sleep(max(ttls) + 2 * tick + 0.05)
+
+    assert len(registry) == 0
+    assert registry.get_stats()['expired'] == 40
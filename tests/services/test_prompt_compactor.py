@@ -0,0 +1,82 @@
+"""
+Tests de la compaction des prompts de décision
+"""
+import json
+
+from services.prompt_compactor import STATE_SCHEMA, PromptCompactor, count_tokens
+
+CONTEXT = {
+    'global': {'current_turn': 7, 'current_player': 'Alice', 'properties': []},
+    'players': {
+        'Alice': {'money': 1200, 'position': 34, 'properties': [1], 'dice_result': [3, 2]},
+        'Bob': {'money': 800, 'position': 10, 'properties': [37, 39, 5]},
+    }
+}
+
+
+def test_contexte_is_reduced_to_the_fixed_schema():
+    state = PromptCompactor().compact_state(CONTEXT)
+
+    assert state['schema'] == STATE_SCHEMA
+    assert state['current'] == 'Alice' and state['dice'] == [3, 2]
+    bob = next(p for p in state['players'] if p['name'] == 'Bob')
+    assert bob['groups'] == {'dark_blue': '2/2', 'station': '1/4'}
+    # Mayfair (5 cases plus loin) et Park Lane sont à portée du prochain lancer
+    assert {threat['sq'] for threat in state['threats']} >= {37, 39}
+    assert all(threat['owner'] == 'Bob' for threat in state['threats'])
+
+
+def test_monitor_context_and_compact_state_give_the_same_schema():
+    compactor = PromptCompactor()
+    monitor = {
+        'global_state': {'current_turn': 1, 'dice_values': [6, 6]},
+        'player_contexts': {
+            'player1': {'name': 'Alice', 'current_money': 1500, 'current_position': 0},
+            'player2': {'name': 'Bob', 'current_money': 1400, 'current_position': 3},
+        }
+    }
+
+    state = compactor.compact_state(monitor)
+
+    assert state['current'] == 'Bob' and state['dice'] == [6, 6]
+    assert compactor.compact_state(state) is state
+
+
+def test_state_is_trimmed_threats_first_within_its_budget():
+    full = PromptCompactor(token_budget=10000).format_state(CONTEXT)
+    budget = int((count_tokens(full[len("State: "):]) - 1) / 0.6)
+    compactor = PromptCompactor(token_budget=budget)
+
+    text = compactor.format_state(CONTEXT)
+    state = json.loads(text[len("State: "):])
+
+    assert count_tokens(text) < count_tokens(full)
+    assert len(state['threats']) < len(compactor.compact_state(CONTEXT)['threats'])
+    assert [p['money'] for p in state['players']] == [1200, 800]
+    assert state['players'][1]['groups']  # Les groupes ne sont retirés qu'après les menaces
+
+
+def test_only_clickable_elements_are_kept():
+    compactor = PromptCompactor(max_elements=2)
+    parsed = {'parsed_content_list': [
+        {'content': 'Do you want to buy Mayfair?', 'bbox': [0, 0, 1, 1]},
+        {'content': 'Buy', 'bbox': [0.1, 0.8, 0.2, 0.9]},
+        {'content': 'Auction', 'bbox': [0.3, 0.8, 0.4, 0.9]},
+        {'content': 'icon', 'interactivity': True, 'bbox': [0.5, 0.5, 0.6, 0.6]},
+    ]}
+
+    elements = compactor.compact_elements(parsed)
+
+    assert [e['text'] for e in elements] == ['Buy', 'Auction']
+    assert compactor.get_stats()['elements_dropped'] == 2
+
+
+def test_prefix_is_stable_per_decision_type():
+    compactor = PromptCompactor()
+
+    first = compactor.prefix('purchase', 'You play Monopoly.')
+    assert compactor.prefix('purchase', 'Another prompt') is first
+    report = compactor.record('purchase', first, 'State: {}', {'prompt_tokens': 120,
+                                                               'prompt_tokens_details': {'cached_tokens': 96}})
+    assert report['prefix_hash'] == compactor.prefix_hash('purchase')
+    assert compactor.get_stats()['provider_cached_tokens'] == 96
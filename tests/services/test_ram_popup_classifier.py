@@ -0,0 +1,65 @@
+"""
+Tests de la classification des popups à partir de la RAM
+"""
+from services.ram_popup_classifier import ButtonPositionStore, RamPopupClassifier
+
+
+def calibrated_classifier(tmp_path) -> RamPopupClassifier:
+    store = ButtonPositionStore(str(tmp_path / "popup_buttons.json"), min_samples=1)
+    store.record("property_purchase", [
+        {'name': 'auction', 'bbox': [100, 300, 200, 340]},
+        {'name': 'buy', 'bbox': [300, 300, 400, 340]},
+    ], (640, 480))
+    return RamPopupClassifier(store)
+
+
+def test_matching_text_is_classified_from_ram(tmp_path):
+    classifier = calibrated_classifier(tmp_path)
+
+    result = classifier.classify("Do you want to buy Mayfair?", ["want_to_buy_square"])
+
+    assert result['popup_type'] == "property_purchase"
+    assert [o['name'] for o in result['options']] == ["auction", "buy"]
+    assert result['options'][1]['bbox'] == [300, 300, 400, 340]
+
+
+def test_stale_ids_with_other_text_fall_back_to_screenshot(tmp_path):
+    classifier = calibrated_classifier(tmp_path)
+
+    # L'ID d'achat est resté en RAM alors que le popup affiché est celui du tour
+    result = classifier.classify("What would you like to do?", ["want_to_buy_square"])
+
+    assert result is None
+    assert classifier.get_stats()['unclear'] == 1
+
+
+def test_uncalibrated_popup_is_unclear(tmp_path):
+    classifier = RamPopupClassifier(ButtonPositionStore(str(tmp_path / "popup_buttons.json")))
+
+    assert classifier.classify("Do you want to buy Mayfair?", ["want_to_buy_square"]) is None
+
+
+def test_active_messages_follow_ram_listeners(tmp_path):
+    classifier = calibrated_classifier(tmp_path)
+    gone = []
+    classifier.on_message_gone(gone.append)
+
+    classifier._on_message_added("want_to_buy_square", "Do you want to buy %1?", 0x1000, None)
+    assert classifier.classify("do you want to buy Park Lane?")['popup_type'] == "property_purchase"
+
+    classifier._on_message_removed("want_to_buy_square", "", 0x1000)
+    assert classifier.active_message_ids == []
+    assert gone == ["want_to_buy_square"]
+
+
+def test_popup_owner_is_the_player_named_in_ram(tmp_path):
+    classifier = RamPopupClassifier(ButtonPositionStore(str(tmp_path / "popup_buttons.json")))
+    context = {'players': {'Alice': {}, 'Bob': {'current_player': True}}}
+
+    assert classifier.popup_owner(context) == "player2"
+
+    classifier._on_message_added("pay_rent", "Alice must pay £50 to Bob in rent", 0, None)
+    assert classifier.popup_owner(context) == "player1"
+
+    classifier._on_message_removed("pay_rent", "", 0)
+    assert classifier.popup_owner(context) == "player2"
@@ -0,0 +1,82 @@
+"""
+Tests du traçage par étapes et de la corrélation
+"""
+import json
+
+import pytest
+from flask import Flask
+
+from services.tracing import (CORRELATION_HEADER, LatencyHistogram, Tracer, bind_flask, correlation,
+                              correlation_headers, get_correlation_id)
+
+
+def test_spans_are_grouped_by_correlation_id(tmp_path):
+    tracer = Tracer("monitor", trace_dir=str(tmp_path))
+
+    with correlation("popup-1"):
+        with tracer.span("capture"):
+            pass
+        with tracer.span("llm") as attrs:
+            attrs['model'] = "gpt-4o-mini"
+    with correlation("popup-2"):
+        tracer.record("click", 0, 2_000_000)
+
+    trace = tracer.get_trace("popup-1")
+    assert [s['stage'] for s in trace] == ["capture", "llm"]
+    assert trace[0]['offset_ms'] == 0 and trace[1]['model'] == "gpt-4o-mini"
+    stats = tracer.get_stats()
+    assert stats['stages']['click']['count'] == 1
+    assert stats['models']['llm']['gpt-4o-mini']['count'] == 1
+    assert get_correlation_id() is None
+
+
+def test_failed_span_is_counted_and_reraised():
+    tracer = Tracer()
+
+    with pytest.raises(ValueError):
+        with tracer.span("omniparser"):
+            raise ValueError("boom")
+
+    assert tracer.get_stats()['errors'] == {"omniparser": 1}
+    assert tracer.spans[-1]['attrs']['error'] == "ValueError"
+
+
+def test_histogram_quantiles_read_bucket_bounds():
+    histogram = LatencyHistogram([10, 100, 1000])
+    for latency in [5] * 90 + [50] * 9 + [5000]:
+        histogram.observe(latency)
+
+    assert histogram.quantile(0.5) == 10
+    assert histogram.quantile(0.95) == 100
+    assert histogram.quantile(1.0) == 1000  # Au-delà de la dernière borne
+    assert LatencyHistogram().quantile(0.5) is None
+
+
+def test_chrome_trace_export(tmp_path):
+    tracer = Tracer("app", trace_dir=str(tmp_path))
+    with correlation("popup-1"):
+        tracer.record("detect", 1_000, 3_000, source="ram")
+
+    with open(tracer.export_chrome_trace()) as f:
+        events = json.load(f)['traceEvents']
+
+    span = events[-1]
+    assert span['name'] == "detect" and span['dur'] == 2
+    assert span['args'] == {'correlation_id': "popup-1", 'source': "ram"}
+
+
+def test_correlation_travels_through_http_headers():
+    assert correlation_headers({'a': 'b'}) == {'a': 'b'}
+    with correlation("popup-9"):
+        assert correlation_headers() == {CORRELATION_HEADER: "popup-9"}
+        assert correlation_headers({CORRELATION_HEADER: "other"}) == {CORRELATION_HEADER: "other"}
+
+    app = Flask(__name__)
+    bind_flask(app)
+    app.add_url_rule('/id', 'id', lambda: get_correlation_id() or '')
+    client = app.test_client()
+
+    response = client.get('/id', headers={CORRELATION_HEADER: "popup-9"})
+    assert response.get_data(as_text=True) == "popup-9"
+    assert response.headers[CORRELATION_HEADER] == "popup-9"
+    assert client.get('/id').headers[CORRELATION_HEADER]
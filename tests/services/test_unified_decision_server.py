@@ -0,0 +1,64 @@
+"""
+Tests du chemin spéculatif du serveur de décision unifié
+"""
+import base64
+import io
+import json
+
+import pytest
+from PIL import Image
+
+from services.async_http_client import HttpResponse
+from services.ram_popup_classifier import ButtonPositionStore
+from services.unified_decision_server import UnifiedDecisionServer
+
+
+def frame_base64(size=(640, 480)) -> str:
+    buffered = io.BytesIO()
+    Image.new('RGB', size, (30, 90, 40)).save(buffered, format='PNG')
+    return base64.b64encode(buffered.getvalue()).decode()
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = UnifiedDecisionServer()
+    server.button_positions = ButtonPositionStore(str(tmp_path / "popup_buttons.json"), min_samples=1)
+    server.button_positions.record("property_purchase", [
+        {'name': 'auction', 'bbox': [100, 300, 200, 340]},
+        {'name': 'buy', 'bbox': [300, 300, 400, 340]},
+    ], (640, 480))
+
+    async def answer(decision_type, prompt, player=None):
+        content = json.dumps({'action': 'buy', 'confidence': 90, 'reason': 'completes the set'})
+        body = {'choices': [{'message': {'content': content}}]}
+        return HttpResponse(200, body, {}, 0.01), {'model': 'test', 'endpoint': 'test', 'hedged': False}
+
+    server._call_llm_async = answer
+    return server
+
+
+def test_ram_ids_need_matching_popup_text(server):
+    ids = ['want_to_buy_square']
+
+    assert server._resolve_popup_type({'message_ids': ids, 'popup_text': 'Do you want to buy %1?'}) == 'property_purchase'
+    assert server._resolve_popup_type({'message_ids': ids, 'popup_text': 'What would you like to do?'}) is None
+    assert server._resolve_popup_type({'message_ids': ids}) is None
+
+
+def test_speculative_decision_returns_calibrated_click_point(server):
+    client = server.app.test_client()
+
+    response = client.post('/api/decision/unified', json={
+        'image': frame_base64(),
+        'context': {},
+        'type': 'popup',
+        'message_ids': ['want_to_buy_square'],
+        'popup_text': 'Do you want to buy %1?'
+    })
+
+    result = response.get_json()
+    assert response.status_code == 200
+    assert result['pipeline'] == 'speculative'
+    assert result['coordinates_from'] == 'calibration'
+    assert result['coordinates'] == [350, 320]
+    assert result['parsed_elements'] == {}
@@ -0,0 +1,93 @@
+"""
+Tests du moteur headless: paiements, liquidation et faillite
+"""
+import numpy as np
+
+from src.sim.agents import RandomAgent
+from src.sim.engine import HeadlessMonopoly
+
+PARK_LANE, MAYFAIR, OLD_KENT_ROAD = 37, 39, 1
+
+
+def engine_with(money, seed=0) -> HeadlessMonopoly:
+    engine = HeadlessMonopoly(1, [RandomAgent(1), RandomAgent(2)], seed=seed)
+    engine.money[0] = money
+    return engine
+
+
+def charge(engine, player, amount, creditor=None):
+    engine._charge(np.array([0]), np.array([player]), np.array([amount]),
+                   None if creditor is None else np.array([creditor]))
+
+
+def test_houses_are_sold_at_half_price_before_bankruptcy():
+    engine = engine_with([100, 1500])
+    engine.owner[0, [PARK_LANE, MAYFAIR]] = 0
+    engine.houses[0, [PARK_LANE, MAYFAIR]] = [2, 3]
+
+    charge(engine, 0, 300, creditor=1)
+
+    # 100 + 2 maisons à 100 = 300: Mayfair (3 maisons) d'abord, puis Park Lane
+    assert not engine.bankrupt[0, 0]
+    assert engine.money[0].tolist() == [0, 1800]
+    assert engine.houses[0, [PARK_LANE, MAYFAIR]].tolist() == [1, 2]
+    assert not engine.mortgaged[0].any()
+
+
+def test_properties_are_mortgaged_once_houses_are_gone():
+    engine = engine_with([50, 1500])
+    engine.owner[0, [OLD_KENT_ROAD, MAYFAIR]] = 0
+    engine.houses[0, MAYFAIR] = 1
+
+    charge(engine, 0, 170)
+
+    # 50 + maison (100) + Old Kent Road hypothéquée (30), Mayfair gardée
+    assert not engine.bankrupt[0, 0]
+    assert engine.houses[0, MAYFAIR] == 0
+    assert engine.mortgaged[0, OLD_KENT_ROAD] and not engine.mortgaged[0, MAYFAIR]
+    assert engine.money[0, 0] == 50 + 100 + 30 - 170
+
+
+def test_bankruptcy_only_after_everything_is_liquidated():
+    engine = engine_with([10, 1500])
+    engine.owner[0, OLD_KENT_ROAD] = 0
+
+    charge(engine, 0, 500, creditor=1)
+
+    assert engine.bankrupt[0, 0]
+    assert engine.owner[0, OLD_KENT_ROAD] == -1
+    assert not engine.mortgaged[0, OLD_KENT_ROAD]
+    assert engine.money[0, 1] == 1500 + 40  # Tout ce qui a pu être réuni va au créancier
+
+
+def test_mortgaged_property_collects_no_rent_and_is_lifted_later():
+    engine = engine_with([1500, 1500])
+    engine.owner[0, MAYFAIR] = 1
+    engine.mortgaged[0, MAYFAIR] = True
+    engine.position[0, 0] = MAYFAIR
+
+    engine._land(np.array([0]), np.array([0]), np.array([7]))
+    assert engine.money[0].tolist() == [1500, 1500]
+
+    engine._build(np.array([0]), np.array([1]))
+    assert not engine.mortgaged[0, MAYFAIR]
+    assert engine.money[0, 1] == 1500 - 220
+
+
+def test_net_worth_discounts_mortgages():
+    engine = engine_with([0, 0])
+    engine.owner[0, MAYFAIR] = 0
+    before = engine.net_worth()[0, 0]
+    engine.mortgaged[0, MAYFAIR] = True
+
+    assert before - engine.net_worth()[0, 0] == 200
+
+
+def test_full_games_finish_and_conserve_state():
+    engine = HeadlessMonopoly(64, [RandomAgent(1), RandomAgent(2), RandomAgent(3)], max_turns=50, seed=3)
+    results = engine.run()
+
+    assert engine.done.all()
+    assert (engine.money >= 0).all()
+    assert not (engine.mortgaged & (engine.owner < 0)).any()
+    assert ((results["winner"] >= 0) & (results["winner"] < 3)).all()
@@ -0,0 +1,49 @@
+"""
+Tests des probabilités d'arrêt (chaîne de Markov) et des loyers espérés
+"""
+import json
+
+import pytest
+
+from src.sim.board import BOARD_SIZE, GO_TO_JAIL_SQUARE
+from src.sim.markov import _resolve_landing, get_tables, solve_landing_probabilities
+
+
+@pytest.mark.parametrize("square", range(BOARD_SIZE))
+def test_card_and_jail_outcomes_sum_to_one(square):
+    assert sum(_resolve_landing(square).values()) == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("jail_policy", ["roll", "pay"])
+def test_landings_per_turn_are_bounded_by_rolls_per_turn(jail_policy):
+    landing = solve_landing_probabilities(jail_policy)
+
+    assert len(landing) == BOARD_SIZE
+    assert min(landing) >= -1e-12
+    assert landing[GO_TO_JAIL_SQUARE] == pytest.approx(0.0, abs=1e-12)
+    # Au moins un arrêt par tour hors prison, au plus un lancer de plus par double
+    assert 1.0 <= sum(landing) <= 1 + 1 / 6 + 1 / 36
+    shares = [value / sum(landing) for value in landing]
+    assert sum(shares) == pytest.approx(1.0)
+    assert max(range(BOARD_SIZE), key=lambda square: landing[square]) == 24  # Trafalgar Square
+
+
+def test_paying_bail_means_more_landings_than_waiting():
+    assert sum(solve_landing_probabilities("pay")) > sum(solve_landing_probabilities("roll"))
+
+
+def test_tables_are_cached_on_disk_and_rents_follow_rules(tmp_path):
+    cache_file = tmp_path / "markov_tables.json"
+
+    tables = get_tables("roll", properties=[], cache_file=str(cache_file))
+    cached = json.loads(cache_file.read_text())
+    assert list(cached.values()) == [tables.landing]
+
+    tables = get_tables("roll", cache_file=str(cache_file))
+    assert tables.rent_due(1, *tables.development_level(1, [1, 3])) == 4  # Groupe complet: loyer nu doublé
+    assert tables.rent_due(5, *tables.development_level(5, [5, 15])) == 50  # Deux gares
+    assert tables.rent_due(12, 0, dice_total=8) == 32  # Compagnie: 4 x dés
+    assert tables.expected_rent_per_turn(39, 5) == pytest.approx(2000 * tables.landing[39])
+
+    with pytest.raises(ValueError):
+        get_tables("bribe", cache_file=str(cache_file))
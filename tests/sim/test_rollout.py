@@ -0,0 +1,43 @@
+"""
+Tests de l'évaluation Monte Carlo des décisions
+"""
+from src.sim.rollout import RolloutEvaluator, format_hint
+
+
+def mayfair_context():
+    """A possède Park Lane et tombe sur Mayfair avec 1200; B a 1500 et gagnerait l'enchère"""
+    return {
+        "global": {"current_player": "A", "pending_property": {"id": 39, "name": "Mayfair", "price": 400}},
+        "players": {
+            "A": {"money": 1200, "position": 39, "properties": [37], "current_player": True},
+            "B": {"money": 1500, "position": 0, "properties": []}
+        }
+    }
+
+
+def test_completing_a_monopoly_scores_higher_than_auctioning():
+    evaluator = RolloutEvaluator(n_rollouts=512, horizon_turns=30, time_budget_ms=60000, seed=0)
+
+    evaluation = evaluator.evaluate(mayfair_context(), "property_purchase", ["buy", "auction"])
+
+    buy, auction = evaluation["options"]["buy"], evaluation["options"]["auction"]
+    assert evaluation["best"] == "buy"
+    assert buy["mean"] > auction["mean"]
+    assert buy["win_rate"] > auction["win_rate"]
+    assert buy["rollouts"] == auction["rollouts"] == 512
+
+
+def test_unsupported_popups_are_not_simulated():
+    evaluator = RolloutEvaluator(seed=0)
+
+    assert evaluator.evaluate(mayfair_context(), "turn_options", ["roll again", "next turn"]) is None
+    assert evaluator.evaluate(mayfair_context(), "property_purchase", ["buy"]) is None
+
+
+def test_time_budget_plays_at_least_one_batch():
+    evaluator = RolloutEvaluator(n_rollouts=4096, batch=32, horizon_turns=5, time_budget_ms=0, seed=0)
+
+    evaluation = evaluator.evaluate(mayfair_context(), "property_purchase", ["buy", "auction"])
+
+    assert evaluation["options"]["buy"]["rollouts"] == 32
+    assert "de victoires" in format_hint(evaluation)
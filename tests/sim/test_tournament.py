@@ -0,0 +1,107 @@
+"""
+Tests du tournoi: classements, appariements suisses et reprise sur checkpoint
+"""
+import json
+
+import pytest
+
+from src.sim import tournament
+from src.sim.tournament import Tournament, elo_ratings, load_checkpoint, rating_table, swiss_pairings
+
+
+def result(a, b, winner, match_id=None, round_index=0):
+    return {"match_id": match_id or f"{a}:{b}", "round": round_index, "players": [a, b], "winner": winner,
+            "net_worth": [0, 0], "turns": 1, "duration_s": 0}
+
+
+def test_elo_is_zero_sum_and_rewards_the_winner():
+    ratings = elo_ratings([result("a", "b", "a"), result("a", "c", None)], ["a", "b", "c"])
+
+    assert ratings["a"] > 1500 > ratings["b"]
+    assert ratings["c"] > 1500  # Nul contre un joueur mieux classé
+    assert sum(ratings.values()) == pytest.approx(3 * 1500)
+
+
+def test_rating_table_ranks_with_bootstrap_interval(monkeypatch):
+    monkeypatch.setattr(tournament, "trueskill", None)
+    results = [result("strong", "weak", "strong", match_id=str(i)) for i in range(9)]
+    results.append(result("strong", "weak", "weak", match_id="upset"))
+
+    table = rating_table(results, ["weak", "strong"], bootstrap=200)
+
+    assert [row["name"] for row in table] == ["strong", "weak"]
+    strong = table[0]
+    assert strong["ci_low"] <= strong["rating"] <= strong["ci_high"]
+    assert (strong["wins"], strong["games"], strong["rating_system"]) == (9, 10, "elo")
+    assert rating_table([], ["a"])[0]["rating"] == 1500
+
+
+def test_swiss_pairs_by_score_without_rematches():
+    names = ["a", "b", "c", "d"]
+    first = [result("a", "b", "a"), result("c", "d", "c")]
+
+    matches = swiss_pairings(names, first, round_index=1)
+
+    pairs = {frozenset(m["players"]) for m in matches}
+    assert pairs == {frozenset(("a", "c")), frozenset(("b", "d"))}  # Vainqueurs entre eux
+    assert all(m["round"] == 1 for m in matches)
+    assert len({m["match_id"] for m in matches}) == 2
+
+
+def test_swiss_odd_player_count_leaves_one_player_out():
+    names = ["a", "b", "c", "d", "e"]
+
+    matches = swiss_pairings(names, [], round_index=0, seed=3)
+
+    paired = [name for m in matches for name in m["players"]]
+    assert len(matches) == 2
+    assert len(set(paired)) == 4 and len(set(names) - set(paired)) == 1
+
+
+class RecordingPool:
+    """Pool synchrone qui note les matchs qu'on lui donne à jouer"""
+
+    def __init__(self):
+        self.played = []
+
+    def imap_unordered(self, fn, matches):
+        for match in matches:
+            self.played.append(match["match_id"])
+            yield result(*match["players"], match["players"][0], match_id=match["match_id"])
+
+
+def test_resume_only_plays_matches_missing_from_checkpoint(tmp_path):
+    checkpoint = tmp_path / "results.jsonl"
+    game = Tournament([{"name": "a", "type": "random"}, {"name": "b", "type": "random"},
+                       {"name": "c", "type": "random"}], str(checkpoint), games_per_pair=1)
+    matches = tournament.round_robin(game.names, 1)
+    checkpoint.write_text(json.dumps(result("a", "b", "a", match_id=matches[0]["match_id"])) + "\n")
+
+    results = load_checkpoint(str(checkpoint))
+    pool = RecordingPool()
+    game._play(pool, matches, results)
+
+    assert pool.played == [m["match_id"] for m in matches[1:]]
+    assert len(load_checkpoint(str(checkpoint))) == len(matches) == len(results)
+
+    # Tout est déjà joué: rien n'est relancé
+    pool = RecordingPool()
+    game._play(pool, matches, load_checkpoint(str(checkpoint)))
+    assert pool.played == []
+
+
+def test_interrupted_tournament_resumes_from_checkpoint(tmp_path):
+    checkpoint = tmp_path / "results.jsonl"
+    configs = [{"name": "r1", "type": "random"}, {"name": "r2", "type": "random"}]
+
+    first = Tournament(configs, str(checkpoint), processes=1, games_per_pair=2, max_turns=20)
+    first.run()
+    lines = checkpoint.read_text().splitlines()
+    checkpoint.write_text(lines[0] + "\n")  # Arrêt après le premier match
+
+    table = Tournament(configs, str(checkpoint), processes=1, games_per_pair=2, max_turns=20).run()
+
+    replayed = load_checkpoint(str(checkpoint))
+    assert replayed[0] == json.loads(lines[0])  # Le match déjà joué n'est pas rejoué
+    assert sorted(r["match_id"] for r in replayed) == sorted(json.loads(line)["match_id"] for line in lines)
+    assert sum(row["games"] for row in table) == 4
@@ -0,0 +1,68 @@
+"""
+Tests du micro-batching d'omniparser_lite
+"""
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("fastapi")
+np = pytest.importorskip("numpy")
+
+import omniparser_lite
+
+
+def test_concurrent_requests_share_one_batch(monkeypatch):
+    batches = []
+
+    def parse_images_batch(images):
+        batches.append(len(images))
+        return [[int(image[0, 0])] for image in images]
+
+    monkeypatch.setattr(omniparser_lite, "parse_images_batch", parse_images_batch)
+
+    async def scenario():
+        batcher = omniparser_lite.MicroBatcher(window_ms=50, max_batch=8)
+        batcher.start()
+        results = await asyncio.gather(*(batcher.submit(np.full((2, 2), i)) for i in range(3)))
+        return results, batcher.get_stats()
+
+    results, stats = asyncio.run(scenario())
+
+    assert results == [[0], [1], [2]]  # Chaque requête reçoit son propre résultat
+    assert batches == [3]
+    assert stats["avg_batch_size"] == 3 and stats["pending"] == 0
+
+
+def test_full_queue_is_rejected(monkeypatch):
+    monkeypatch.setattr(omniparser_lite, "parse_images_batch",
+                        lambda images: time.sleep(0.2) or [[] for _ in images])
+
+    async def scenario():
+        batcher = omniparser_lite.MicroBatcher(window_ms=1, max_queue=1)
+        batcher.start()
+        first = asyncio.create_task(batcher.submit(np.zeros((2, 2))))
+        await asyncio.sleep(0)
+        with pytest.raises(omniparser_lite.QueueFullError):
+            await batcher.submit(np.zeros((2, 2)))
+        assert await first == []
+        return batcher.get_stats()
+
+    assert asyncio.run(scenario())["rejected"] == 1
+
+
+def test_batch_failure_reaches_every_request(monkeypatch):
+    def parse_images_batch(images):
+        raise RuntimeError("detector failed")
+
+    monkeypatch.setattr(omniparser_lite, "parse_images_batch", parse_images_batch)
+
+    async def scenario():
+        batcher = omniparser_lite.MicroBatcher(window_ms=20)
+        batcher.start()
+        return await asyncio.gather(*(batcher.submit(np.zeros((2, 2))) for _ in range(2)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,49 @@
+"""
+Tests de /health d'omniparser_lite quand un modèle ne se charge pas
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("fastapi")
+
+import omniparser_lite
+
+
+def failing_loader():
+    raise RuntimeError("weights corrupted")
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = omniparser_lite.ModelRegistry()
+    monkeypatch.setattr(omniparser_lite, "models", registry)
+    monkeypatch.setattr(omniparser_lite, "OCR_IN_PROCESSES", False)
+    return registry
+
+
+def test_failed_detector_is_reported_as_degraded(registry):
+    registry.register("detector", failing_loader)
+    registry.register("ocr", lambda: object())
+    assert asyncio.run(omniparser_lite.health())["status"] == "starting"
+
+    registry.get("detector")
+    registry.get("ocr")
+    health = asyncio.run(omniparser_lite.health())
+
+    assert health["ready"] is True
+    assert health["status"] == "degraded"
+    assert health["errors"] == {"detector": "weights corrupted"}
+
+
+def test_every_model_failing_is_unhealthy(registry):
+    registry.register("detector", failing_loader)
+    registry.register("ocr", failing_loader)
+    registry.get("detector")
+    registry.get("ocr")
+
+    health = asyncio.run(omniparser_lite.health())
+
+    assert health["status"] == "unhealthy"
+    assert set(health["errors"]) == {"detector", "ocr"}
@@ -0,0 +1,102 @@
+"""
+Tests du cache des réponses d'omniparser_lite
+"""
+import asyncio
+import base64
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("fastapi")
+
+import omniparser_lite
+
+IMAGE = base64.b64encode(b"popup-capture").decode()
+
+
+def test_key_depends_on_content_and_parameters():
+    key = omniparser_lite.ResultCache.make_key(IMAGE)
+
+    assert omniparser_lite.ResultCache.make_key(IMAGE, keywords=None) == key
+    assert omniparser_lite.ResultCache.make_key(IMAGE, keywords=["buy"]) != key
+    assert omniparser_lite.ResultCache.make_key(base64.b64encode(b"other").decode()) != key
+
+
+def test_identical_requests_are_computed_once():
+    cache = omniparser_lite.ResultCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"parsed_content_list": []}
+
+    async def scenario():
+        concurrent = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(3)))
+        return concurrent, await cache.get_or_compute("k", compute)
+
+    concurrent, later = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert [hit for _, hit in concurrent] == [False, True, True]
+    assert later == ({"parsed_content_list": []}, True)
+    assert cache.get_stats()["coalesced"] == 2
+
+
+def test_idempotency_key_and_byte_bound_eviction():
+    result = {"parsed_content_list": ["x" * 20]}
+    cache = omniparser_lite.ResultCache(max_bytes=len(omniparser_lite.json.dumps(result)) * 2)
+
+    async def compute():
+        return result
+
+    async def scenario():
+        for key in ("a", "b", "c"):
+            await cache.get_or_compute(key, compute, idempotency_key=f"req-{key}")
+
+    asyncio.run(scenario())
+
+    stats = cache.get_stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+    assert cache.lookup_idempotent("req-a") is None  # Entrée évincée
+    assert cache.lookup_idempotent("req-c") == result
+    assert cache.lookup_idempotent(None) is None
+
+
+def test_failed_computation_is_not_cached():
+    cache = omniparser_lite.ResultCache()
+
+    async def compute():
+        raise ValueError("decode error")
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                await cache.get_or_compute("k", compute)
+
+    asyncio.run(scenario())
+    assert cache.get_stats()["misses"] == 2 and cache.get_stats()["entries"] == 0
+
+
+def test_cancelled_leader_releases_waiting_requests():
+    cache = omniparser_lite.ResultCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05 if len(calls) > 1 else 10)
+        return {"parsed_content_list": []}
+
+    async def scenario():
+        leader = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()  # Client déconnecté
+
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(waiter, 1)  # Sans attendre indéfiniment
+        return await cache.get_or_compute("k", compute)
+
+    assert asyncio.run(scenario()) == ({"parsed_content_list": []}, False)
+    assert len(calls) == 2
@@ -0,0 +1,51 @@
+"""
+Tests des historiques de taille fixe
+"""
+from src.utils.ring_buffer import RingBuffer
+
+
+def test_only_changes_are_recorded():
+    buffer = RingBuffer(capacity=4)
+
+    assert buffer.append(1.0, 1500)
+    assert not buffer.append(2.0, 1500)
+    assert buffer.append(3.0, 1300)
+
+    assert len(buffer) == 2 and buffer.total == 2
+    assert buffer.last() == (3.0, 1300)
+
+
+def test_oldest_entries_are_overwritten_in_order():
+    buffer = RingBuffer(capacity=3)
+    size = buffer.nbytes()
+
+    for step in range(7):
+        buffer.append(float(step), step * 10)
+
+    assert len(buffer) == 3 and buffer.total == 7
+    assert buffer.downsample(10) == [(4.0, 40), (5.0, 50), (6.0, 60)]
+    assert buffer.last() == (6.0, 60)
+    assert buffer.nbytes() == size
+
+
+def test_wrapped_value_is_compared_with_the_latest_entry():
+    buffer = RingBuffer(capacity=3)
+    for step, value in enumerate([1, 2, 3]):
+        buffer.append(float(step), value)
+
+    # L'écriture suivante revient à l'index 0: la dernière valeur est à l'index 2
+    assert not buffer.append(3.0, 3)
+    assert buffer.append(4.0, 1)
+    assert buffer.downsample() == [(1.0, 2), (2.0, 3), (4.0, 1)]
+
+
+def test_downsample_keeps_the_latest_entry():
+    buffer = RingBuffer(capacity=100)
+    for step in range(50):
+        buffer.append(float(step), step)
+
+    points = buffer.downsample(5)
+
+    assert len(points) == 5
+    assert points[0] == (0.0, 0) and points[-1] == (49.0, 49)
+    assert RingBuffer().downsample() == [] and RingBuffer().last() is None